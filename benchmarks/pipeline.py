@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Resize pipeline benchmark.
+Generates synthetic PNG, JPEG, WebP, GIF and TIFF images at several sizes and
+times dimension probing, single resizes per backend and preset, resizes of
+large sources read back from the decoded raster cache, encode time and output
+size of every encoder profile, batch throughput at different worker counts
+and module import time.
+
+    python3 benchmarks/pipeline.py [--megapixels 1,4,16] [--runs N] [--json] [--output FILE]
+    python3 benchmarks/pipeline.py --compare before.json after.json
+
+Every measurement is a record with a unique name, so two JSON reports can be
+compared with --compare.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from startup import MODULES, SRC_DIR, measure_import
+
+sys.path.insert(0, SRC_DIR)
+
+# Benchmarks measure resizing, not the output cache or the decoded raster cache;
+# the raster cache gets a labelled case of its own
+os.environ['IMAGE_RESIZER_CACHE'] = 'off'
+os.environ['IMAGE_RESIZER_RASTER_CACHE'] = 'off'
+
+from image_resizer_nautilus.backends import BACKENDS  # noqa: E402
+from image_resizer_nautilus.batch import BatchJob, BatchResize  # noqa: E402
+from image_resizer_nautilus.encoding import PROFILES  # noqa: E402
+from image_resizer_nautilus.probe import identify_dimensions, probe_dimensions, read_header_dimensions  # noqa: E402
+from image_resizer_nautilus.raster_cache import (RASTER_CACHE_DIR_ENV_VAR, RASTER_CACHE_ENV_VAR,  # noqa: E402
+                                                 RASTER_CACHE_MIN_PIXELS)
+from image_resizer_nautilus.resize_operation import ResizeOperation  # noqa: E402
+
+FORMATS = {
+    'png': ('.png', 'PNG', {}),
+    'jpeg': ('.jpg', 'JPEG', {'quality': 90}),
+    'webp': ('.webp', 'WEBP', {'quality': 90}),
+    'gif': ('.gif', 'GIF', {}),
+    'tiff': ('.tiff', 'TIFF', {'compression': 'tiff_deflate'}),
+}
+
+# (label, width, height, percentage) as the dialog's presets pass them
+PRESETS = (
+    ('25%', None, None, 25),
+    ('50%', None, None, 50),
+    ('1280x720', 1280, 720, None),
+    ('320x240', 320, 240, None),
+)
+
+# Images per worker in the batch benchmark
+BATCH_IMAGES_PER_WORKER = 4
+
+# Output formats the encoder profiles cover, with the output format index of each
+ENCODE_FORMATS = (('png', 1), ('jpeg', 2), ('webp', 3))
+
+
+def image_size(megapixels):
+    """4:3 dimensions with at least the given number of megapixels"""
+    width = math.ceil(math.sqrt(megapixels * 1_000_000 * 4 / 3))
+    return width, math.ceil(width * 3 / 4)
+
+
+def write_synthetic_image(path, format_name, width, height):
+    """Write a gradient with noise, which compresses like a photo rather than a flat colour"""
+    from PIL import Image, ImageChops
+
+    extension, pil_format, options = FORMATS[format_name]
+    gradient = Image.linear_gradient('L').resize((width, height))
+    radial = Image.radial_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 32)
+    image = Image.merge('RGB', (gradient, radial, ImageChops.add(gradient, noise, scale=2)))
+    if format_name == 'gif':
+        image = image.quantize(256)
+    image.save(path, pil_format, **options)
+
+
+def build_corpus(directory, megapixels, formats):
+    """Generate one image per format and size; returns a list of descriptions"""
+    corpus = []
+    for size in megapixels:
+        width, height = image_size(size)
+        for format_name in formats:
+            name = f"{format_name}-{size:g}mp"
+            path = os.path.join(directory, name + FORMATS[format_name][0])
+            write_synthetic_image(path, format_name, width, height)
+            corpus.append({
+                'name': name, 'path': path, 'format': format_name, 'megapixels': size,
+                'width': width, 'height': height, 'bytes': os.path.getsize(path),
+            })
+    return corpus
+
+
+def median_ms(function, runs):
+    """Median wall time of function() in milliseconds, and its last result"""
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def bench_probe(corpus, runs):
+    """Time the header-only probe behind ImageResizer.get_image_dimensions and its identify fallback"""
+    records = []
+    for image in corpus:
+        for label, function in (('header', read_header_dimensions), ('probe', probe_dimensions),
+                                ('identify', identify_dimensions)):
+            if label == 'identify' and not shutil.which('identify'):
+                continue
+            ms, size = median_ms(lambda: function(image['path']), runs)
+            records.append({
+                'name': f"probe/{label}/{image['name']}", 'median_ms': ms,
+                'correct': size == (image['width'], image['height']),
+            })
+    return records
+
+
+def bench_resize(corpus, backends, runs, output_dir):
+    """Time ResizeOperation.perform_resize for every backend, image and preset"""
+    records = []
+    for backend in backends:
+        for image in corpus:
+            for label, width, height, percentage in PRESETS:
+                output_path = ResizeOperation.build_output_path(image['path'], 0, output_dir, f"_{backend}")
+
+                def resize():
+                    return ResizeOperation.perform_resize(image['path'], width, height, 0, output_path, None,
+                                                          percentage=percentage, notify=False, backend=backend)
+
+                ms, success = median_ms(resize, runs)
+                records.append({
+                    'name': f"resize/{backend}/{image['name']}/{label}", 'median_ms': ms,
+                    'success': bool(success),
+                    'megapixels_per_second': image['megapixels'] / (ms / 1000) if success and ms else 0.0,
+                })
+    return records
+
+
+@contextmanager
+def raster_cache_enabled():
+    os.environ[RASTER_CACHE_ENV_VAR] = 'on'
+    try:
+        yield
+    finally:
+        os.environ[RASTER_CACHE_ENV_VAR] = 'off'
+
+
+def bench_raster_cache(corpus, backends, runs, output_dir):
+    """Time half-size Pillow resizes of large sources mapped from the decoded raster cache
+
+    Comparable with the resize/pillow/.../50% records, which decode every time.
+    """
+    records = []
+    if 'pillow' not in backends:
+        return records
+    large = [image for image in corpus if image['width'] * image['height'] >= RASTER_CACHE_MIN_PIXELS]
+    with raster_cache_enabled():
+        for image in large:
+            output_path = ResizeOperation.build_output_path(image['path'], 0, output_dir, '_raster_cache')
+
+            def resize():
+                return ResizeOperation.perform_resize(image['path'], None, None, 0, output_path, None,
+                                                      percentage=50, notify=False, backend='pillow')
+
+            # The raster is written on the second decode of a source
+            resize()
+            resize()
+            ms, success = median_ms(resize, runs)
+            records.append({
+                'name': f"resize/pillow-raster-cache/{image['name']}/50%", 'median_ms': ms,
+                'success': bool(success),
+                'megapixels_per_second': image['megapixels'] / (ms / 1000) if success and ms else 0.0,
+            })
+    return records
+
+
+def bench_encode(corpus, backends, runs, output_dir):
+    """Time a half-size resize into each output format with every encoder profile, and the size written"""
+    records = []
+    for backend in backends:
+        for image in corpus:
+            for format_name, format_index in ENCODE_FORMATS:
+                for profile in PROFILES:
+                    output_path = ResizeOperation.build_output_path(image['path'], format_index, output_dir,
+                                                                    f"_{backend}_{profile}")
+
+                    def resize():
+                        return ResizeOperation.perform_resize(image['path'], None, None, format_index,
+                                                              output_path, None, percentage=50, notify=False,
+                                                              backend=backend, profile=profile)
+
+                    ms, success = median_ms(resize, runs)
+                    records.append({
+                        'name': f"encode/{backend}/{image['name']}/{format_name}/{profile}", 'median_ms': ms,
+                        'success': bool(success),
+                        'output_bytes': os.path.getsize(output_path) if success else 0,
+                    })
+    return records
+
+
+def bench_batch(corpus, backends, worker_counts, output_dir):
+    """Batch throughput over the corpus at each worker count"""
+    records = []
+    for backend in backends:
+        for workers in worker_counts:
+            jobs = []
+            for index in range(max(len(corpus), workers * BATCH_IMAGES_PER_WORKER)):
+                image = corpus[index % len(corpus)]
+                output_path = ResizeOperation.build_output_path(image['path'], 0, output_dir, f"_batch{index}")
+                jobs.append(BatchJob(image['path'], output_path, percentage=50, backend=backend))
+
+            result = BatchResize(jobs, max_workers=workers).run()
+            records.append({
+                'name': f"batch/{backend}/{workers}-workers", 'elapsed_s': result.elapsed,
+                'images': result.total, 'failed': len(result.failed),
+                'images_per_second': result.images_per_second,
+                'megabytes_per_second': result.megabytes_per_second,
+            })
+    return records
+
+
+def bench_imports(runs):
+    records = []
+    for label, module in MODULES.items():
+        data = measure_import(module, runs, 0)
+        if 'error' in data:
+            records.append({'name': f"import/{label}", 'error': data['error']})
+        else:
+            records.append({'name': f"import/{label}", 'median_ms': data['import_ms']})
+    return records
+
+
+def available_backends():
+    """Backends that can run here; ImageMagick needs the convert command"""
+    return [name for name, backend in BACKENDS.items()
+            if backend.is_available() and (name != 'imagemagick' or shutil.which('convert'))]
+
+
+@contextmanager
+def logs_to_stderr():
+    """Send the resize log lines, including those of pool workers, to stderr so stdout stays clean JSON"""
+    sys.stdout.flush()
+    saved_stdout = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved_stdout, 1)
+        os.close(saved_stdout)
+
+
+def primary_value(record):
+    """The number a record is compared on and whether larger is better"""
+    if 'images_per_second' in record:
+        return record['images_per_second'], True
+    return record.get('median_ms'), False
+
+
+def compare_reports(before_path, after_path):
+    """Print the change of every measurement present in both reports"""
+    with open(before_path) as f:
+        before = {record['name']: record for record in json.load(f)['results']}
+    with open(after_path) as f:
+        after = {record['name']: record for record in json.load(f)['results']}
+
+    print(f"{'benchmark':<48} {'before':>10} {'after':>10} {'change':>8}")
+    for name, record in after.items():
+        if name not in before:
+            continue
+        old, higher_is_better = primary_value(before[name])
+        new, _ = primary_value(record)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        # Positive always means faster
+        if not higher_is_better:
+            change = -change
+        print(f"{name:<48} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%")
+
+
+def print_report(report):
+    print(f"Resize pipeline benchmark ({report['runs']} runs, medians, {report['cpu_count']} CPUs)")
+    print("")
+    for record in report['results']:
+        if 'error' in record:
+            print(f"  {record['name']:<48} unavailable: {record['error']}")
+        elif 'images_per_second' in record:
+            print(f"  {record['name']:<48} {record['images_per_second']:8.1f} images/s "
+                  f"({record['images']} images in {record['elapsed_s']:.2f}s, {record['failed']} failed)")
+        else:
+            flag = '' if record.get('success', record.get('correct', True)) else '  FAILED'
+            if 'output_bytes' in record:
+                flag = f"  {record['output_bytes'] / 1024:10.1f} KiB" + flag
+            print(f"  {record['name']:<48} {record['median_ms']:8.2f} ms{flag}")
+
+
+def parse_list(text, cast=str):
+    return [cast(item.strip()) for item in text.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark probing, resizing and batch throughput.')
+    parser.add_argument('--megapixels', type=lambda text: parse_list(text, float), default=[1, 4, 16],
+                        help='image sizes to generate (default: 1,4,16)')
+    parser.add_argument('--formats', type=parse_list, default=list(FORMATS),
+                        help=f"formats to generate (default: {','.join(FORMATS)})")
+    parser.add_argument('--backends', type=parse_list,
+                        help='backends to time (default: every available backend)')
+    parser.add_argument('--workers', type=lambda text: parse_list(text, int),
+                        help='batch worker counts (default: 1,2,4 and the CPU count)')
+    parser.add_argument('--runs', type=int, default=3, help='runs per measurement (default: 3)')
+    parser.add_argument('--skip', type=parse_list, default=[],
+                        help='benchmarks to skip: probe, resize, raster-cache, encode, batch, import')
+    parser.add_argument('--json', action='store_true', help='print machine-readable JSON')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two JSON reports instead of running')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return 0
+
+    unknown = set(args.formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        parser.error('generating the synthetic images needs Pillow: pip install Pillow')
+
+    backends = args.backends or available_backends()
+    worker_counts = args.workers or sorted({1, 2, 4, os.cpu_count() or 1})
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='image-resizer-bench-') as tmp, logs_to_stderr():
+        corpus_dir = os.path.join(tmp, 'corpus')
+        output_dir = os.path.join(tmp, 'output')
+        os.makedirs(corpus_dir)
+        os.makedirs(output_dir)
+        # Never leave rasters in the user's own cache
+        os.environ[RASTER_CACHE_DIR_ENV_VAR] = os.path.join(tmp, 'rasters')
+        corpus = build_corpus(corpus_dir, args.megapixels, args.formats)
+
+        if 'probe' not in args.skip:
+            results += bench_probe(corpus, args.runs)
+        if 'resize' not in args.skip:
+            results += bench_resize(corpus, backends, args.runs, output_dir)
+        if 'raster-cache' not in args.skip:
+            results += bench_raster_cache(corpus, backends, args.runs, output_dir)
+        if 'encode' not in args.skip:
+            # One source per size is enough, the output format is what varies
+            sources = [image for image in corpus if image['format'] == args.formats[0]]
+            results += bench_encode(sources, backends, args.runs, output_dir)
+        if 'batch' not in args.skip:
+            # The smallest images keep the batch about throughput rather than one huge decode
+            smallest = [image for image in corpus if image['megapixels'] == min(args.megapixels)]
+            results += bench_batch(smallest, backends, worker_counts, output_dir)
+        if 'import' not in args.skip:
+            results += bench_imports(args.runs)
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'runs': args.runs,
+        'backends': backends,
+        'corpus': [{key: value for key, value in image.items() if key != 'path'} for image in corpus],
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark.
+Reports how long it takes to import the package, the resize engine and the GUI
+(with a python -X importtime breakdown) and the time to the first window.
+
+    python3 benchmarks/startup.py [--runs N] [--top N] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_ROOT, 'src')
+
+MODULES = {
+    'package': 'image_resizer_nautilus',
+    'resize_engine': 'image_resizer_nautilus.resize_operation',
+    'batch': 'image_resizer_nautilus.batch',
+    'gui': 'image_resizer_nautilus.image_resizer',
+}
+
+# Keep in sync with image_resizer.py
+STARTUP_PROBE_ENV_VAR = 'IMAGE_RESIZER_STARTUP_PROBE'
+STARTUP_PROBE_MARKER = 'image-resizer: first window mapped'
+
+WINDOW_TIMEOUT = 30
+
+
+def child_env(**extra):
+    """Environment for child interpreters that import the package from this checkout"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [SRC_DIR, env.get('PYTHONPATH')]))
+    env.update(extra)
+    return env
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into {module: (self_us, cumulative_us)}"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module, runs, top):
+    """Median import time of a module over several fresh interpreters"""
+    wall_times = []
+    cumulative_times = []
+    timings = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True, env=child_env()
+        )
+        wall_times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return {'error': result.stderr.strip().splitlines()[-1]}
+        timings = parse_importtime(result.stderr)
+        cumulative_times.append(timings.get(module, (0, 0))[1])
+
+    slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        'import_ms': statistics.median(cumulative_times) / 1000,
+        'interpreter_wall_ms': statistics.median(wall_times) * 1000,
+        'slowest_self_ms': [[name, self_us / 1000] for name, (self_us, _) in slowest],
+    }
+
+
+def write_test_png(path, width=64, height=48):
+    """Write a small solid-colour PNG without needing an imaging library"""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    row = b'\x00' + b'\x80\x80\x80' * width
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(row * height)))
+        f.write(chunk(b'IEND', b''))
+
+
+def measure_first_window(runs):
+    """Median time from launching the resizer to its first window being mapped"""
+    if not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        return {'error': 'no display available'}
+
+    times = []
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, 'startup.png')
+        write_test_png(image_path)
+
+        for _ in range(runs):
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'image_resizer_nautilus.image_resizer', image_path],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                env=child_env(**{STARTUP_PROBE_ENV_VAR: '1'})
+            )
+            try:
+                for line in process.stdout:
+                    if line.strip() == STARTUP_PROBE_MARKER:
+                        times.append(time.perf_counter() - start)
+                        break
+                else:
+                    return {'error': 'resizer exited before showing a window'}
+            finally:
+                try:
+                    process.wait(timeout=WINDOW_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+
+    return {'first_window_ms': statistics.median(times) * 1000}
+
+
+def print_report(report):
+    print(f"Startup benchmark ({report['runs']} runs, medians)")
+    print("")
+    for label, data in report['imports'].items():
+        if 'error' in data:
+            print(f"  import {label:<14} unavailable: {data['error']}")
+            continue
+        print(f"  import {label:<14} {data['import_ms']:8.1f} ms "
+              f"(interpreter total {data['interpreter_wall_ms']:.1f} ms)")
+        for name, self_ms in data['slowest_self_ms']:
+            print(f"      {self_ms:8.2f} ms  {name}")
+    print("")
+    window = report['first_window']
+    if 'error' in window:
+        print(f"  time to first window: unavailable: {window['error']}")
+    else:
+        print(f"  time to first window: {window['first_window_ms']:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure import and startup time.')
+    parser.add_argument('--runs', type=int, default=5, help='runs per measurement (default: 5)')
+    parser.add_argument('--top', type=int, default=5, help='slowest imports to list per module')
+    parser.add_argument('--json', action='store_true', help='print machine-readable JSON')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'imports': {label: measure_import(module, args.runs, args.top) for label, module in MODULES.items()},
+        'first_window': measure_first_window(args.runs),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
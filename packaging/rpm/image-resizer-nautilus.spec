@@ -54,6 +54,7 @@ fi
 %license LICENSE
 %doc README.md
 %{_bindir}/image-resizer-gui
+%{_bindir}/image-resizer-batch
 %{_bindir}/image-resizer-setup
 %{_bindir}/image-resizer-uninstall
 %{python3_sitelib}/image_resizer_nautilus/
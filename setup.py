@@ -18,10 +18,13 @@ setup(
     ],
     extras_require={
         'dev': ['build', 'twine', 'wheel'],
+        'pillow': ['Pillow'],
+        'vips': ['pyvips'],
     },
     entry_points={
         'console_scripts': [
             'image-resizer-gui=image_resizer_nautilus.image_resizer:main',
+            'image-resizer-batch=image_resizer_nautilus.batch_cli:main',
             'image-resizer-setup=image_resizer_nautilus.extension_setup:main',
             'image-resizer-uninstall=image_resizer_nautilus.uninstall:main',
         ],
@@ -0,0 +1,863 @@
+"""Resize backends used by ResizeOperation
+
+Pillow and GdkPixbuf resize inside the current process, which avoids the fork,
+exec and ImageMagick startup cost of running ``convert`` for every image.
+ImageMagick stays available as the fallback for anything the in-process
+backends cannot handle.
+
+Images too large to hold in memory are streamed: libvips (through pyvips)
+resizes them in strips with bounded memory, and without it ImageMagick runs
+with a small memory limit so its pixel cache lives on disk.
+
+Animated GIF and WebP sources are coalesced into full frames before resizing,
+so frames that only paint part of the picture scale cleanly, and the output
+animation is optimised again afterwards.
+
+SVG sources are never resampled: each output size is rendered straight from
+the vector data, by librsvg through GdkPixbuf or by ImageMagick at the
+-density that gives the target size.
+"""
+
+import codecs
+import io
+import os
+import selectors
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .limits import ENV_PREFIX, ResourceLimits
+from .probe import read_frame_count, read_header_dimensions
+from .raster_cache import RasterCache
+from .progress import MonitorParser, stage_fraction
+from .target_size import search_quality
+
+BACKEND_ENV_VAR = 'IMAGE_RESIZER_BACKEND'
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.jfif')
+
+# Extra time convert gets to stop by itself after its -limit time before it is killed
+TIMEOUT_GRACE = 10
+
+# How often a running convert checks whether the job was cancelled
+CANCEL_POLL_INTERVAL = 0.1
+
+# ImageMagick errors that mean a resource limit was hit
+LIMIT_ERRORS = (
+    'cache resources exhausted',
+    'resourcelimit',
+    'time limit exceeded',
+    'memory allocation failed',
+    'exceeds limit',
+)
+
+# JPEGs are decoded at no less than this multiple of the target size, leaving
+# the final high-quality resample enough pixels to work with
+JPEG_DECODE_FACTOR = 2
+
+# Sources with more pixels than this (about 10000 x 10000) are resized by streaming
+STREAMING_PIXELS = 100_000_000
+STREAMING_ENV_VAR = ENV_PREFIX + 'STREAMING_PIXELS'
+
+# Output formats that keep every frame of an animation; other formats get the first frame
+ANIMATED_EXTENSIONS = ('.gif', '.webp')
+
+# Frame delay in milliseconds for frames that don't give one
+DEFAULT_FRAME_DURATION = 100
+
+SVG_EXTENSIONS = ('.svg',)
+
+# SVG lengths are CSS pixels at 96 DPI, so rendering at this density gives the intrinsic size
+SVG_BASE_DENSITY = 96
+
+# Set to off to always resize the full image with the quality filter and keep metadata
+THUMBNAIL_ENV_VAR = 'IMAGE_RESIZER_THUMBNAIL'
+
+# Reductions to a quarter of the source size or smaller take the thumbnail path
+THUMBNAIL_RATIO = 4
+
+# The thumbnail path box-shrinks to this multiple of the target before the quality filter
+THUMBNAIL_PRESHRINK_FACTOR = 3
+
+
+class BackendError(Exception):
+    """Raised when a backend fails to resize an image"""
+
+
+class UnsupportedImage(BackendError):
+    """Raised when a backend cannot handle an input or output format"""
+
+
+class ResourceLimitExceeded(BackendError):
+    """Raised when a job needs more memory, disk or time than its limits allow"""
+
+
+class ResizeCancelled(BackendError):
+    """Raised when a job is cancelled while it runs"""
+
+
+def parse_resize_param(resize_param):
+    """Split an ImageMagick geometry into (width, height, percentage)"""
+    if resize_param.endswith('%'):
+        return None, None, float(resize_param[:-1])
+
+    width, _, height = resize_param.partition('x')
+    return (int(width) if width else None), (int(height) if height else None), None
+
+
+def compute_target_size(source_width, source_height, resize_param):
+    """Compute the output size the way ImageMagick's -resize geometry does"""
+    width, height, percentage = parse_resize_param(resize_param)
+
+    if percentage is not None:
+        scale_x = scale_y = percentage / 100.0
+    elif width is not None and height is not None:
+        # Fit inside the box while keeping the aspect ratio
+        scale_x = scale_y = min(width / source_width, height / source_height)
+    elif width is not None:
+        scale_x = scale_y = width / source_width
+    elif height is not None:
+        scale_x = scale_y = height / source_height
+    else:
+        return source_width, source_height
+
+    return (max(1, int(source_width * scale_x + 0.5)),
+            max(1, int(source_height * scale_y + 0.5)))
+
+
+def jpeg_decode_size(file_path, resize_param, source_size=None):
+    """Return the reduced size a JPEG can be decoded at, or None when a full decode is needed
+
+    libjpeg can scale by 1/2, 1/4 or 1/8 while decoding, in the DCT domain, which
+    skips most of the decode work and memory for large reductions.
+    """
+    if not file_path.lower().endswith(JPEG_EXTENSIONS):
+        return None
+
+    source_size = source_size or read_header_dimensions(file_path)
+    if not source_size:
+        return None
+
+    source_width, source_height = source_size
+    target_width, target_height = compute_target_size(source_width, source_height, resize_param)
+    decode_width = target_width * JPEG_DECODE_FACTOR
+    decode_height = target_height * JPEG_DECODE_FACTOR
+
+    if decode_width > source_width or decode_height > source_height:
+        return None
+    return decode_width, decode_height
+
+
+def jpeg_decode_size_for_set(file_path, resize_params, source_size=None):
+    """Reduced JPEG decode size that still serves every size in a set, or None"""
+    decode_sizes = [jpeg_decode_size(file_path, resize_param, source_size) for resize_param in resize_params]
+    if not decode_sizes or None in decode_sizes:
+        return None
+    return max(decode_sizes)
+
+
+def thumbnail_enabled(thumbnail=None):
+    """Whether large reductions may take the thumbnail path; None follows IMAGE_RESIZER_THUMBNAIL"""
+    if thumbnail is not None:
+        return bool(thumbnail)
+    return os.environ.get(THUMBNAIL_ENV_VAR, 'auto').lower() not in ('off', '0', 'no', 'false')
+
+
+def thumbnail_preshrink_size(source_size, target_size, thumbnail=None):
+    """Size to box-shrink to before the quality filter, or None to resize the full image
+
+    Only reductions by THUMBNAIL_RATIO or more in both directions qualify; the
+    pre-shrink stops at THUMBNAIL_PRESHRINK_FACTOR times the target so the
+    final filter still has enough pixels to avoid aliasing.
+    """
+    if not thumbnail_enabled(thumbnail) or not source_size:
+        return None
+    (source_width, source_height), (target_width, target_height) = source_size, target_size
+    if source_width < target_width * THUMBNAIL_RATIO or source_height < target_height * THUMBNAIL_RATIO:
+        return None
+    return target_width * THUMBNAIL_PRESHRINK_FACTOR, target_height * THUMBNAIL_PRESHRINK_FACTOR
+
+
+def is_svg(file_path):
+    return file_path.lower().endswith(SVG_EXTENSIONS)
+
+
+def svg_density(source_size, target_size):
+    """ImageMagick -density that renders an SVG of intrinsic source_size at target_size"""
+    return SVG_BASE_DENSITY * max(target_size[0] / source_size[0], target_size[1] / source_size[1])
+
+
+def streaming_threshold():
+    """Pixel count above which a resize is streamed, from IMAGE_RESIZER_LIMIT_STREAMING_PIXELS"""
+    try:
+        return int(os.environ.get(STREAMING_ENV_VAR, STREAMING_PIXELS))
+    except ValueError:
+        return STREAMING_PIXELS
+
+
+def needs_streaming(width, height, limits=None):
+    """True when a source is too large to decode into memory in one piece"""
+    limits = limits or ResourceLimits.from_environment()
+    return width * height > streaming_threshold() or width * height * 4 > limits.memory
+
+
+def variant_fraction(index, count, stage):
+    """Overall progress once variant index of count has finished its 'resize' or 'save' stage"""
+    done = index + (0.5 if stage == 'resize' else 1.0)
+    start = stage_fraction('load', 1.0)
+    return start + (1.0 - start) * done / count
+
+
+def run_convert(arguments, progress=None, limits=None, cancel=None):
+    """Run ImageMagick convert under resource limits
+
+    -monitor progress is streamed from a non-blocking stderr pipe, and the child
+    is killed when the job is cancelled or overruns its time limit.
+    """
+    limits = limits or ResourceLimits.from_environment()
+    command = ['convert'] + limits.imagemagick_arguments()
+    if progress:
+        command.append('-monitor')
+    command += arguments
+
+    parser = MonitorParser(progress or (lambda fraction, stage: None))
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    timeout = limits.time + TIMEOUT_GRACE
+    deadline = time.monotonic() + timeout
+
+    # TimeoutExpired is left for the caller to report
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise BackendError('ImageMagick not installed. Run: sudo dnf install ImageMagick')
+    try:
+        stderr_fd = process.stderr.fileno()
+        os.set_blocking(stderr_fd, False)
+        with selectors.DefaultSelector() as selector:
+            selector.register(stderr_fd, selectors.EVENT_READ)
+            while True:
+                if cancel and cancel.is_cancelled():
+                    raise ResizeCancelled('Resize cancelled')
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(command, timeout)
+                if not selector.select(min(remaining, CANCEL_POLL_INTERVAL)):
+                    continue
+                chunk = os.read(stderr_fd, 65536)
+                if not chunk:
+                    break
+                parser.feed(decoder.decode(chunk))
+
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+        returncode = process.wait(timeout=max(0.0, deadline - time.monotonic()))
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stderr.close()
+
+    if returncode != 0:
+        error_output = parser.error_output
+        if any(marker in error_output.lower() for marker in LIMIT_ERRORS):
+            raise ResourceLimitExceeded(
+                f'Image exceeds the resize limits ({limits.describe()})\nError: {error_output}'
+            )
+        raise BackendError(f'Resize failed. Return code: {returncode}\nError: {error_output}')
+
+
+class ResizeBackend:
+    """Base class for resize backends"""
+
+    name = None
+
+    # Whether SVG sources are rendered at the target size rather than rejected
+    renders_svg = False
+
+    @classmethod
+    def is_available(cls):
+        """Return True when the backend can be used on this system"""
+        return False
+
+    def resize(self, file_path, resize_param, output_path, progress=None, limits=None, cancel=None,
+               profile=None, thumbnail=None):
+        """Resize file_path into output_path, raising BackendError on failure
+
+        progress, when given, is called as progress(fraction, stage) with the
+        fraction of the whole job done and one of the progress.STAGES. limits
+        is a ResourceLimits, cancel a CancelToken and profile an
+        encoding.EncoderProfile; without one the encoder defaults are used.
+        thumbnail=False keeps large reductions off the thumbnail path, see
+        thumbnail_preshrink_size.
+        """
+        self.resize_set(file_path, [(resize_param, output_path)], progress, limits, cancel, profile, thumbnail)
+
+    def resize_set(self, file_path, variants, progress=None, limits=None, cancel=None, profile=None,
+                   thumbnail=None):
+        """Write every (resize_param, output_path) variant from a single decode of file_path"""
+        raise NotImplementedError
+
+    @staticmethod
+    def check_cancelled(cancel):
+        """Stop an in-process resize between stages once it has been cancelled"""
+        if cancel and cancel.is_cancelled():
+            raise ResizeCancelled('Resize cancelled')
+
+    @staticmethod
+    def save_within_budget(encode, output_path, budget, limits=None):
+        """Write the highest-quality encoding that fits a (max_bytes, highest quality) budget
+
+        encode(quality) returns the encoded bytes of the already resized image;
+        limits.threads trials run at a time.
+        """
+        max_bytes, quality = budget
+        limits = limits or ResourceLimits.from_environment()
+        result = search_quality(encode, max_bytes, quality, limits.threads)
+        with open(output_path, 'wb') as f:
+            f.write(result.data)
+
+        size = f'{len(result.data) / 1024:.1f} KiB'
+        if result.fits:
+            print(f"Encoded {output_path} at quality {result.quality} ({size}) after {result.trials} trials")
+        else:
+            print(f"Warning: {output_path} is {size} even at quality {result.quality}, "
+                  f"over the {max_bytes / 1000:g} KB limit ({result.trials} trials)")
+        return result
+
+    @staticmethod
+    def check_memory(width, height, limits):
+        """Hand images whose raster won't fit the memory limit to ImageMagick, which can spill to disk"""
+        limits = limits or ResourceLimits.from_environment()
+        # Four bytes per pixel for the decoded raster
+        if width * height * 4 > limits.memory:
+            raise UnsupportedImage(f'{width}x{height} image is too large to resize in memory')
+
+
+class ImageMagickBackend(ResizeBackend):
+    """Resize by running the ImageMagick ``convert`` command"""
+
+    name = 'imagemagick'
+
+    renders_svg = True
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def resize_set(self, file_path, variants, progress=None, limits=None, cancel=None, profile=None,
+                   thumbnail=None):
+        arguments = []
+
+        decode_size = jpeg_decode_size_for_set(file_path, [resize_param for resize_param, _ in variants])
+        if decode_size:
+            # Let libjpeg scale down while decoding, before the -resize filter
+            arguments += ['-define', 'jpeg:size={}x{}'.format(*decode_size)]
+
+        source_size = read_header_dimensions(file_path)
+        if is_svg(file_path) and source_size:
+            run_convert(self.svg_arguments(file_path, source_size, variants, profile), progress, limits, cancel)
+            return
+
+        animated = read_frame_count(file_path) > 1
+        # Partial frames become full pictures, so each one resizes on its own
+        source = [file_path, '-coalesce'] if animated else [file_path]
+
+        def resize_arguments(resize_param, output_path):
+            arguments = []
+            if animated and not output_path.lower().endswith(ANIMATED_EXTENSIONS):
+                # Still formats get the first frame instead of one numbered file per frame
+                arguments += ['-delete', '1--1']
+            resize = ['-resize', resize_param]
+            if source_size:
+                target_size = compute_target_size(source_size[0], source_size[1], resize_param)
+                preshrink_size = thumbnail_preshrink_size(source_size, target_size, thumbnail)
+                if preshrink_size:
+                    # Box-average down cheaply, finish with the resize filter at the exact size and drop metadata
+                    resize = ['-scale', '{}x{}!'.format(*preshrink_size),
+                              '-resize', '{}x{}!'.format(*target_size), '-strip']
+            arguments += resize
+            if animated and output_path.lower().endswith('.gif'):
+                # Crop every frame to what changed and reuse transparent pixels, undoing the coalesce
+                arguments += ['-layers', 'Optimize']
+            if profile:
+                arguments += profile.imagemagick_arguments(output_path)
+            return arguments
+
+        if len(variants) == 1:
+            resize_param, output_path = variants[0]
+            arguments += source + resize_arguments(resize_param, output_path) + [output_path]
+        else:
+            # Decode once into an in-memory register and resize each variant from it;
+            # -delete 0--1 clears every frame of the list, not just the last one
+            arguments += source + ['-write', 'mpr:source', '-delete', '0--1']
+            for resize_param, output_path in variants[:-1]:
+                arguments += ['mpr:source'] + resize_arguments(resize_param, output_path)
+                arguments += ['-write', output_path, '-delete', '0--1']
+            resize_param, output_path = variants[-1]
+            arguments += ['mpr:source'] + resize_arguments(resize_param, output_path) + [output_path]
+        run_convert(arguments, progress, limits, cancel)
+
+    @staticmethod
+    def svg_arguments(file_path, source_size, variants, profile=None):
+        """Render every variant from the vector source at the density that gives its size"""
+        arguments = []
+        for index, (resize_param, output_path) in enumerate(variants):
+            target_size = compute_target_size(source_size[0], source_size[1], resize_param)
+            # Keep transparency, except in formats without alpha where it would turn black
+            background = 'white' if output_path.lower().endswith(JPEG_EXTENSIONS + ('.bmp',)) else 'none'
+            arguments += ['-background', background,
+                          '-density', f'{svg_density(source_size, target_size):g}', file_path,
+                          # Only evens out rounding in the rendered size
+                          '-resize', '{}x{}!'.format(*target_size)]
+            if profile:
+                arguments += profile.imagemagick_arguments(output_path)
+            if index < len(variants) - 1:
+                arguments += ['-write', output_path, '+delete']
+            else:
+                arguments.append(output_path)
+        return arguments
+
+
+class PillowBackend(ResizeBackend):
+    """Resize in-process with Pillow"""
+
+    name = 'pillow'
+
+    # Output formats that cannot store an alpha channel
+    OPAQUE_FORMATS = ('JPEG', 'BMP')
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import PIL.Image  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def resize_set(self, file_path, variants, progress=None, limits=None, cancel=None, profile=None,
+                   thumbnail=None):
+        from PIL import Image, UnidentifiedImageError
+
+        progress = progress or (lambda fraction, stage: None)
+
+        output_formats = []
+        for _, output_path in variants:
+            extension = os.path.splitext(output_path)[1].lower()
+            output_format = Image.registered_extensions().get(extension)
+            if output_format is None or output_format not in Image.SAVE:
+                raise UnsupportedImage(f'Pillow cannot write {extension or "files without an extension"}')
+            output_formats.append(output_format)
+
+        try:
+            with Image.open(file_path) as image:
+                if getattr(image, 'n_frames', 1) > 1:
+                    self.resize_animation(image, variants, output_formats, progress, limits, cancel, profile,
+                                          thumbnail)
+                    return
+
+                source_size = image.size
+                decode_size = jpeg_decode_size_for_set(file_path, [param for param, _ in variants], source_size)
+                if decode_size and image.format == 'JPEG':
+                    # Have libjpeg decode at a reduced scale before the Lanczos resample
+                    image.draft(image.mode, decode_size)
+                self.check_memory(image.width, image.height, limits)
+
+                # A large source resized before is mapped from the raster cache instead of decoded again
+                raster_cache = RasterCache.from_environment()
+                source = raster_cache.load(file_path, image.size) if raster_cache else None
+                if source is not None:
+                    print(f"Using the cached decoded raster of {file_path}")
+                else:
+                    source = self.resampleable(image)
+                    if raster_cache:
+                        raster_cache.store(file_path, source)
+                progress(stage_fraction('load', 1.0), 'load')
+                self.check_cancelled(cancel)
+
+                for index, ((resize_param, output_path), output_format) in enumerate(zip(variants, output_formats)):
+                    size = compute_target_size(source_size[0], source_size[1], resize_param)
+                    if thumbnail_preshrink_size(source_size, size, thumbnail):
+                        # reduce() box-shrinks by whole factors until within 3x of the target, Lanczos does the rest
+                        resized = source.resize(size, Image.LANCZOS, reducing_gap=THUMBNAIL_PRESHRINK_FACTOR)
+                        # Keep only what decoding needs; EXIF, ICC profiles, XMP and comments are dropped
+                        resized.info = {key: value for key, value in resized.info.items()
+                                        if key in ('transparency',)}
+                    else:
+                        resized = source.resize(size, Image.LANCZOS)
+                    progress(variant_fraction(index, len(variants), 'resize'), 'resize')
+                    self.check_cancelled(cancel)
+
+                    if output_format in self.OPAQUE_FORMATS and resized.mode not in ('RGB', 'L'):
+                        resized = resized.convert('RGB')
+
+                    options = profile.pillow_options(output_format) if profile else {}
+                    budget = profile.budget_for(output_path) if profile else None
+                    if budget:
+                        self.save_within_budget(self.encoder(resized, output_format, options), output_path,
+                                                budget, limits)
+                    else:
+                        resized.save(output_path, output_format, **options)
+                    progress(variant_fraction(index, len(variants), 'save'), 'save')
+        except UnidentifiedImageError as e:
+            raise UnsupportedImage(str(e))
+        except OSError as e:
+            raise BackendError(f'Resize failed: {e}')
+
+    @staticmethod
+    def resampleable(image):
+        """image in a mode Pillow resamples with Lanczos
+
+        Pillow silently falls back to nearest neighbour for palette and bilevel
+        images, so those are expanded first. Formats that need a palette, like
+        GIF, quantize the result again when saving.
+        """
+        if image.mode == 'P':
+            palette_mode = image.palette.mode if image.palette else 'RGB'
+            has_alpha = 'transparency' in image.info or palette_mode == 'RGBA'
+            return image.convert('RGBA' if has_alpha else 'RGB')
+        if image.mode == '1':
+            return image.convert('L')
+        image.load()
+        return image
+
+    @staticmethod
+    def encoder(image, output_format, options):
+        """encode(quality) for save_within_budget"""
+        def encode(quality):
+            buffer = io.BytesIO()
+            image.save(buffer, output_format, **dict(options, quality=quality))
+            return buffer.getvalue()
+        return encode
+
+    def resize_animation(self, image, variants, output_formats, progress, limits, cancel, profile, thumbnail):
+        """Resize every frame of an animated GIF or WebP, spread over limits.threads threads
+
+        Pillow composites each frame onto the ones before it while seeking, so
+        the frames come out coalesced and can be resized independently.
+        """
+        from PIL import Image, ImageSequence
+
+        limits = limits or ResourceLimits.from_environment()
+        source_size = image.size
+        animated_outputs = [output_path.lower().endswith(ANIMATED_EXTENSIONS) for _, output_path in variants]
+        # Still outputs only need the first frame
+        frame_count = image.n_frames if any(animated_outputs) else 1
+        self.check_memory(source_size[0], source_size[1] * frame_count, limits)
+        loop = image.info.get('loop')
+
+        frames = []
+        durations = []
+        for frame in ImageSequence.Iterator(image):
+            frames.append(frame.convert('RGBA'))
+            durations.append(frame.info.get('duration', DEFAULT_FRAME_DURATION))
+            self.check_cancelled(cancel)
+            if len(frames) == frame_count:
+                break
+        has_alpha = any(frame.getextrema()[3][0] < 255 for frame in frames)
+        if not has_alpha:
+            frames = [frame.convert('RGB') for frame in frames]
+        progress(stage_fraction('load', 1.0), 'load')
+
+        workers = max(1, min(limits.threads, len(frames)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for index, ((resize_param, output_path), output_format, animated) in enumerate(
+                    zip(variants, output_formats, animated_outputs)):
+                size = compute_target_size(source_size[0], source_size[1], resize_param)
+                reducing_gap = (THUMBNAIL_PRESHRINK_FACTOR
+                                if thumbnail_preshrink_size(source_size, size, thumbnail) else None)
+                # Pillow releases the GIL while resampling, so the frames resize on every core at once
+                resized = list(pool.map(lambda frame: frame.resize(size, Image.LANCZOS, reducing_gap=reducing_gap),
+                                        frames if animated else frames[:1]))
+                progress(variant_fraction(index, len(variants), 'resize'), 'resize')
+                self.check_cancelled(cancel)
+
+                options = profile.pillow_options(output_format) if profile else {}
+                if len(resized) > 1:
+                    options.update(save_all=True, append_images=resized[1:], duration=durations)
+                    if loop is not None:
+                        options['loop'] = loop
+                    if output_format == 'GIF':
+                        # Pillow crops each frame to the area that changed; transparent frames are
+                        # cleared to the background first so uncovered pixels don't linger
+                        options.update(disposal=2 if has_alpha else 1, optimize=True)
+                elif output_format in self.OPAQUE_FORMATS and resized[0].mode != 'RGB':
+                    resized[0] = resized[0].convert('RGB')
+                budget = profile.budget_for(output_path) if profile else None
+                if budget:
+                    # Animated WebP outputs are searched too, every trial encoding all frames
+                    self.save_within_budget(self.encoder(resized[0], output_format, options), output_path,
+                                            budget, limits)
+                else:
+                    resized[0].save(output_path, output_format, **options)
+                progress(variant_fraction(index, len(variants), 'save'), 'save')
+
+
+class GdkPixbufBackend(ResizeBackend):
+    """Resize in-process with GdkPixbuf"""
+
+    name = 'gdkpixbuf'
+
+    # The librsvg loader renders SVGs at any requested size
+    renders_svg = True
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import gi
+            gi.require_version('GdkPixbuf', '2.0')
+            from gi.repository import GdkPixbuf  # noqa: F401
+            return True
+        except (ImportError, ValueError):
+            return False
+
+    @staticmethod
+    def writable_format(extension):
+        """Find the name of a writable pixbuf format for a file extension"""
+        from gi.repository import GdkPixbuf
+
+        for pixbuf_format in GdkPixbuf.Pixbuf.get_formats():
+            if pixbuf_format.is_writable() and extension in pixbuf_format.get_extensions():
+                return pixbuf_format.get_name()
+        return None
+
+    def resize_set(self, file_path, variants, progress=None, limits=None, cancel=None, profile=None,
+                   thumbnail=None):
+        import gi
+        gi.require_version('GdkPixbuf', '2.0')
+        from gi.repository import GdkPixbuf, GLib
+
+        progress = progress or (lambda fraction, stage: None)
+
+        # Pixbuf only loads the first frame of an animation; still GIFs and WebPs load like any image
+        if read_frame_count(file_path) > 1:
+            raise UnsupportedImage('Animated images are handled by ImageMagick')
+
+        pixbuf_types = []
+        for _, output_path in variants:
+            extension = os.path.splitext(output_path)[1].lower().lstrip('.')
+            pixbuf_type = self.writable_format(extension)
+            if pixbuf_type is None:
+                raise UnsupportedImage(f'GdkPixbuf cannot write .{extension}')
+            pixbuf_types.append(pixbuf_type)
+
+        if is_svg(file_path):
+            self.render_svg(file_path, variants, pixbuf_types, progress, limits, cancel, profile)
+            return
+
+        source_size = read_header_dimensions(file_path)
+        decode_size = jpeg_decode_size_for_set(file_path, [param for param, _ in variants], source_size)
+        if decode_size:
+            self.check_memory(decode_size[0], decode_size[1], limits)
+        elif source_size:
+            self.check_memory(source_size[0], source_size[1], limits)
+
+        try:
+            if decode_size:
+                # The JPEG loader uses libjpeg's scaled decoding for the requested size
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(file_path, decode_size[0], decode_size[1], True)
+            else:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(file_path)
+        except GLib.Error as e:
+            raise UnsupportedImage(e.message)
+        progress(stage_fraction('load', 1.0), 'load')
+        self.check_cancelled(cancel)
+
+        if not source_size:
+            source_size = (pixbuf.get_width(), pixbuf.get_height())
+        for index, ((resize_param, output_path), pixbuf_type) in enumerate(zip(variants, pixbuf_types)):
+            width, height = compute_target_size(source_size[0], source_size[1], resize_param)
+            source = pixbuf
+            preshrink_size = thumbnail_preshrink_size((pixbuf.get_width(), pixbuf.get_height()),
+                                                      (width, height), thumbnail)
+            if preshrink_size:
+                # Cheap box-filter pass first, so the expensive HYPER filter only sees 3x the target
+                source = pixbuf.scale_simple(preshrink_size[0], preshrink_size[1], GdkPixbuf.InterpType.TILES)
+                if source is None:
+                    raise BackendError('Resize failed: not enough memory to scale image')
+            scaled = source.scale_simple(width, height, GdkPixbuf.InterpType.HYPER)
+            if scaled is None:
+                raise BackendError('Resize failed: not enough memory to scale image')
+            progress(variant_fraction(index, len(variants), 'resize'), 'resize')
+            self.check_cancelled(cancel)
+
+            self.save(scaled, output_path, pixbuf_type, profile, limits)
+            progress(variant_fraction(index, len(variants), 'save'), 'save')
+
+    def save(self, pixbuf, output_path, pixbuf_type, profile, limits):
+        """Write pixbuf with the profile's encoder options, within its file size limit if it has one"""
+        from gi.repository import GLib
+
+        keys, values = profile.pixbuf_options(pixbuf_type) if profile else ([], [])
+        try:
+            budget = profile.budget_for(output_path) if profile else None
+            if budget:
+                def encode(quality):
+                    # Only the quality is searched, every other option comes from the profile
+                    options = dict(zip(keys, values), quality=str(quality))
+                    return pixbuf.save_to_bufferv(pixbuf_type, list(options), list(options.values()))[1]
+
+                self.save_within_budget(encode, output_path, budget, limits)
+            else:
+                pixbuf.savev(output_path, pixbuf_type, keys, values)
+        except GLib.Error as e:
+            raise BackendError(f'Resize failed: {e.message}')
+
+    def render_svg(self, file_path, variants, pixbuf_types, progress, limits, cancel, profile):
+        """Render each variant from the vector source at its target size"""
+        from gi.repository import GdkPixbuf, GLib
+
+        source_size = read_header_dimensions(file_path)
+        if not source_size:
+            source_size = tuple(GdkPixbuf.Pixbuf.get_file_info(file_path)[1:])
+        if not all(source_size):
+            raise UnsupportedImage('GdkPixbuf cannot read the size of this SVG')
+        progress(stage_fraction('load', 1.0), 'load')
+
+        for index, ((resize_param, output_path), pixbuf_type) in enumerate(zip(variants, pixbuf_types)):
+            width, height = compute_target_size(source_size[0], source_size[1], resize_param)
+            self.check_memory(width, height, limits)
+            try:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(file_path, width, height, False)
+            except GLib.Error as e:
+                raise UnsupportedImage(e.message)
+            if pixbuf_type in ('jpeg', 'bmp') and pixbuf.get_has_alpha():
+                # Flatten onto white, as ImageMagick does, instead of saving transparent areas as black
+                pixbuf = pixbuf.composite_color_simple(width, height, GdkPixbuf.InterpType.NEAREST, 255, 1,
+                                                       0xFFFFFFFF, 0xFFFFFFFF)
+            progress(variant_fraction(index, len(variants), 'resize'), 'resize')
+            self.check_cancelled(cancel)
+
+            self.save(pixbuf, output_path, pixbuf_type, profile, limits)
+            progress(variant_fraction(index, len(variants), 'save'), 'save')
+
+
+class VipsBackend(ResizeBackend):
+    """Stream a resize through libvips with bounded memory, for very large images
+
+    libvips pulls the image through the pipeline in small strips, shrinking
+    while it decodes where the format allows, so peak memory depends on the
+    output size rather than the source size.
+    """
+
+    name = 'vips'
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import pyvips  # noqa: F401
+            return True
+        except (ImportError, OSError):
+            return False
+
+    def resize_set(self, file_path, variants, progress=None, limits=None, cancel=None, profile=None,
+                   thumbnail=None):
+        import pyvips
+
+        progress = progress or (lambda fraction, stage: None)
+        # thumbnail() loads a single page
+        if read_frame_count(file_path) > 1:
+            raise UnsupportedImage('Animated images are handled by ImageMagick')
+        # Don't keep decoded strips around between operations
+        pyvips.cache_set_max(0)
+
+        source_size = read_header_dimensions(file_path)
+        try:
+            if not source_size:
+                header = pyvips.Image.new_from_file(file_path, access='sequential')
+                source_size = (header.width, header.height)
+            progress(stage_fraction('load', 1.0), 'load')
+
+            for index, (resize_param, output_path) in enumerate(variants):
+                # A streamed source can only be read once, so every size streams it again
+                width, height = compute_target_size(source_size[0], source_size[1], resize_param)
+                image = pyvips.Image.thumbnail(file_path, width, height=height, size='force')
+                if output_path.lower().endswith(JPEG_EXTENSIONS) and image.hasalpha():
+                    image = image.flatten(background=255)
+
+                image.set_progress(True)
+                image.signal_connect('eval', self.eval_handler(index, len(variants), progress, cancel))
+                options = profile.vips_options(output_path) if profile else {}
+                if thumbnail_preshrink_size(source_size, (width, height), thumbnail):
+                    # thumbnail() already shrinks on load and box-reduces first; only the metadata is left
+                    options['strip'] = True
+                budget = profile.budget_for(output_path) if profile else None
+                if budget:
+                    # Stream the source once into the small resized raster, then only repeat the encode
+                    resized = image.copy_memory()
+                    suffix = os.path.splitext(output_path)[1]
+                    self.save_within_budget(
+                        lambda quality: resized.write_to_buffer(suffix, **dict(options, Q=quality)),
+                        output_path, budget, limits)
+                else:
+                    image.write_to_file(output_path, **options)
+                self.check_cancelled(cancel)
+                progress(variant_fraction(index, len(variants), 'save'), 'save')
+        except pyvips.Error as e:
+            self.check_cancelled(cancel)
+            message = str(e)
+            if 'is not a known file format' in message:
+                raise UnsupportedImage(message)
+            raise BackendError(f'Resize failed: {message}')
+
+    @staticmethod
+    def eval_handler(index, count, progress, cancel):
+        """Report streaming progress and stop the pipeline once cancelled"""
+        def on_eval(image, eval_progress):
+            if cancel and cancel.is_cancelled():
+                image.set_kill(True)
+                return
+            # Decode, resample and encode happen together while streaming
+            start = variant_fraction(index - 1, count, 'save') if index else stage_fraction('load', 1.0)
+            end = variant_fraction(index, count, 'save')
+            progress(start + (end - start) * eval_progress.percent / 100.0, 'resize')
+        return on_eval
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PillowBackend, GdkPixbufBackend, ImageMagickBackend, VipsBackend)
+}
+
+# Preference order when the backend is 'auto'
+AUTO_ORDER = ('pillow', 'gdkpixbuf', 'imagemagick')
+
+
+def get_backend(name=None):
+    """Return a backend instance by name, the IMAGE_RESIZER_BACKEND variable or auto-detection"""
+    name = (name or os.environ.get(BACKEND_ENV_VAR) or 'auto').lower()
+
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            if BACKENDS[candidate].is_available():
+                return BACKENDS[candidate]()
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown resize backend '{name}', choose from: auto, {', '.join(BACKENDS)}")
+
+    backend_class = BACKENDS[name]
+    if not backend_class.is_available():
+        print(f"Warning: {name} backend is not available, using ImageMagick")
+        return ImageMagickBackend()
+    return backend_class()
+
+
+def svg_backend():
+    """Backend for SVG sources when the selected one can't render them: GdkPixbuf, else ImageMagick"""
+    if GdkPixbufBackend.is_available():
+        return GdkPixbufBackend()
+    return ImageMagickBackend()
+
+
+def streaming_backend(file_path, limits):
+    """(backend, limits) for streaming a source too large to resize in memory, or None
+
+    Chosen from the probed dimensions: libvips when installed and the source
+    is a still image, otherwise ImageMagick with its pixel cache on disk.
+    """
+    source_size = read_header_dimensions(file_path)
+    if not source_size or not needs_streaming(source_size[0], source_size[1], limits):
+        return None
+    if VipsBackend.is_available() and read_frame_count(file_path) == 1:
+        return VipsBackend(), limits
+    return ImageMagickBackend(), limits.for_streaming(*source_size)
@@ -0,0 +1,278 @@
+"""Batch resizing of many images on a bounded process pool"""
+
+import os
+import queue
+import time
+
+from .limits import CancelToken, ResourceLimits
+from .resize_operation import ResizeOperation
+from .trace import start_trace
+
+
+class BatchJob:
+    """A single file in a batch resize
+
+    variants, a list of (resize_param, output_path) pairs, produces several
+    sizes from one decode; output_path is then the first of them.
+    """
+
+    def __init__(self, file_path, output_path, width=None, height=None, percentage=None, backend=None,
+                 variants=None, profile=None, thumbnail=None):
+        self.file_path = file_path
+        self.output_path = output_path
+        self.variants = variants
+        # Wall-clock time the job was handed to the pool, for the queue wait in traces
+        self.submitted_at = None
+        self.width = width
+        self.height = height
+        self.percentage = percentage
+        self.backend = backend
+        self.profile = profile
+        self.thumbnail = thumbnail
+
+
+class BatchResult:
+    """Outcome of a batch resize"""
+
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = []
+        self.failed = []
+        self.elapsed = 0.0
+        self.bytes_processed = 0
+        self.cancelled = False
+
+    @property
+    def completed(self):
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def images_per_second(self):
+        return len(self.succeeded) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        return self.bytes_processed / (1024 * 1024) / self.elapsed if self.elapsed else 0.0
+
+
+# Set in each pool worker by _init_worker
+_worker_limits = None
+_worker_cancel = None
+
+
+def _init_worker(limits, cancel_event):
+    """Pool initializer - share the batch's limits and cancel event with the worker"""
+    global _worker_limits, _worker_cancel
+    _worker_limits = limits
+    _worker_cancel = CancelToken(cancel_event)
+
+
+def run_job(job, limits=None, cancel=None, trace=None, raise_errors=False):
+    """Resize one file of a batch without desktop notifications and return success status"""
+    if job.variants:
+        return ResizeOperation.perform_resize_set(
+            job.file_path,
+            job.variants,
+            None,
+            notify=False,
+            backend=job.backend,
+            limits=limits,
+            cancel=cancel,
+            trace=trace,
+            profile=job.profile,
+            thumbnail=job.thumbnail,
+            raise_errors=raise_errors
+        )
+    return ResizeOperation.perform_resize(
+        job.file_path,
+        job.width,
+        job.height,
+        None,
+        job.output_path,
+        None,
+        percentage=job.percentage,
+        notify=False,
+        backend=job.backend,
+        limits=limits,
+        cancel=cancel,
+        trace=trace,
+        profile=job.profile,
+        thumbnail=job.thumbnail,
+        raise_errors=raise_errors
+    )
+
+
+def _run_job(job):
+    """Worker entry point - resize one file with the batch's limits and cancel event"""
+    if _worker_cancel is not None and _worker_cancel.is_cancelled():
+        return False
+    trace = start_trace('batch_job', source=job.file_path)
+    if job.submitted_at is not None:
+        trace.add('queue_wait', time.time() - job.submitted_at)
+    return run_job(job, _worker_limits, _worker_cancel, trace)
+
+
+# Seconds to wait for new jobs or finished ones before checking for cancellation again
+POLL_INTERVAL = 0.2
+
+
+def default_worker_count():
+    """Number of workers to use when none is given: one per CPU"""
+    return os.cpu_count() or 1
+
+
+class JobQueue:
+    """Jobs for a batch that is already running, such as files a folder scan is still finding
+
+    The batch keeps taking jobs from the queue until close() is called.
+    """
+
+    def __init__(self, jobs=()):
+        self.queue = queue.Queue()
+        for job in jobs:
+            self.put(job)
+
+    def put(self, job):
+        self.queue.put(job)
+
+    def close(self):
+        """No more jobs will be added"""
+        self.queue.put(None)
+
+    def get(self, timeout=None):
+        """The next job, None once the queue is closed; raises queue.Empty after timeout"""
+        return self.queue.get(timeout=timeout)
+
+
+class BatchResize:
+    """Dispatches resize jobs to a process pool sized to the CPU count
+
+    jobs is either a list or a JobQueue that is filled while the batch runs.
+    """
+
+    def __init__(self, jobs, max_workers=None, on_file_done=None, on_progress=None):
+        if isinstance(jobs, JobQueue):
+            self.jobs = None
+            self.job_queue = jobs
+            self.max_workers = max(1, max_workers or default_worker_count())
+        else:
+            self.jobs = list(jobs)
+            self.job_queue = JobQueue(self.jobs)
+            self.job_queue.close()
+            self.max_workers = max(1, min(max_workers or default_worker_count(), len(self.jobs) or 1))
+        self.on_file_done = on_file_done
+        self.on_progress = on_progress
+        self.cancel_requested = False
+        self.cancel_event = None
+
+    def cancel(self):
+        """Stop the batch: queued files are skipped and running resizes are killed"""
+        self.cancel_requested = True
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+    def run(self):
+        """Run every job and return a BatchResult once the batch has finished"""
+        result = BatchResult(len(self.jobs) if self.jobs is not None else 0)
+        if self.jobs == []:
+            return result
+
+        start = time.monotonic()
+        trace = start_trace('batch', workers=self.max_workers)
+
+        # Imported here so that importing this module stays cheap
+        import multiprocessing
+        from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+
+        # Spawn fresh interpreters: forking a process that has GTK running is not safe
+        context = multiprocessing.get_context('spawn')
+        self.cancel_event = context.Event()
+        if self.cancel_requested:
+            self.cancel_event.set()
+
+        # Jobs running at the same time share the memory and thread budget
+        limits = ResourceLimits.from_environment().for_workers(self.max_workers)
+
+        received = 0
+        queue_closed = False
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(limits, self.cancel_event)) as executor:
+            futures = {}
+            while True:
+                # Keep a few jobs queued per worker; the rest wait here, so cancelling skips them cheaply
+                while not queue_closed and not self.cancel_requested and len(futures) < self.max_workers * 2:
+                    try:
+                        # Only wait for new jobs when there is nothing running to collect
+                        job = self.job_queue.get(timeout=0 if futures else POLL_INTERVAL)
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        queue_closed = True
+                        break
+                    received += 1
+                    result.total = max(result.total, received)
+                    with trace.stage('submit'):
+                        job.submitted_at = time.time()
+                        futures[executor.submit(_run_job, job)] = job
+
+                if self.cancel_requested and not result.cancelled:
+                    result.cancelled = True
+                    for pending in futures:
+                        pending.cancel()
+                if not futures:
+                    if queue_closed or self.cancel_requested:
+                        break
+                    continue
+
+                done, _ = wait(futures, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = futures.pop(future)
+                    try:
+                        success = future.result()
+                        error = None if success else ('Cancelled' if self.cancel_requested else 'Resize failed')
+                    except CancelledError:
+                        success = False
+                        error = 'Cancelled'
+                    except Exception as e:
+                        success = False
+                        error = str(e)
+
+                    if success:
+                        result.succeeded.append(job)
+                        try:
+                            result.bytes_processed += os.path.getsize(job.file_path)
+                        except OSError:
+                            pass
+                    else:
+                        result.failed.append(job)
+
+                    if self.on_file_done:
+                        self.on_file_done(job, success, error)
+                    if self.on_progress:
+                        self.on_progress(result.completed, result.total)
+
+        if self.cancel_requested:
+            self._skip_queued(result, received)
+
+        result.cancelled = self.cancel_requested
+        result.elapsed = time.monotonic() - start
+        trace.set(images=result.total, failed=len(result.failed))
+        trace.finish('cancelled' if result.cancelled else 'failed' if result.failed else 'success')
+        return result
+
+    def _skip_queued(self, result, received):
+        """Report the jobs a cancelled batch never submitted as cancelled"""
+        while True:
+            try:
+                job = self.job_queue.get(timeout=0)
+            except queue.Empty:
+                return
+            if job is None:
+                return
+            received += 1
+            result.total = max(result.total, received)
+            result.failed.append(job)
+            if self.on_file_done:
+                self.on_file_done(job, False, 'Cancelled')
+            if self.on_progress:
+                self.on_progress(result.completed, result.total)
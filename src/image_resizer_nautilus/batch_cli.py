@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Headless batch resizer.
+Resizes files, directories and glob patterns without a display, for servers and cron jobs.
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+from .backends import BACKENDS, parse_resize_param
+from .batch import BatchJob, BatchResize, default_worker_count
+from .cache import CACHE_ENV_VAR, OutputCache
+from .encoding import PROFILES, get_profile
+from .limits import parse_size
+from .raster_cache import RASTER_CACHE_ENV_VAR
+from .resize_operation import ResizeOperation
+from .trace import TRACE_ENV_VAR
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.svg')
+
+# --format choices mapped to the GUI's output format indices
+FORMAT_CHOICES = {'same': 0, 'png': 1, 'jpeg': 2, 'webp': 3}
+
+
+def is_image(path):
+    """Check whether a path looks like an image we can resize"""
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def scan_directory(directory, recursive):
+    """Yield (image_path, base_dir) for the images in a directory"""
+    if recursive:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if is_image(name):
+                    yield os.path.join(root, name), directory
+    else:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if is_image(name) and os.path.isfile(path):
+                yield path, directory
+
+
+def collect_inputs(inputs, recursive):
+    """Expand files, directories and glob patterns into (image_path, base_dir) pairs"""
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = scan_directory(item, recursive)
+        elif os.path.isfile(item):
+            candidates = [(item, os.path.dirname(item))]
+        else:
+            matches = sorted(glob.glob(item, recursive=True))
+            if not matches:
+                print(f"⚠️  No files match: {item}", file=sys.stderr)
+            candidates = []
+            for match in matches:
+                if os.path.isdir(match):
+                    candidates.extend(scan_directory(match, recursive))
+                elif is_image(match):
+                    candidates.append((match, os.path.dirname(match)))
+
+        for path, base_dir in candidates:
+            real_path = os.path.realpath(path)
+            if real_path not in seen:
+                seen.add(real_path)
+                yield path, base_dir
+
+
+def read_file_list(list_path):
+    """Read one input path per line from a file, or stdin for '-'"""
+    if list_path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(list_path) as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def build_jobs(inputs, args):
+    """Turn the collected inputs into batch jobs"""
+    format_index = FORMAT_CHOICES[args.format]
+    profile = get_profile(args.profile).with_max_bytes(args.max_size) if args.max_size else args.profile
+    jobs = []
+    for file_path, base_dir in inputs:
+        if args.output_dir:
+            # Mirror the source tree below the output directory
+            relative_dir = os.path.relpath(os.path.dirname(file_path) or '.', base_dir or '.')
+            output_dir = os.path.normpath(os.path.join(args.output_dir, relative_dir))
+        else:
+            output_dir = None
+        if args.sizes:
+            variants = ResizeOperation.build_variants(file_path, args.sizes, args.formats, output_dir)
+            jobs.append(BatchJob(file_path, variants[0][1], backend=args.backend, variants=variants,
+                                 profile=profile, thumbnail=args.thumbnail))
+            continue
+        output_path = ResizeOperation.build_output_path(file_path, format_index, output_dir, args.suffix)
+        jobs.append(BatchJob(file_path, output_path, args.width, args.height, args.percent, args.backend,
+                             profile=profile, thumbnail=args.thumbnail))
+    return jobs
+
+
+def parse_sizes(text):
+    """Parse a comma separated list of sizes such as 320,640,1280x720,x480,50%"""
+    sizes = []
+    for item in text.split(','):
+        item = item.strip()
+        try:
+            width, height, percentage = parse_resize_param(item)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid size '{item}'")
+        if width is None and height is None and percentage is None:
+            raise argparse.ArgumentTypeError(f"invalid size '{item}'")
+        sizes.append((width, height, percentage))
+    return sizes
+
+
+def parse_max_size(text):
+    """Parse a file size such as 200KB or 1.5MiB into bytes"""
+    try:
+        max_bytes = parse_size(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}'")
+    if max_bytes < 1:
+        raise argparse.ArgumentTypeError('the maximum file size must be positive')
+    return max_bytes
+
+
+def parse_formats(text):
+    """Parse a comma separated list of --format choices into output format indices"""
+    formats = []
+    for item in text.split(','):
+        item = item.strip().lower()
+        if item not in FORMAT_CHOICES:
+            raise argparse.ArgumentTypeError(
+                f"invalid format '{item}', choose from: {', '.join(FORMAT_CHOICES)}"
+            )
+        formats.append(FORMAT_CHOICES[item])
+    return formats
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='image-resizer-batch',
+        description='Resize many images without a display.'
+    )
+    parser.add_argument('inputs', nargs='*', help='image files, directories or glob patterns')
+    parser.add_argument('-f', '--from-file', metavar='LIST',
+                        help="read input paths from LIST, one per line ('-' for stdin)")
+    parser.add_argument('-r', '--recursive', action='store_true', help='descend into subdirectories')
+    parser.add_argument('-W', '--width', type=int, help='target width in pixels')
+    parser.add_argument('-H', '--height', type=int, help='target height in pixels')
+    parser.add_argument('-p', '--percent', type=float, help='scale each image to this percentage of its size')
+    parser.add_argument('--format', choices=FORMAT_CHOICES, default='same', help='output format')
+    parser.add_argument('--sizes', type=parse_sizes, metavar='LIST',
+                        help='write several sizes from one decode, e.g. 320,640,1280,1920 (widths), '
+                             'x480, 640x480 or 50%%; files get _320w style suffixes')
+    parser.add_argument('--formats', type=parse_formats, metavar='LIST',
+                        help='with --sizes, write every size in each of these formats, e.g. jpeg,webp')
+    parser.add_argument('-o', '--output-dir', help='write resized images here instead of next to the source')
+    parser.add_argument('--suffix', default='_resized', help='text appended to output file names')
+    parser.add_argument('-j', '--jobs', type=int, default=default_worker_count(),
+                        help='number of images to resize in parallel (default: CPU count)')
+    parser.add_argument('--backend', choices=['auto'] + list(BACKENDS), help='resize backend')
+    parser.add_argument('--profile', choices=list(PROFILES),
+                        help='JPEG, PNG and WebP encoder settings: fast, balanced (default) or smallest')
+    parser.add_argument('--max-size', type=parse_max_size, metavar='SIZE',
+                        help='keep JPEG and WebP output under SIZE, e.g. 200KB, by lowering the quality')
+    parser.add_argument('--no-thumbnail', dest='thumbnail', action='store_false', default=None,
+                        help='resize large reductions with the full-quality filter and keep their metadata')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always resize instead of reusing cached outputs')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write per-stage timings of every job to FILE '
+                             '(JSON lines, or a Prometheus textfile when FILE ends in .prom)')
+
+    args = parser.parse_args(argv)
+    if args.sizes:
+        if args.width is not None or args.height is not None or args.percent is not None:
+            parser.error('--sizes cannot be combined with --width, --height or --percent')
+        args.formats = args.formats or [FORMAT_CHOICES[args.format]]
+    elif args.formats:
+        parser.error('--formats needs --sizes')
+    elif args.width is None and args.height is None and args.percent is None:
+        parser.error('give --width, --height, --percent or --sizes')
+    if args.percent is not None and (args.width is not None or args.height is not None):
+        parser.error('--percent cannot be combined with --width or --height')
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if not args.inputs and not args.from_file:
+        parser.error('no inputs given')
+    return args
+
+
+def main(argv=None):
+    """Resize every matching image and print a throughput summary"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    inputs = list(args.inputs)
+    if args.from_file:
+        inputs.extend(read_file_list(args.from_file))
+
+    jobs = build_jobs(collect_inputs(inputs, args.recursive), args)
+    if not jobs:
+        print("❌ No images found")
+        return 1
+
+    if args.no_cache:
+        # Inherited by the worker processes
+        os.environ[CACHE_ENV_VAR] = 'off'
+    # A batch decodes each source once, so decoded rasters would never be read back
+    os.environ.setdefault(RASTER_CACHE_ENV_VAR, 'off')
+    if args.trace:
+        os.environ[TRACE_ENV_VAR] = os.path.abspath(args.trace)
+    cache = OutputCache.from_environment()
+    cache_before = cache.stats() if cache else None
+
+    print(f"Resizing {len(jobs)} images with {min(args.jobs, len(jobs))} jobs...")
+
+    def on_file_done(job, success, error):
+        if success and job.variants:
+            print(f"✅ {job.file_path} -> {len(job.variants)} files")
+        elif success:
+            print(f"✅ {job.file_path} -> {job.output_path}")
+        else:
+            print(f"❌ {job.file_path}: {error}")
+
+    result = BatchResize(jobs, max_workers=args.jobs, on_file_done=on_file_done).run()
+
+    print("")
+    print(f"Resized {len(result.succeeded)} of {result.total} images in {result.elapsed:.2f}s")
+    print(f"Throughput: {result.images_per_second:.1f} images/s, {result.megabytes_per_second:.1f} MB/s")
+    print(f"Failures: {len(result.failed)}")
+    if cache:
+        cache_after = cache.stats()
+        print(f"Cache: {cache_after['hits'] - cache_before['hits']} hits, "
+              f"{cache_after['misses'] - cache_before['misses']} misses, "
+              f"{cache_after['bytes'] / (1024 * 1024):.1f} MB in {cache_after['entries']} entries")
+    return 1 if result.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
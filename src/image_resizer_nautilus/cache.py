@@ -0,0 +1,238 @@
+"""Cache of resized outputs keyed on the source image and resize settings
+
+Re-running a resize over a folder where most sources haven't changed copies
+(or reflinks) the cached result instead of resizing again, and skips the work
+entirely when the target file is still the one we wrote.
+
+Configuration comes from the environment:
+
+    IMAGE_RESIZER_CACHE          off, fast (size + mtime + inode, default) or content (SHA-256)
+    IMAGE_RESIZER_CACHE_SIZE_MB  on-disk size limit, least recently used entries are evicted (default 512)
+    IMAGE_RESIZER_CACHE_DIR      cache location (default ~/.cache/image-resizer-nautilus/outputs)
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+from .fileutil import clone_file, temp_path
+
+CACHE_ENV_VAR = 'IMAGE_RESIZER_CACHE'
+CACHE_SIZE_ENV_VAR = 'IMAGE_RESIZER_CACHE_SIZE_MB'
+CACHE_DIR_ENV_VAR = 'IMAGE_RESIZER_CACHE_DIR'
+
+DEFAULT_SIZE_LIMIT_MB = 512
+KEY_MODES = ('fast', 'content')
+
+# Bump when the key layout changes so old entries are never matched
+KEY_VERSION = 1
+
+
+def default_cache_dir():
+    """Cache location following the XDG base directory spec"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'image-resizer-nautilus', 'outputs')
+
+
+def file_digest(file_path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class OutputCache:
+    """On-disk LRU cache of resized images with hit/miss counters"""
+
+    def __init__(self, cache_dir=None, size_limit_mb=DEFAULT_SIZE_LIMIT_MB, key_mode='fast'):
+        if key_mode not in KEY_MODES:
+            raise ValueError(f"Unknown cache key mode '{key_mode}', choose from: {', '.join(KEY_MODES)}")
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.size_limit = int(size_limit_mb * 1024 * 1024)
+        self.key_mode = key_mode
+        self.entries_dir = os.path.join(self.cache_dir, 'entries')
+        self.targets_dir = os.path.join(self.cache_dir, 'targets')
+        self.stats_path = os.path.join(self.cache_dir, 'stats.json')
+        self.lock_path = os.path.join(self.cache_dir, 'lock')
+
+    @classmethod
+    def from_environment(cls):
+        """Build the cache configured by the environment, or None when caching is off"""
+        mode = os.environ.get(CACHE_ENV_VAR, 'fast').lower()
+        if mode in ('off', '0', 'no', 'false'):
+            return None
+        try:
+            size_limit_mb = float(os.environ.get(CACHE_SIZE_ENV_VAR, DEFAULT_SIZE_LIMIT_MB))
+        except ValueError:
+            size_limit_mb = DEFAULT_SIZE_LIMIT_MB
+        return cls(os.environ.get(CACHE_DIR_ENV_VAR), size_limit_mb, mode)
+
+    def source_fingerprint(self, file_path):
+        """Identify the source contents, cheaply from its stat or exactly from a hash"""
+        if self.key_mode == 'content':
+            return file_digest(file_path)
+        st = os.stat(file_path)
+        return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def make_key(self, file_path, resize_param, output_path, variant=''):
+        """Cache key for resizing file_path with resize_param into output_path's format"""
+        output_format = os.path.splitext(output_path)[1].lower()
+        parts = [str(KEY_VERSION), self.key_mode, self.source_fingerprint(file_path),
+                 resize_param, output_format, variant]
+        return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+    def entry_path(self, key, output_path):
+        extension = os.path.splitext(output_path)[1].lower()
+        return os.path.join(self.entries_dir, key[:2], key + extension)
+
+    def target_record_path(self, output_path):
+        target_id = hashlib.sha256(os.path.abspath(output_path).encode()).hexdigest()
+        return os.path.join(self.targets_dir, target_id[:2], target_id)
+
+    def is_target_current(self, key, output_path):
+        """True when output_path is still exactly what we last wrote for this key"""
+        try:
+            with open(self.target_record_path(output_path)) as f:
+                record = json.load(f)
+            st = os.stat(output_path)
+        except (OSError, ValueError):
+            return False
+        return (record.get('key') == key and record.get('size') == st.st_size
+                and record.get('mtime_ns') == st.st_mtime_ns)
+
+    def lookup(self, key, output_path):
+        """Produce output_path without resizing if possible; returns True on a hit"""
+        if self.is_target_current(key, output_path):
+            self._update_stats(hits=1)
+            return True
+
+        entry = self.entry_path(key, output_path)
+        if not os.path.exists(entry):
+            self._update_stats(misses=1)
+            return False
+        try:
+            clone_file(entry, output_path)
+            # Mark the entry as recently used for LRU eviction
+            os.utime(entry)
+        except OSError:
+            self._update_stats(misses=1)
+            return False
+
+        self._record_target(key, output_path)
+        self._update_stats(hits=1)
+        return True
+
+    def store(self, key, output_path):
+        """Add a freshly resized output to the cache"""
+        entry = self.entry_path(key, output_path)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            existed = os.path.exists(entry)
+            previous_size = os.path.getsize(entry) if existed else 0
+            clone_file(output_path, entry)
+            self._record_target(key, output_path)
+            stats = self._update_stats(bytes=os.path.getsize(entry) - previous_size,
+                                       entries=0 if existed else 1)
+        except OSError as e:
+            print(f"Warning: could not cache {output_path}: {e}")
+            return
+
+        if stats['bytes'] > self.size_limit:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size limit"""
+        with self._locked():
+            entries = []
+            for root, _, files in os.walk(self.entries_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.size_limit:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+
+            stats = self._read_stats()
+            stats['bytes'] = total
+            stats['entries'] = len(entries) - evicted
+            stats['evictions'] += evicted
+            self._write_stats(stats)
+
+    def stats(self):
+        """Counters and current size of the cache"""
+        with self._locked():
+            return self._read_stats()
+
+    def clear(self):
+        """Delete every cached entry and target record, keeping the counters"""
+        with self._locked():
+            shutil.rmtree(self.entries_dir, ignore_errors=True)
+            shutil.rmtree(self.targets_dir, ignore_errors=True)
+            stats = self._read_stats()
+            stats['bytes'] = 0
+            stats['entries'] = 0
+            self._write_stats(stats)
+
+    def _record_target(self, key, output_path):
+        st = os.stat(output_path)
+        record_path = self.target_record_path(output_path)
+        os.makedirs(os.path.dirname(record_path), exist_ok=True)
+        tmp_path = temp_path(record_path)
+        with open(tmp_path, 'w') as f:
+            json.dump({'key': key, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}, f)
+        os.replace(tmp_path, record_path)
+
+    @contextmanager
+    def _locked(self):
+        # Batch workers in other processes share the cache, so counters are updated under a lock
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_stats(self):
+        stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+        try:
+            with open(self.stats_path) as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    def _write_stats(self, stats):
+        tmp_path = temp_path(self.stats_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, self.stats_path)
+
+    def _update_stats(self, **deltas):
+        try:
+            with self._locked():
+                stats = self._read_stats()
+                for name, delta in deltas.items():
+                    stats[name] += delta
+                self._write_stats(stats)
+                return stats
+        except OSError:
+            return self._read_stats()
@@ -0,0 +1,163 @@
+"""Encoder profiles for JPEG, PNG and WebP output
+
+Each profile trades encode time against output size:
+
+    fast      baseline JPEG, zlib level 1 without PNG row filters, quickest WebP method
+    balanced  progressive JPEG, zlib level 6 with adaptive filters, default WebP method (default)
+    smallest  progressive optimised JPEG at lower quality, zlib level 9, slowest WebP method
+
+Pick one with IMAGE_RESIZER_PROFILE or per job. Each backend maps the profile
+onto its own encoder options; settings a backend has no equivalent for are
+left at its defaults.
+
+A profile can also carry a maximum file size for JPEG and WebP output, see
+with_max_bytes. The profile's quality is then the most the encoder may use.
+"""
+
+import copy
+import os
+
+from .backends import JPEG_EXTENSIONS
+
+PROFILE_ENV_VAR = 'IMAGE_RESIZER_PROFILE'
+DEFAULT_PROFILE = 'balanced'
+
+# ImageMagick PNG filter types: 0 is none, 5 adaptive
+PNG_FILTER_NONE = 0
+PNG_FILTER_ADAPTIVE = 5
+
+
+def output_kind(output_path):
+    """'jpeg', 'png', 'webp' or None for formats the profiles don't cover"""
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension in JPEG_EXTENSIONS:
+        return 'jpeg'
+    if extension in ('.png', '.webp'):
+        return extension[1:]
+    return None
+
+
+class EncoderProfile:
+    """Encoder settings for one speed/size trade-off"""
+
+    def __init__(self, name, jpeg_quality, jpeg_progressive, jpeg_optimize, chroma_subsampling,
+                 png_level, png_filter, webp_quality, webp_method):
+        self.name = name
+        self.jpeg_quality = jpeg_quality
+        self.jpeg_progressive = jpeg_progressive
+        self.jpeg_optimize = jpeg_optimize
+        # '4:2:0', '4:2:2' or '4:4:4'
+        self.chroma_subsampling = chroma_subsampling
+        self.png_level = png_level
+        self.png_filter = png_filter
+        self.webp_quality = webp_quality
+        # 0 (fastest) to 6 (smallest)
+        self.webp_method = webp_method
+        # Largest JPEG or WebP output in bytes, or None for no limit
+        self.max_bytes = None
+
+    def with_max_bytes(self, max_bytes):
+        """A copy of the profile that keeps JPEG and WebP output within max_bytes"""
+        profile = copy.copy(self)
+        profile.max_bytes = max_bytes or None
+        return profile
+
+    @property
+    def key(self):
+        """Identifies the settings, e.g. for output cache keys"""
+        return f'{self.name}:max{self.max_bytes}' if self.max_bytes else self.name
+
+    def describe(self):
+        if self.max_bytes:
+            return f'{self.name} encoding, at most {self.max_bytes / 1000:g} KB'
+        return f'{self.name} encoding'
+
+    def budget_for(self, output_path):
+        """(max_bytes, highest quality) when output_path has a size limit, otherwise None"""
+        kind = output_kind(output_path)
+        if not self.max_bytes or kind not in ('jpeg', 'webp'):
+            return None
+        return self.max_bytes, self.jpeg_quality if kind == 'jpeg' else self.webp_quality
+
+    def imagemagick_arguments(self, output_path):
+        """convert settings to place before writing output_path"""
+        kind = output_kind(output_path)
+        if kind == 'jpeg':
+            arguments = ['-quality', str(self.jpeg_quality),
+                         '-interlace', 'JPEG' if self.jpeg_progressive else 'none',
+                         '-sampling-factor', self.chroma_subsampling]
+            if self.max_bytes:
+                # The JPEG coder searches for the highest quality that fits by itself
+                arguments += ['-define', f'jpeg:extent={self.max_bytes}']
+            return arguments
+        if kind == 'png':
+            # For PNG, -quality is the zlib level in the tens and the filter type in the units
+            return ['-quality', str(self.png_level * 10 + self.png_filter)]
+        if kind == 'webp':
+            arguments = ['-quality', str(self.webp_quality), '-define', f'webp:method={self.webp_method}']
+            if self.max_bytes:
+                # libwebp converges on the size over several encoding passes
+                arguments += ['-define', f'webp:target-size={self.max_bytes}', '-define', 'webp:pass=10']
+            return arguments
+        return []
+
+    def pillow_options(self, output_format):
+        """Keyword arguments for Image.save"""
+        if output_format == 'JPEG':
+            return {'quality': self.jpeg_quality, 'progressive': self.jpeg_progressive,
+                    'optimize': self.jpeg_optimize, 'subsampling': self.chroma_subsampling}
+        if output_format == 'PNG':
+            return {'compress_level': self.png_level}
+        if output_format == 'WEBP':
+            return {'quality': self.webp_quality, 'method': self.webp_method}
+        return {}
+
+    def pixbuf_options(self, pixbuf_type):
+        """(keys, values) for Pixbuf.savev"""
+        if pixbuf_type == 'jpeg':
+            return ['quality'], [str(self.jpeg_quality)]
+        if pixbuf_type == 'png':
+            return ['compression'], [str(self.png_level)]
+        if pixbuf_type == 'webp':
+            return ['quality'], [str(self.webp_quality)]
+        return [], []
+
+    def vips_options(self, output_path):
+        """Keyword arguments for Image.write_to_file"""
+        kind = output_kind(output_path)
+        if kind == 'jpeg':
+            return {'Q': self.jpeg_quality, 'interlace': self.jpeg_progressive,
+                    'optimize_coding': self.jpeg_optimize,
+                    'subsample_mode': 'off' if self.chroma_subsampling == '4:4:4' else 'on'}
+        if kind == 'png':
+            return {'compression': self.png_level,
+                    'filter': 'none' if self.png_filter == PNG_FILTER_NONE else 'all'}
+        if kind == 'webp':
+            return {'Q': self.webp_quality, 'effort': self.webp_method}
+        return {}
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        EncoderProfile('fast', jpeg_quality=85, jpeg_progressive=False, jpeg_optimize=False,
+                       chroma_subsampling='4:2:0', png_level=1, png_filter=PNG_FILTER_NONE,
+                       webp_quality=80, webp_method=0),
+        EncoderProfile('balanced', jpeg_quality=85, jpeg_progressive=True, jpeg_optimize=True,
+                       chroma_subsampling='4:2:0', png_level=6, png_filter=PNG_FILTER_ADAPTIVE,
+                       webp_quality=80, webp_method=4),
+        EncoderProfile('smallest', jpeg_quality=75, jpeg_progressive=True, jpeg_optimize=True,
+                       chroma_subsampling='4:2:0', png_level=9, png_filter=PNG_FILTER_ADAPTIVE,
+                       webp_quality=75, webp_method=6),
+    )
+}
+
+
+def get_profile(name=None):
+    """Return a profile by name, the IMAGE_RESIZER_PROFILE variable or the default"""
+    if isinstance(name, EncoderProfile):
+        return name
+    name = (name or os.environ.get(PROFILE_ENV_VAR) or DEFAULT_PROFILE).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoder profile '{name}', choose from: {', '.join(PROFILES)}")
+    return PROFILES[name]
@@ -8,6 +8,38 @@ import os
 import subprocess
 import sys
 
+DBUS_SERVICE_NAME = "com.github.faghmie.ImageResizer"
+DBUS_SERVICE_PATH = os.path.expanduser(
+    f"~/.local/share/dbus-1/services/{DBUS_SERVICE_NAME}.service"
+)
+DESKTOP_FILE_PATH = os.path.expanduser(
+    f"~/.local/share/applications/{DBUS_SERVICE_NAME}.desktop"
+)
+
+def install_dbus_service(package_dir):
+    """Register the resizer for D-Bus activation so context-menu clicks reach a resident instance"""
+    package_parent = os.path.dirname(package_dir)
+    os.makedirs(os.path.dirname(DBUS_SERVICE_PATH), exist_ok=True)
+    with open(DBUS_SERVICE_PATH, 'w') as f:
+        f.write("[D-BUS Service]\n")
+        f.write(f"Name={DBUS_SERVICE_NAME}\n")
+        f.write(f"Exec=/usr/bin/env PYTHONPATH={package_parent} {sys.executable} "
+                f"-m image_resizer_nautilus.image_resizer --gapplication-service\n")
+
+def install_desktop_file(package_dir):
+    """Name the application, so GNOME Shell shows the notifications it sends"""
+    package_parent = os.path.dirname(package_dir)
+    os.makedirs(os.path.dirname(DESKTOP_FILE_PATH), exist_ok=True)
+    with open(DESKTOP_FILE_PATH, 'w') as f:
+        f.write("[Desktop Entry]\n")
+        f.write("Type=Application\n")
+        f.write("Name=Image Resizer\n")
+        f.write("Icon=image-x-generic\n")
+        f.write(f"Exec=/usr/bin/env PYTHONPATH={package_parent} {sys.executable} "
+                f"-m image_resizer_nautilus.image_resizer %F\n")
+        # Only opened from the Nautilus context menu, never listed with the launchable apps
+        f.write("NoDisplay=true\n")
+
 def main():
     """Create the nautilus extension symlink"""
     try:
@@ -48,6 +80,19 @@ def main():
             print("❌ Symlink created but target not accessible")
             return 1
         
+        # Register the resident resizer service
+        try:
+            install_dbus_service(package_dir)
+            print(f"✅ Registered D-Bus service: {DBUS_SERVICE_PATH}")
+        except OSError as e:
+            print(f"⚠️  Could not register D-Bus service ({e}), the resizer will start per click")
+        
+        try:
+            install_desktop_file(package_dir)
+            print(f"✅ Installed desktop file: {DESKTOP_FILE_PATH}")
+        except OSError as e:
+            print(f"⚠️  Could not install desktop file ({e}), notifications will not belong to the app")
+        
         # Restart nautilus to load the extension
         print("🔄 Restarting nautilus...")
         try:
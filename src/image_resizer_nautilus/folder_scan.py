@@ -0,0 +1,136 @@
+"""Asynchronous scan of a folder for images
+
+The folder is listed with Gio's asynchronous enumerator on the GTK main loop,
+SCAN_BATCH_SIZE entries at a time, so even a directory with hundreds of
+thousands of files never blocks the window. Images are recognised by their
+sniffed content type rather than their extension, and every batch of images
+found is handed on straight away, so resizing can start long before the scan
+has finished.
+"""
+
+import os
+
+SCAN_BATCH_SIZE = 100
+
+# standard::content-type sniffs the file contents when the name is not conclusive
+SCAN_ATTRIBUTES = 'standard::name,standard::type,standard::content-type,standard::is-hidden'
+
+# Formats every backend can read
+IMAGE_MIME_TYPES = frozenset((
+    'image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/x-bmp', 'image/webp',
+    'image/tiff', 'image/svg+xml',
+))
+
+
+def is_resizable_content_type(content_type):
+    """True for the content types of images we can resize"""
+    from gi.repository import Gio
+
+    if not content_type:
+        return False
+    return Gio.content_type_get_mime_type(content_type) in IMAGE_MIME_TYPES
+
+
+class FolderScanner:
+    """Finds the images in a folder, optionally including its subfolders
+
+    ``on_found(paths)`` is called on the main loop with each batch of image
+    paths and ``on_finished()`` once the scan is complete or cancelled.
+    Hidden files and folders are skipped and symlinks are not followed, so a
+    recursive scan can't loop.
+    """
+
+    def __init__(self, folder_path, recursive=False, on_found=None, on_finished=None):
+        from gi.repository import Gio
+
+        self.folder_path = folder_path
+        self.recursive = recursive
+        self.on_found = on_found
+        self.on_finished = on_finished
+        self.cancellable = Gio.Cancellable()
+        self.pending_directories = [Gio.File.new_for_path(folder_path)]
+        self.excluded = set()
+        self.found = 0
+        self.finished = False
+
+    def start(self):
+        self._scan_next_directory()
+
+    def cancel(self):
+        self.cancellable.cancel()
+
+    def exclude(self, path):
+        """Don't descend into path, e.g. the folder resized images are written to"""
+        self.excluded.add(os.path.realpath(path))
+
+    def _finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        if self.on_finished:
+            self.on_finished()
+
+    def _scan_next_directory(self):
+        from gi.repository import Gio, GLib
+
+        if self.cancellable.is_cancelled() or not self.pending_directories:
+            self._finish()
+            return
+        directory = self.pending_directories.pop(0)
+        directory.enumerate_children_async(
+            SCAN_ATTRIBUTES,
+            Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
+            GLib.PRIORITY_LOW,
+            self.cancellable,
+            self._on_enumerated,
+            directory
+        )
+
+    def _on_enumerated(self, directory, result, _):
+        from gi.repository import GLib
+
+        try:
+            enumerator = directory.enumerate_children_finish(result)
+        except GLib.Error as e:
+            if not self.cancellable.is_cancelled():
+                print(f"Skipping {directory.get_path()}: {e.message}")
+            self._scan_next_directory()
+            return
+        enumerator.next_files_async(SCAN_BATCH_SIZE, GLib.PRIORITY_LOW, self.cancellable,
+                                    self._on_files, directory)
+
+    def _on_files(self, enumerator, result, directory):
+        from gi.repository import Gio, GLib
+
+        try:
+            infos = enumerator.next_files_finish(result)
+        except GLib.Error as e:
+            if not self.cancellable.is_cancelled():
+                print(f"Error listing {directory.get_path()}: {e.message}")
+            infos = []
+
+        if not infos:
+            enumerator.close_async(GLib.PRIORITY_LOW, None, None, None)
+            self._scan_next_directory()
+            return
+
+        directory_path = directory.get_path()
+        images = []
+        for info in infos:
+            if info.get_is_hidden():
+                continue
+            path = os.path.join(directory_path, info.get_name())
+            file_type = info.get_file_type()
+            if file_type == Gio.FileType.DIRECTORY:
+                if self.recursive and os.path.realpath(path) not in self.excluded:
+                    self.pending_directories.append(directory.get_child(info.get_name()))
+            elif file_type == Gio.FileType.REGULAR and is_resizable_content_type(info.get_content_type()):
+                images.append(path)
+
+        if images and not self.cancellable.is_cancelled():
+            self.found += len(images)
+            if self.on_found:
+                self.on_found(sorted(images))
+
+        enumerator.next_files_async(SCAN_BATCH_SIZE, GLib.PRIORITY_LOW, self.cancellable,
+                                    self._on_files, directory)
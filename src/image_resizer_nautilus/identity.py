@@ -0,0 +1,77 @@
+"""Outputs that need no pixel work
+
+Resizing to the source's own size in its own format would only decode and
+re-encode the image, costing CPU and quality for nothing. Such outputs are
+cloned from the source instead, which shares its data on copy-on-write
+filesystems. A JPEG that only has to get smaller to meet a file size limit
+is first rewritten losslessly by jpegtran, without metadata and with
+optimised Huffman tables, before any quality is given up.
+"""
+
+import os
+import shutil
+import subprocess
+
+from .backends import JPEG_EXTENSIONS, compute_target_size
+from .fileutil import clone_file
+from .limits import DEFAULT_TIME_LIMIT
+from .probe import read_header_dimensions
+
+# Extensions that name the same format
+FORMAT_ALIASES = {'.tif': '.tiff', **{extension: '.jpg' for extension in JPEG_EXTENSIONS}}
+
+
+def _format_of(path):
+    extension = os.path.splitext(path)[1].lower()
+    return FORMAT_ALIASES.get(extension, extension)
+
+
+def same_format(file_path, output_path):
+    """True when output_path would be written in the format of file_path"""
+    return _format_of(file_path) == _format_of(output_path)
+
+
+def is_identity(file_path, resize_param, output_path, source_size=None):
+    """True when resizing file_path to resize_param as output_path would not change any pixel"""
+    if not same_format(file_path, output_path):
+        return False
+    source_size = source_size or read_header_dimensions(file_path)
+    if not source_size:
+        return False
+    return compute_target_size(source_size[0], source_size[1], resize_param) == source_size
+
+
+def lossless_jpeg(file_path, output_path, progressive=True):
+    """Rewrite a JPEG without metadata and with optimised Huffman tables; False without jpegtran"""
+    if not shutil.which('jpegtran'):
+        return False
+    command = ['jpegtran', '-copy', 'none', '-optimize']
+    if progressive:
+        command.append('-progressive')
+    result = subprocess.run(command + ['-outfile', output_path, file_path],
+                            capture_output=True, text=True, timeout=DEFAULT_TIME_LIMIT)
+    return result.returncode == 0
+
+
+def write_unchanged(file_path, resize_param, output_path, profile, source_size=None):
+    """Write output_path without resizing when that gives the requested result
+
+    Returns 'copy' or 'lossless' for the way the output was written, or None
+    when it needs a real resize. profile is an encoding.EncoderProfile.
+    """
+    if not is_identity(file_path, resize_param, output_path, source_size):
+        return None
+
+    in_place = os.path.exists(output_path) and os.path.samefile(file_path, output_path)
+    budget = profile.budget_for(output_path)
+    if not budget or os.path.getsize(file_path) <= budget[0]:
+        if not in_place:
+            clone_file(file_path, output_path)
+        return 'copy'
+
+    lossless = file_path.lower().endswith(JPEG_EXTENSIONS) and not in_place
+    if lossless and lossless_jpeg(file_path, output_path, profile.jpeg_progressive):
+        if os.path.getsize(output_path) <= budget[0]:
+            return 'lossless'
+    # Still too large: give up quality in a real re-encode
+    return None
@@ -2,83 +2,350 @@
 
 import sys
 import os
-import subprocess
+import time
 import gi
 
-import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Gio', '2.0')
-from gi.repository import Gtk, Gio
+gi.require_version('Pango', '1.0')
+from gi.repository import Gtk, Gio, Pango
+
+from .backends import thumbnail_enabled
+from .batch import BatchJob, run_job
+from .encoding import DEFAULT_PROFILE, PROFILE_ENV_VAR, PROFILES
+from .folder_scan import FolderScanner
+from .preview import DEFAULT_PREVIEW_SIZE, PreviewRenderer, load_preview_source, render_preview
+from .probe import probe_dimensions
+from .progress import ProgressTracker, format_duration
+from .resize_operation import ResizeOperation
+from .scheduler import (CANCELLED, DONE, FAILED, PENDING, PRIORITY_HIGH, PRIORITY_NORMAL, RUNNING,
+                        get_scheduler)
+from .trace import start_trace
+
+# Well-known name the Nautilus extension sends open requests to over D-Bus
+APPLICATION_ID = "com.github.faghmie.ImageResizer"
+
+# How long the resident instance waits for more requests after its last window closes
+IDLE_TIMEOUT_MS = 5 * 60 * 1000
+
+SERVICE_FLAG = '--gapplication-service'
+
+# image_resizer --folder PATH [--recursive] resizes every image in a folder
+FOLDER_FLAG = '--folder'
+RECURSIVE_FLAG = '--recursive'
+
+# Set by benchmarks/startup.py: report when the first window is shown, then quit
+STARTUP_PROBE_ENV_VAR = 'IMAGE_RESIZER_STARTUP_PROBE'
+STARTUP_PROBE_MARKER = 'image-resizer: first window mapped'
 
 class ImageResizer:
     """Main application class for image resizing"""
     
-    def __init__(self, file_path):
-        self.file_path = file_path
+    def __init__(self, file_paths):
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        self.file_paths = list(file_paths)
+        self.file_path = self.file_paths[0]
         self.original_width = None
         self.original_height = None
         self.window = None
         self.app = None
+        # Times the path from launch to the first frame of the window
+        self.trace = start_trace('window', source=self.file_path, files=len(self.file_paths))
+        self.trace_mark = self.trace.start_time if self.trace.enabled else None
         
     def get_image_dimensions(self):
-        """Get original image dimensions using ImageMagick"""
-        try:
-            result = subprocess.run([
-                'identify', '-format', '%wx%h', self.file_path
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode == 0:
-                dimensions = result.stdout.strip().split('x')
-                self.original_width = int(dimensions[0])
-                self.original_height = int(dimensions[1])
-                return True
-        except:
-            pass
+        """Get original image dimensions from the file header"""
+        dimensions = probe_dimensions(self.file_path)
+        if dimensions:
+            self.original_width, self.original_height = dimensions
+            return True
         
-        # Fallback to default dimensions if we can't get them
-        self.original_width = 1920
-        self.original_height = 1080
+        # Leave the size unknown rather than guessing, so percentage presets aren't wrong
+        self.original_width = None
+        self.original_height = None
         return False
 
+    def open_window(self, app, folder_scan=None):
+        """Open a resize window for the files in an already running application"""
+        if self.trace.enabled:
+            # Application startup and D-Bus registration, or handing over to the resident instance
+            self.trace.add('launch', time.perf_counter() - self.trace_mark)
+        
+        with self.trace.stage('probe'):
+            if not self.get_image_dimensions():
+                print("Warning: Could not get image dimensions")
+        
+        self.app = app
+        with self.trace.stage('build_window'):
+            self.window = MainWindow(self, self.file_paths, self.original_width, self.original_height,
+                                     folder_scan)
+            self.window.set_application(app)
+        if os.environ.get(STARTUP_PROBE_ENV_VAR):
+            self.window.connect('map', self.on_startup_probe_map)
+        if self.trace.enabled:
+            self.trace_mark = time.perf_counter()
+            self.window.connect('map', self.on_trace_map)
+        self.window.present()
+        return self.window
+    
+    def on_trace_map(self, window):
+        """Finish the window trace once the window is on screen"""
+        self.trace.add('map', time.perf_counter() - self.trace_mark)
+        self.trace.finish('success')
+    
+    def on_startup_probe_map(self, window):
+        """Tell the startup benchmark the first window is up and exit"""
+        print(STARTUP_PROBE_MARKER, flush=True)
+        self.app.quit()
+    
     def run(self):
         """Main application entry point"""
-        if not self.get_image_dimensions():
-            print("Warning: Could not get image dimensions, using defaults")
+        # If an instance is already running the files are handed to it and this process exits
+        self.app = ResizerApplication()
+        return self.app.run([sys.argv[0]] + self.file_paths)
+
+
+class FolderResizer:
+    """Resizes every image in a folder, optionally including subfolders
+    
+    The window opens as soon as the scan finds the first image and keeps
+    receiving the rest while the scan continues.
+    """
+    
+    def __init__(self, folder_path, recursive=False):
+        self.folder_path = folder_path
+        self.app = None
+        self.window = None
+        self.scanner = FolderScanner(folder_path, recursive, self.on_found, self.on_finished)
+    
+    def open(self, app):
+        self.app = app
+        # Keep the application running while there is no window yet
+        app.hold()
+        self.scanner.start()
+    
+    def on_found(self, file_paths):
+        """Open the window with the first images; it takes over the scan from here"""
+        self.window = ImageResizer(file_paths).open_window(self.app, folder_scan=self.scanner)
+        self.scanner.on_found = self.window.on_scan_found
+        self.scanner.on_finished = self.window.on_scan_finished
+        self.app.release()
+    
+    def on_finished(self):
+        """Only reached when the scan found no images at all"""
+        self.app.release()
+        ResizeOperation.show_notification(
+            'No images found', f'There are no images to resize in {os.path.basename(self.folder_path)}'
+        )
+
+
+class ResizerApplication(Gtk.Application):
+    """Single-instance application that opens a window for every request
+    
+    The first launch becomes the primary instance and owns APPLICATION_ID on the
+    session bus. Later launches and the Nautilus extension send it file paths,
+    so a new window appears without starting Python and GTK again. The process
+    exits once it has had no windows and no queued resizes for IDLE_TIMEOUT_MS.
+    """
+    
+    def __init__(self):
+        flags = Gio.ApplicationFlags.HANDLES_OPEN
+        if os.environ.get(STARTUP_PROBE_ENV_VAR):
+            # Measure a cold start even when a resident instance is running
+            flags |= Gio.ApplicationFlags.NON_UNIQUE
+        super().__init__(application_id=APPLICATION_ID, flags=flags)
+        self.set_inactivity_timeout(IDLE_TIMEOUT_MS)
+        
+        from gi.repository import GLib
         
-        self.app = Gtk.Application(application_id="com.example.resizer")
-        self.app.hold()
+        # Activated by the extension's folder menu items with (folder path, recursive)
+        resize_folder = Gio.SimpleAction.new('resize-folder', GLib.VariantType.new('(sb)'))
+        resize_folder.connect('activate', self.on_resize_folder)
+        self.add_action(resize_folder)
         
-        self.window = MainWindow(self, self.file_path, self.original_width, self.original_height)
-        self.window.connect("close-request", self.on_close_request)
-        self.window.show()
+        show_queue = Gio.SimpleAction.new('show-queue', None)
+        show_queue.connect('activate', lambda action, parameter: self.show_queue())
+        self.add_action(show_queue)
         
-        return self.app.run(sys.argv)
+        self.queue_window = None
+        # Queued resizes keep the application running even after their window has gone
+        self.holding = False
+        get_scheduler().add_listener(lambda: GLib.idle_add(self.update_hold))
     
-    def on_close_request(self, win):
-        """Handle window close request"""
-        print("Window closing...")
-        self.app.quit()
+    def update_hold(self):
+        busy = get_scheduler().is_busy()
+        if busy and not self.holding:
+            self.hold()
+        elif not busy and self.holding:
+            self.release()
+        self.holding = busy
+        return False
+    
+    def show_queue(self):
+        """Show the window listing pending, running and completed resizes"""
+        if self.queue_window is None:
+            self.queue_window = QueueWindow(get_scheduler())
+            self.queue_window.set_application(self)
+            self.queue_window.connect('close-request', self.on_queue_window_closed)
+        self.queue_window.present()
+    
+    def on_queue_window_closed(self, window):
+        self.queue_window = None
+        return False
+    
+    def do_open(self, files, n_files, hint):
+        """Open one window for all the files of a request"""
+        file_paths = [file.get_path() for file in files]
+        file_paths = [path for path in file_paths if path and os.path.exists(path)]
+        if file_paths:
+            ImageResizer(file_paths).open_window(self)
+    
+    def on_resize_folder(self, action, parameter):
+        """Resize the images of a folder"""
+        folder_path, recursive = parameter.unpack()
+        if os.path.isdir(folder_path):
+            FolderResizer(folder_path, recursive).open(self)
+    
+    def do_activate(self):
+        """Nothing to show without files; started as a service we just wait for requests"""
+        pass
+
+
+class QueueWindow(Gtk.Window):
+    """Pending, running and recently completed resizes of every window"""
+    
+    STATE_LABELS = {
+        PENDING: "Waiting",
+        RUNNING: "Running",
+        DONE: "Done",
+        FAILED: "Failed",
+        CANCELLED: "Cancelled",
+    }
+    
+    # Completed resizes listed below the running and pending ones
+    MAX_FINISHED_ROWS = 50
+    
+    def __init__(self, scheduler):
+        super().__init__(title="Resize Queue")
+        self.scheduler = scheduler
+        self.refresh_queued = False
+        self.set_default_size(420, 480)
+        
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        main_box.set_margin_top(15)
+        main_box.set_margin_bottom(15)
+        main_box.set_margin_start(15)
+        main_box.set_margin_end(15)
+        self.set_child(main_box)
+        
+        self.summary_label = Gtk.Label()
+        self.summary_label.set_halign(Gtk.Align.START)
+        main_box.append(self.summary_label)
+        
+        self.list_box = Gtk.ListBox()
+        self.list_box.set_selection_mode(Gtk.SelectionMode.NONE)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_vexpand(True)
+        scrolled.set_child(self.list_box)
+        main_box.append(scrolled)
+        
+        self.scheduler.add_listener(self.on_scheduler_changed)
+        self.connect('close-request', self.on_close_request)
+        self.refresh()
+    
+    def on_scheduler_changed(self):
+        """Called from worker threads; coalesce into one refresh on the main loop"""
+        from gi.repository import GLib
+        
+        if not self.refresh_queued:
+            self.refresh_queued = True
+            GLib.idle_add(self.refresh)
+    
+    def refresh(self):
+        self.refresh_queued = False
+        running, pending, finished = self.scheduler.snapshot()
+        self.summary_label.set_label(
+            f"{len(running)} running, {len(pending)} waiting, {len(finished)} completed "
+            f"(up to {self.scheduler.max_concurrent} at a time)"
+        )
+        
+        child = self.list_box.get_first_child()
+        while child is not None:
+            next_child = child.get_next_sibling()
+            self.list_box.remove(child)
+            child = next_child
+        
+        for task in running + pending + finished[:self.MAX_FINISHED_ROWS]:
+            self.list_box.append(self.create_row(task))
+        return False
+    
+    def create_row(self, task):
+        row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        row.set_margin_top(4)
+        row.set_margin_bottom(4)
+        
+        title_label = Gtk.Label(label=task.title)
+        title_label.set_halign(Gtk.Align.START)
+        title_label.set_hexpand(True)
+        title_label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
+        
+        state = self.STATE_LABELS[task.state]
+        if task.state == PENDING and task.error:
+            state = f"Retrying (attempt {task.attempts + 1})"
+        state_label = Gtk.Label(label=state)
+        state_label.add_css_class("dim-label")
+        if task.error and task.state == FAILED:
+            state_label.set_tooltip_text(task.error)
+        
+        row.append(title_label)
+        row.append(state_label)
+        return row
+    
+    def on_close_request(self, window):
+        self.scheduler.remove_listener(self.on_scheduler_changed)
         return False
 
 
 class MainWindow(Gtk.Window):
     """Main application window"""
     
-    def __init__(self, resizer, file_path, original_width, original_height):
+    def __init__(self, resizer, file_paths, original_width, original_height, folder_scan=None):
         super().__init__()
         self.resizer = resizer
-        self.file_path = file_path
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        self.file_paths = list(file_paths)
+        self.file_path = self.file_paths[0]
+        # Set when resizing a folder; more files arrive while the scan continues
+        self.folder_scan = folder_scan
+        self.scan_finished = folder_scan is None
+        self.is_batch = len(self.file_paths) > 1 or folder_scan is not None
+        # Settings and progress of a running batch
+        self.batch_settings = None
+        self.batch_total = 0
+        self.batch_succeeded = 0
+        self.batch_failed = 0
+        self.batch_cancelled = False
+        self.batch_tracker = None
+        self.output_paths = set()
         self.original_width = original_width
         self.original_height = original_height
         self.is_resizing = False
         self.progress_timeout_id = None
         
         self.setup_ui()
+        self.connect('close-request', self.on_close_request)
     
     def setup_ui(self):
         """Initialize the user interface"""
-        self.set_title(f"Resize Image: {os.path.basename(self.file_path)}")
-        self.set_default_size(450, 450)  # Increased height for progress bar
+        if self.folder_scan:
+            self.set_title(f"Resize Images in {os.path.basename(self.folder_scan.folder_path)}")
+        elif self.is_batch:
+            self.set_title(f"Resize {len(self.file_paths)} Images")
+        else:
+            self.set_title(f"Resize Image: {os.path.basename(self.file_path)}")
+        self.set_default_size(450, 700)  # Room for the preview and progress bar
         
         # Create main container
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=15)
@@ -89,18 +356,21 @@ class MainWindow(Gtk.Window):
         self.set_child(main_box)
         
         # Create UI sections
-        self.dimensions_section = DimensionsSection(self.original_width, self.original_height)
+        self.dimensions_section = DimensionsSection(self.original_width, self.original_height,
+                                                    len(self.file_paths), not self.scan_finished)
+        self.preview_section = PreviewSection(self.file_path, self.original_width, self.original_height)
         self.preset_section = PresetSection()
         self.custom_size_section = CustomSizeSection(self.original_width, self.original_height)
         self.output_section = OutputSection(self.file_path)
         self.progress_section = ProgressSection()
-        self.button_section = ButtonSection()
+        self.button_section = ButtonSection(None if self.folder_scan else len(self.file_paths))
         
         # Connect signals between sections
         self.connect_signals()
         
         # Add sections to main window
         main_box.append(self.dimensions_section.widget)
+        main_box.append(self.preview_section.widget)
         main_box.append(self.preset_section.widget)
         main_box.append(self.custom_size_section.widget)
         main_box.append(self.output_section.widget)
@@ -134,6 +404,19 @@ class MainWindow(Gtk.Window):
         self.output_section.format_combo.connect("notify::selected", 
                                                self.output_section.on_format_changed,
                                                self.file_path)
+        
+        # Re-render the preview whenever the size settings change
+        self.custom_size_section.width_spin.connect("value-changed", self.on_size_settings_changed)
+        self.custom_size_section.height_spin.connect("value-changed", self.on_size_settings_changed)
+        self.preset_section.combo.connect("notify::selected", self.on_size_settings_changed)
+    
+    def on_size_settings_changed(self, *args):
+        """Update the preview for the current width, height or percentage"""
+        width, height = self.custom_size_section.get_dimensions()
+        percentage = self.custom_size_section.percentage
+        if width is None and height is None and percentage is None:
+            return
+        self.preview_section.schedule(ResizeOperation.build_resize_param(width, height, percentage))
     
     def on_resize_clicked(self, btn):
         """Handle resize button click - now prompts for output file"""
@@ -148,17 +431,46 @@ class MainWindow(Gtk.Window):
             ResizeOperation.show_error('Please enter valid width and/or height values')
             return
         
+        if self.is_batch or self.is_size_set():
+            # One destination folder for the whole selection, or for every size of a set
+            self.show_folder_dialog_async(width, height, format_index)
+            return
+        
         # Generate default output filename
         default_output_path = self.output_section.generate_default_output_path()
         
         # Show file chooser dialog
         self.show_save_dialog_async(default_output_path, width, height, format_index)
     
+    def is_size_set(self):
+        """True when several sizes or formats are written per image"""
+        return (self.preset_section.get_size_set() is not None
+                or len(self.output_section.get_format_indices()) > 1)
+    
     def on_cancel_clicked(self, btn):
-        """Handle cancel button click"""
-        if not self.is_resizing:
+        """Handle cancel button click - stops a running resize, otherwise closes the window"""
+        if self.is_resizing:
+            self.cancel_resize()
+        else:
             self.close()
     
+    def on_close_request(self, window):
+        """Closing the window stops any resize still running"""
+        self.preview_section.stop()
+        if self.folder_scan:
+            self.folder_scan.cancel()
+        if self.is_resizing:
+            self.cancel_resize()
+        return False  # Let the window close
+    
+    def cancel_resize(self):
+        """Kill the running resize (or batch) and leave no partial output behind"""
+        self.batch_cancelled = True
+        # Queued files are dropped, running ones killed
+        get_scheduler().cancel_group(self)
+        self.button_section.cancel_btn.set_sensitive(False)
+        self.progress_section.status_label.set_label("Cancelling...")
+    
     def show_save_dialog_async(self, default_path, width, height, format_index):
         """Show save file dialog asynchronously and handle response"""
         dialog = Gtk.FileDialog(
@@ -190,6 +502,27 @@ class MainWindow(Gtk.Window):
             # User cancelled the dialog or error occurred
             pass
     
+    def show_folder_dialog_async(self, width, height, format_index):
+        """Ask for the folder that receives every resized image in a batch"""
+        dialog = Gtk.FileDialog(title="Save Resized Images To")
+        
+        initial_dir = os.path.dirname(self.file_path)
+        if initial_dir:
+            dialog.set_initial_folder(Gio.File.new_for_path(initial_dir))
+        
+        dialog.select_folder(self, None, self.on_folder_dialog_finished, width, height, format_index)
+    
+    def on_folder_dialog_finished(self, dialog, result, width, height, format_index):
+        """Handle the folder dialog response"""
+        try:
+            folder = dialog.select_folder_finish(result)
+            if folder:
+                self.start_batch_operation(width, height, format_index, folder.get_path())
+        except Exception as e:
+            print(f"Error with folder dialog: {e}")
+            # User cancelled the dialog or error occurred
+            pass
+    
     def create_file_filters(self):
         """Create file filters for the save dialog"""
         filters = Gio.ListStore.new(Gtk.FileFilter)
@@ -227,22 +560,185 @@ class MainWindow(Gtk.Window):
         return filters
     
     def start_resize_operation(self, width, height, format_index, output_path):
-        """Start the resize operation with progress indication"""
+        """Queue the resize on the shared scheduler and show its progress"""
         self.is_resizing = True
         self.progress_section.show_progress()
-        self.button_section.set_buttons_sensitive(False)  # Disable buttons during resize
+        self.button_section.set_resizing(True)  # Cancel stays available to stop the resize
         
         # Start progress animation
         self.start_progress_animation()
         
-        # Start resize in a separate thread to keep UI responsive
-        import threading
-        thread = threading.Thread(
-            target=self.perform_resize_in_thread,
-            args=(width, height, format_index, output_path)
+        scheduler = get_scheduler()
+        if scheduler.is_busy():
+            self.progress_section.status_label.set_label("Waiting for other resizes to finish...")
+        
+        profile = self.output_section.get_profile()
+        thumbnail = self.output_section.get_thumbnail()
+        # A single image the user is waiting for goes ahead of queued batch files
+        scheduler.submit(
+            lambda cancel: self.perform_resize_task(width, height, format_index, output_path,
+                                                    profile, thumbnail, cancel),
+            os.path.basename(self.file_path),
+            priority=PRIORITY_HIGH,
+            group=self,
+            on_done=self.on_resize_done
         )
-        thread.daemon = True
-        thread.start()
+    
+    def start_batch_operation(self, width, height, format_index, output_dir):
+        """Start resizing every selected file with the same settings"""
+        from gi.repository import GLib
+        
+        # A percentage preset scales each image relative to its own size
+        percentage = self.custom_size_section.percentage
+        sizes = self.preset_section.get_size_set() or [(width, height, percentage)]
+        format_indices = self.output_section.get_format_indices() if self.is_size_set() else None
+        # Kept for files a folder scan finds after the batch has started
+        self.batch_settings = (width, height, percentage, sizes, format_index, format_indices, output_dir,
+                               self.output_section.get_profile(), self.output_section.get_thumbnail())
+        self.batch_total = 0
+        self.batch_succeeded = 0
+        self.batch_failed = 0
+        self.batch_cancelled = False
+        self.batch_tracker = ProgressTracker(self.on_batch_progress, GLib.idle_add)
+        
+        if self.folder_scan:
+            # Don't resize the resized images again
+            self.folder_scan.exclude(output_dir)
+        
+        self.is_resizing = True
+        self.progress_section.show_progress()
+        self.progress_section.set_batch_progress(0, len(self.file_paths))
+        self.button_section.set_resizing(True)
+        self.submit_jobs(self.build_jobs(self.file_paths))
+    
+    def build_jobs(self, file_paths):
+        """Batch jobs for file_paths with the settings the batch was started with"""
+        (width, height, percentage, sizes, format_index, format_indices, output_dir,
+         profile, thumbnail) = self.batch_settings
+        jobs = []
+        for file_path in file_paths:
+            if format_indices is not None:
+                # Every size and format comes from a single decode of the source
+                variants = self.output_section.generate_variants(file_path, output_dir, sizes, format_indices)
+                self.output_paths.update(path for _, path in variants)
+                jobs.append(BatchJob(file_path, variants[0][1], variants=variants, profile=profile,
+                                     thumbnail=thumbnail))
+                continue
+            output_path = self.output_section.generate_default_output_path(file_path, output_dir,
+                                                                          format_index=format_index)
+            self.output_paths.add(output_path)
+            if percentage is not None:
+                jobs.append(BatchJob(file_path, output_path, percentage=percentage, profile=profile,
+                                     thumbnail=thumbnail))
+            else:
+                jobs.append(BatchJob(file_path, output_path, width, height, profile=profile,
+                                     thumbnail=thumbnail))
+        return jobs
+    
+    def submit_jobs(self, jobs):
+        """Queue batch files on the shared scheduler, as one group so other windows get their turn"""
+        scheduler = get_scheduler()
+        
+        def run(job, cancel):
+            trace = start_trace('batch_job', source=job.file_path)
+            return run_job(job, scheduler.limits, cancel, trace, raise_errors=True)
+        
+        for job in jobs:
+            self.batch_total += 1
+            scheduler.submit(
+                lambda cancel, job=job: run(job, cancel),
+                os.path.basename(job.file_path),
+                priority=PRIORITY_NORMAL,
+                group=self,
+                on_done=self.on_batch_job_done
+            )
+    
+    def on_scan_found(self, file_paths):
+        """More images from the folder scan; queued right away if the batch is running"""
+        # Output written into the scanned folder can show up in the scan
+        file_paths = [path for path in file_paths if path not in self.output_paths]
+        if not file_paths:
+            return
+        self.file_paths.extend(file_paths)
+        self.dimensions_section.set_file_count(len(self.file_paths), scanning=True)
+        if self.is_resizing and not self.batch_cancelled:
+            self.submit_jobs(self.build_jobs(file_paths))
+    
+    def on_scan_finished(self):
+        """The folder scan is complete: a running batch ends after the files queued so far"""
+        self.scan_finished = True
+        self.dimensions_section.set_file_count(len(self.file_paths), scanning=False)
+        if self.is_resizing:
+            self.finish_batch_if_done()
+    
+    def on_batch_job_done(self, task):
+        """Called by the scheduler for every batch file that has finished"""
+        from gi.repository import GLib
+        GLib.idle_add(self.record_batch_result, task)
+    
+    def record_batch_result(self, task):
+        """Count a finished batch file on the main loop"""
+        if task.state == DONE:
+            self.batch_succeeded += 1
+            self.progress_section.status_label.set_label(f"Resized {task.title}")
+        else:
+            self.batch_failed += 1
+            if task.state == FAILED:
+                print(f"{task.title}: {task.error}")
+            self.progress_section.status_label.set_label(f"Failed: {task.title}")
+        
+        completed = self.batch_succeeded + self.batch_failed
+        self.batch_tracker.update(completed / self.batch_total, (completed, self.batch_total))
+        self.finish_batch_if_done()
+        return False
+    
+    def finish_batch_if_done(self):
+        """Show the summary once every file is done and no more can arrive from a scan"""
+        from gi.repository import GLib
+        
+        if self.batch_succeeded + self.batch_failed < self.batch_total:
+            return
+        if not self.scan_finished and not self.batch_cancelled:
+            return
+        
+        total = self.batch_total
+        succeeded = self.batch_succeeded
+        failed = self.batch_failed
+        self.is_resizing = False
+        self.button_section.set_resizing(False)
+        
+        # One summary notification for the whole batch
+        if self.batch_cancelled:
+            ResizeOperation.show_notification(
+                'Cancelled', f'Resized {succeeded} of {total} images before cancelling'
+            )
+            self.progress_section.status_label.set_label(
+                f"Cancelled - {succeeded} of {total} images resized"
+            )
+        elif failed:
+            ResizeOperation.show_error(f'Resized {succeeded} of {total} images, {failed} failed')
+            self.progress_section.status_label.set_label(
+                f"{failed} of {total} images failed - check error messages"
+            )
+        else:
+            ResizeOperation.show_success(f'Resized {total} images')
+            self.progress_section.status_label.set_label(
+                f"All {total} images resized successfully!"
+            )
+            GLib.timeout_add(2000, self.close_after_success)
+    
+    def on_batch_progress(self, fraction, counts, elapsed, eta):
+        """Show batch progress delivered on the main loop by the ProgressTracker"""
+        completed, total = counts
+        self.progress_section.set_batch_progress(completed, total)
+        self.progress_section.set_times(elapsed, eta)
+    
+    def on_resize_progress(self, fraction, stage, elapsed, eta):
+        """Show real resize progress delivered on the main loop by the ProgressTracker"""
+        # Real progress has arrived, so the bar no longer needs to pulse
+        self.stop_progress_animation()
+        self.progress_section.set_progress(fraction, stage)
+        self.progress_section.set_times(elapsed, eta)
     
     def start_progress_animation(self):
         """Start the progress bar pulsing animation"""
@@ -252,6 +748,7 @@ class MainWindow(Gtk.Window):
             if self.is_resizing:
                 self.progress_section.progress_bar.pulse()
                 return True  # Continue pulsing
+            self.progress_timeout_id = None
             return False  # Stop pulsing
         
         # Pulse every 100ms
@@ -264,39 +761,52 @@ class MainWindow(Gtk.Window):
             GLib.source_remove(self.progress_timeout_id)
             self.progress_timeout_id = None
     
-    def perform_resize_in_thread(self, width, height, format_index, output_path):
-        """Perform resize in a separate thread"""
+    def perform_resize_task(self, width, height, format_index, output_path, profile, thumbnail, cancel):
+        """Resize the image on a scheduler worker; errors are raised so transient ones can be retried"""
         from gi.repository import GLib
         
-        # Update status label
-        def update_status(message):
-            self.progress_section.status_label.set_label(message)
+        GLib.idle_add(self.progress_section.status_label.set_label, "Starting resize operation...")
         
-        GLib.idle_add(update_status, "Starting resize operation...")
+        # Stream backend progress to the bar, rate-limited so the main loop isn't flooded
+        tracker = ProgressTracker(self.on_resize_progress, GLib.idle_add)
         
-        # Perform the resize operation
-        success = ResizeOperation.perform_resize(
+        return ResizeOperation.perform_resize(
             self.file_path, 
             width, 
             height, 
             format_index, 
             output_path, 
-            self
+            self,
+            progress=tracker.update,
+            limits=get_scheduler().limits,
+            cancel=cancel,
+            profile=profile,
+            thumbnail=thumbnail,
+            raise_errors=True
         )
+    
+    def on_resize_done(self, task):
+        """Called by the scheduler once the resize has succeeded, failed for good or been cancelled"""
+        from gi.repository import GLib
+        
+        if task.state == FAILED:
+            ResizeOperation.show_error(task.error)
         
         # Reset UI state
         def reset_ui():
             self.is_resizing = False
             self.stop_progress_animation()
             self.progress_section.hide_progress()
-            self.button_section.set_buttons_sensitive(True)
+            self.button_section.set_resizing(False)
             
-            if success:
-                GLib.idle_add(update_status, "Resize completed successfully!")
+            if task.state == CANCELLED:
+                self.progress_section.status_label.set_label("Resize cancelled")
+            elif task.state == DONE:
+                self.progress_section.status_label.set_label("Resize completed successfully!")
                 # Close window after 2 seconds to let user see success message
                 GLib.timeout_add(2000, self.close_after_success)
             else:
-                GLib.idle_add(update_status, "Resize failed - check error messages")
+                self.progress_section.status_label.set_label("Resize failed - check error messages")
         
         GLib.idle_add(reset_ui)
     
@@ -308,6 +818,12 @@ class MainWindow(Gtk.Window):
 class ProgressSection:
     """Section for progress indication"""
     
+    STAGE_LABELS = {
+        'load': "Loading image...",
+        'resize': "Resizing image...",
+        'save': "Saving image...",
+    }
+    
     def __init__(self):
         self.widget = self.create_widget()
         self.hide_progress()
@@ -326,8 +842,14 @@ class ProgressSection:
         self.status_label = Gtk.Label(label="Preparing to resize...")
         self.status_label.set_halign(Gtk.Align.START)
         
+        # Elapsed time and estimate
+        self.time_label = Gtk.Label(label="")
+        self.time_label.set_halign(Gtk.Align.START)
+        self.time_label.add_css_class("dim-label")
+        
         main_box.append(self.progress_bar)
         main_box.append(self.status_label)
+        main_box.append(self.time_label)
         
         return main_box
     
@@ -335,22 +857,62 @@ class ProgressSection:
         """Show progress bar and start animation"""
         self.widget.set_visible(True)
         self.progress_bar.set_fraction(0.0)
+        self.progress_bar.set_text("Resizing image...")
         self.status_label.set_label("Resizing image...")
+        self.time_label.set_label("")
     
     def hide_progress(self):
         """Hide progress bar"""
         self.widget.set_visible(False)
+    
+    def set_batch_progress(self, completed, total):
+        """Show how many files of a batch are done"""
+        self.progress_bar.set_fraction(completed / total if total else 0.0)
+        self.progress_bar.set_text(f"{completed} / {total} images")
+    
+    def set_progress(self, fraction, stage=None):
+        """Show how far a single resize has got"""
+        self.progress_bar.set_fraction(fraction)
+        self.progress_bar.set_text(f"{int(fraction * 100)}%")
+        if stage in self.STAGE_LABELS:
+            self.status_label.set_label(self.STAGE_LABELS[stage])
+    
+    def set_times(self, elapsed, eta):
+        """Show elapsed time and, once it can be estimated, the time left"""
+        text = f"Elapsed {format_duration(elapsed)}"
+        if eta is not None and eta > 0:
+            text += f", about {format_duration(eta)} left"
+        self.time_label.set_label(text)
 
 
 
 class DimensionsSection:
     """Section displaying original image dimensions"""
     
-    def __init__(self, width, height):
-        self.widget = self.create_widget(width, height)
+    def __init__(self, width, height, file_count=1, scanning=False):
+        self.width = width
+        self.height = height
+        self.widget = self.create_widget(width, height, file_count, scanning)
+    
+    def file_count_label(self, file_count, scanning=False):
+        if scanning:
+            label = f"{file_count} images found so far, still scanning"
+        else:
+            label = f"{file_count} images selected"
+        if self.width and self.height:
+            label += f" (first: {self.width} x {self.height} pixels)"
+        return label
+    
+    def set_file_count(self, file_count, scanning=False):
+        """Update the count while a folder scan is finding more images"""
+        self.widget.set_label(self.file_count_label(file_count, scanning))
     
-    def create_widget(self, width, height):
+    def create_widget(self, width, height, file_count=1, scanning=False):
         """Create the dimensions display widget"""
+        if file_count > 1 or scanning:
+            dim_label = Gtk.Label(label=self.file_count_label(file_count, scanning))
+            dim_label.set_halign(Gtk.Align.START)
+            return dim_label
         if width and height:
             dim_label = Gtk.Label(label=f"Original: {width} x {height} pixels")
             dim_label.set_halign(Gtk.Align.START)
@@ -358,12 +920,115 @@ class DimensionsSection:
         return Gtk.Label(label="Original dimensions: Unknown")
 
 
+class PreviewSection:
+    """Live preview of the resized image, rendered off the main thread"""
+    
+    PREVIEW_HEIGHT = 240
+    # Wait for typing or spinning to pause before rendering
+    DEBOUNCE_MS = 120
+    
+    def __init__(self, file_path, original_width, original_height):
+        self.file_path = file_path
+        self.original_width = original_width
+        self.original_height = original_height
+        self.debounce_id = None
+        self.widget, self.picture, self.size_label = self.create_widget()
+        
+        from gi.repository import GLib
+        max_width, max_height = self.screen_size()
+        self.renderer = PreviewRenderer(
+            lambda: load_preview_source(file_path, max_width, max_height),
+            self.render,
+            self.show_preview,
+            GLib.idle_add
+        )
+        if original_width and original_height:
+            # Start decoding straight away so the first preview is ready sooner
+            self.renderer.submit(f"{original_width}x{original_height}")
+    
+    def create_widget(self):
+        """Create the preview picture and size caption"""
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        
+        picture = Gtk.Picture()
+        picture.set_content_fit(Gtk.ContentFit.CONTAIN)
+        picture.set_can_shrink(True)
+        picture.set_size_request(-1, self.PREVIEW_HEIGHT)
+        
+        size_label = Gtk.Label(label="Preview")
+        size_label.add_css_class("dim-label")
+        
+        main_box.append(picture)
+        main_box.append(size_label)
+        return main_box, picture, size_label
+    
+    @staticmethod
+    def screen_size():
+        """Pixel size of the first monitor, which bounds how large the preview decode needs to be"""
+        from gi.repository import Gdk
+        
+        display = Gdk.Display.get_default()
+        monitors = display.get_monitors() if display else None
+        if not monitors or monitors.get_n_items() == 0:
+            return DEFAULT_PREVIEW_SIZE, DEFAULT_PREVIEW_SIZE
+        monitor = monitors.get_item(0)
+        geometry = monitor.get_geometry()
+        scale = monitor.get_scale_factor()
+        return geometry.width * scale, geometry.height * scale
+    
+    def schedule(self, resize_param):
+        """Render a preview for resize_param once the settings stop changing"""
+        from gi.repository import GLib
+        
+        if not (self.original_width and self.original_height):
+            return
+        if self.debounce_id:
+            GLib.source_remove(self.debounce_id)
+        
+        def submit():
+            self.debounce_id = None
+            self.renderer.submit(resize_param)
+            return False
+        
+        self.debounce_id = GLib.timeout_add(self.DEBOUNCE_MS, submit)
+    
+    def render(self, source, resize_param):
+        """Runs on the renderer thread"""
+        return render_preview(source, self.original_width, self.original_height, resize_param)
+    
+    def show_preview(self, result):
+        """Show a finished render, called on the main loop"""
+        from gi.repository import Gdk
+        
+        pixbuf, (width, height) = result
+        self.picture.set_paintable(Gdk.Texture.new_for_pixbuf(pixbuf))
+        self.size_label.set_label(f"Preview: {width} x {height} pixels")
+    
+    def stop(self):
+        """Stop rendering when the window closes"""
+        if self.debounce_id:
+            from gi.repository import GLib
+            GLib.source_remove(self.debounce_id)
+            self.debounce_id = None
+        self.renderer.stop()
+
+
 class PresetSection:
     """Section for preset size selection"""
     
+    # Widths written by the responsive set preset, each from the same decode
+    RESPONSIVE_WIDTHS = (320, 640, 1280, 1920)
+    RESPONSIVE_INDEX = 14
+    
     def __init__(self):
         self.widget, self.combo = self.create_widget()
     
+    def get_size_set(self):
+        """(width, height, percentage) sizes of the selected set preset, or None for a single size"""
+        if self.combo.get_selected() == self.RESPONSIVE_INDEX:
+            return [(width, None, None) for width in self.RESPONSIVE_WIDTHS]
+        return None
+    
     def create_widget(self):
         """Create the preset selection widget"""
         preset_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
@@ -385,7 +1050,8 @@ class PresetSection:
             "1024x768 (XGA)",
             "1280x720 (HD)",
             "1920x1080 (Full HD)",
-            "3840x2160 (4K)"
+            "3840x2160 (4K)",
+            "Responsive set (320, 640, 1280, 1920 wide)"
         ])
         preset_combo.set_selected(0)
         
@@ -397,6 +1063,14 @@ class PresetSection:
         """Handle preset selection change"""
         preset_index = combo.get_selected()
         if preset_index > 0:  # Not "Select preset..."
+            if preset_index == self.RESPONSIVE_INDEX:
+                # Show the largest size of the set in the custom fields and preview
+                new_width = self.RESPONSIVE_WIDTHS[-1]
+                new_height = 0
+                if original_width and original_height:
+                    new_height = int((new_width * original_height) / original_width)
+                custom_section.set_dimensions(new_width, new_height)
+                return
             # Percentage presets (indices 1-6)
             if preset_index <= 6:
                 percentages = [0, 25, 50, 75, 100, 150, 200]
@@ -405,6 +1079,8 @@ class PresetSection:
                 if original_width and original_height:
                     new_width = int((original_width * percentage) / 100)
                     new_height = int((original_height * percentage) / 100)
+                    custom_section.set_dimensions(new_width, new_height, percentage)
+                return
             else:
                 # Fixed dimension presets (indices 7-13)
                 dimensions = [
@@ -427,6 +1103,8 @@ class CustomSizeSection:
     def __init__(self, original_width, original_height):
         self.original_width = original_width
         self.original_height = original_height
+        # Percentage picked from a preset, cleared as soon as the user edits a value
+        self.percentage = None
         self.widget, self.width_spin, self.height_spin, self.aspect_ratio_check = self.create_widget()
         self.setup_signals()
     
@@ -503,8 +1181,10 @@ class CustomSizeSection:
         self.width_spin.connect("value-changed", self.on_width_changed, self.original_width, self.original_height)
         self.height_spin.connect("value-changed", self.on_height_changed, self.original_width, self.original_height)
     
-    def set_dimensions(self, width, height):
+    def set_dimensions(self, width, height, percentage=None):
         """Set width and height values"""
+        self.percentage = percentage
+        
         # Temporarily block handlers to avoid recursion
         self.width_spin.handler_block_by_func(self.on_width_changed)
         self.height_spin.handler_block_by_func(self.on_height_changed)
@@ -517,6 +1197,7 @@ class CustomSizeSection:
     
     def on_width_changed(self, spin, original_width, original_height):
         """Handle width spin button changes with aspect ratio locking"""
+        self.percentage = None
         if (self.aspect_ratio_check.get_active() and 
             original_width and original_height and
             spin.get_value() > 0 and
@@ -532,6 +1213,7 @@ class CustomSizeSection:
     
     def on_height_changed(self, spin, original_width, original_height):
         """Handle height spin button changes with aspect ratio locking"""
+        self.percentage = None
         if (self.aspect_ratio_check.get_active() and 
             original_width and original_height and
             spin.get_value() > 0 and
@@ -566,9 +1248,19 @@ class CustomSizeSection:
 class OutputSection:
     """Section for output format configuration"""
     
+    # Output format index of the extra copies
+    WEBP_INDEX = 3
+    
+    # Encoder profiles in the order the dropdown shows them
+    PROFILE_NAMES = list(PROFILES)
+    
+    # Maximum JPEG/WebP file size offered when the limit is switched on, in KB
+    DEFAULT_MAX_SIZE_KB = 200
+    
     def __init__(self, file_path):
         self.file_path = file_path
-        self.widget, self.format_combo = self.create_widget()
+        (self.widget, self.format_combo, self.webp_copy_check, self.profile_combo,
+         self.max_size_check, self.max_size_spin, self.thumbnail_check) = self.create_widget()
     
     def create_widget(self):
         """Create the output format widget"""
@@ -591,184 +1283,178 @@ class OutputSection:
         format_box.append(format_combo)
         main_box.append(format_box)
         
-        return main_box, format_combo
+        webp_copy_check = Gtk.CheckButton.new_with_label("Also save WebP copies")
+        webp_copy_check.set_halign(Gtk.Align.START)
+        webp_copy_check.set_tooltip_text("Write a WebP file next to every resized image, from the same decode")
+        main_box.append(webp_copy_check)
+        
+        # Encoder speed/size trade-off
+        profile_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        profile_label = Gtk.Label(label="Encoding:")
+        profile_label.set_size_request(100, -1)
+        
+        profile_combo = Gtk.DropDown.new_from_strings([
+            "Fast (larger files)",
+            "Balanced",
+            "Smallest (slower)"
+        ])
+        default_profile = os.environ.get(PROFILE_ENV_VAR, '').lower()
+        if default_profile not in self.PROFILE_NAMES:
+            default_profile = DEFAULT_PROFILE
+        profile_combo.set_selected(self.PROFILE_NAMES.index(default_profile))
+        profile_combo.set_tooltip_text("JPEG quality and progressive mode, PNG compression level "
+                                       "and WebP effort used when saving")
+        
+        profile_box.append(profile_label)
+        profile_box.append(profile_combo)
+        main_box.append(profile_box)
+        
+        # Byte budget, e.g. for a CMS upload limit
+        max_size_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        max_size_check = Gtk.CheckButton.new_with_label("Max file size:")
+        max_size_check.set_tooltip_text("Lower the JPEG or WebP quality as far as needed to stay under this "
+                                        "size; the image is only resized once")
+        max_size_adjustment = Gtk.Adjustment(
+            value=self.DEFAULT_MAX_SIZE_KB,
+            lower=1,
+            upper=100000,
+            step_increment=10,
+            page_increment=100
+        )
+        max_size_spin = Gtk.SpinButton(adjustment=max_size_adjustment)
+        max_size_spin.set_numeric(True)
+        max_size_spin.set_sensitive(False)
+        max_size_check.connect('toggled', lambda check: max_size_spin.set_sensitive(check.get_active()))
+        
+        max_size_box.append(max_size_check)
+        max_size_box.append(max_size_spin)
+        max_size_box.append(Gtk.Label(label="KB"))
+        main_box.append(max_size_box)
+        
+        thumbnail_check = Gtk.CheckButton.new_with_label("Fast thumbnails for large reductions")
+        thumbnail_check.set_halign(Gtk.Align.START)
+        thumbnail_check.set_tooltip_text("Shrinking to a quarter or less pre-shrinks cheaply before the final "
+                                         "filter and strips metadata such as EXIF and colour profiles")
+        thumbnail_check.set_active(thumbnail_enabled())
+        main_box.append(thumbnail_check)
+        
+        return main_box, format_combo, webp_copy_check, profile_combo, max_size_check, max_size_spin, thumbnail_check
+    
+    def get_profile(self):
+        """The selected encoder profile, with the file size limit when one is set"""
+        profile = PROFILES[self.PROFILE_NAMES[self.profile_combo.get_selected()]]
+        if self.max_size_check.get_active():
+            return profile.with_max_bytes(self.max_size_spin.get_value_as_int() * 1000)
+        return profile
+    
+    def get_thumbnail(self):
+        """Whether large reductions may take the thumbnail path"""
+        return self.thumbnail_check.get_active()
     
     def on_format_changed(self, combo, pspec, file_path):
         """Handle output format changes"""
         # Format change doesn't affect anything until save dialog
         pass
     
-    def generate_default_output_path(self):
-        """Generate default output path based on current settings"""
-        base_name = os.path.splitext(os.path.basename(self.file_path))[0]
+    def get_format_indices(self):
+        """Output format indices to write for every size"""
         format_index = self.format_combo.get_selected()
-        format_ext = [None, '.png', '.jpg', '.webp'][format_index]
-        
-        if format_ext:
-            new_name = f"{base_name}_resized{format_ext}"
-        else:
-            ext = os.path.splitext(self.file_path)[1]
-            new_name = f"{base_name}_resized{ext}"
-        
-        original_dir = os.path.dirname(self.file_path)
-        return os.path.join(original_dir, new_name)
+        if self.webp_copy_check.get_active() and format_index != self.WEBP_INDEX:
+            return [format_index, self.WEBP_INDEX]
+        return [format_index]
+    
+    def generate_default_output_path(self, file_path=None, output_dir=None, suffix='_resized', format_index=None):
+        """Generate default output path based on current settings"""
+        file_path = file_path or self.file_path
+        if format_index is None:
+            format_index = self.format_combo.get_selected()
+        return ResizeOperation.build_output_path(file_path, format_index, output_dir, suffix)
+    
+    def generate_variants(self, file_path, output_dir, sizes, format_indices=None):
+        """(resize_param, output_path) pairs for every size in every selected format
+        
+        Each size gets a predictable suffix such as _640w or _50pct.
+        """
+        if format_indices is None:
+            format_indices = self.get_format_indices()
+        # The same naming as image-resizer-batch --sizes
+        return ResizeOperation.build_variants(file_path, sizes, format_indices, output_dir)
 
 class ButtonSection:
     """Section containing action buttons"""
     
-    def __init__(self):
-        self.widget, self.cancel_btn, self.resize_btn = self.create_widget()
+    def __init__(self, file_count=1):
+        self.widget, self.queue_btn, self.cancel_btn, self.resize_btn = self.create_widget(file_count)
     
-    def create_widget(self):
+    def create_widget(self, file_count=1):
         """Create the button widgets"""
         button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         button_box.set_halign(Gtk.Align.END)
         
+        # Every window's resizes share one queue
+        queue_btn = Gtk.Button.new_with_label("Queue")
+        queue_btn.set_action_name("app.show-queue")
+        queue_btn.set_tooltip_text("Show pending, running and completed resizes")
+        
         cancel_btn = Gtk.Button.new_with_label("Cancel")
-        resize_btn = Gtk.Button.new_with_label("Resize Image")
+        if file_count is None:
+            # A folder whose scan is still running
+            resize_btn = Gtk.Button.new_with_label("Resize All Images")
+        elif file_count > 1:
+            resize_btn = Gtk.Button.new_with_label(f"Resize {file_count} Images")
+        else:
+            resize_btn = Gtk.Button.new_with_label("Resize Image")
         resize_btn.add_css_class("suggested-action")
         
+        button_box.append(queue_btn)
         button_box.append(cancel_btn)
         button_box.append(resize_btn)
         
-        return button_box, cancel_btn, resize_btn
+        return button_box, queue_btn, cancel_btn, resize_btn
     
     def set_buttons_sensitive(self, sensitive):
         """Enable or disable buttons"""
         self.cancel_btn.set_sensitive(sensitive)
         self.resize_btn.set_sensitive(sensitive)
-        
-class ResizeOperation:
-    """Handles the actual image resize operation"""
-    
-    @staticmethod
-    def perform_resize(file_path, width, height, format_index, output_path, parent_window):
-        """Perform the actual image resize operation and return success status"""
-        # Validation
-        if width is None and height is None:
-            ResizeOperation.show_error('Please enter valid width and/or height values')
-            return False
-        
-        if not output_path:
-            ResizeOperation.show_error('No output file selected')
-            return False
-        
-        # Build resize parameter
-        resize_param = ResizeOperation.build_resize_param(width, height)
-        
-        # Prepare output
-        if not ResizeOperation.prepare_output_directory(output_path):
-            return False
-        
-        # Check for existing file
-        if os.path.exists(output_path):
-            # We can't show dialog from thread, so we'll overwrite by default
-            # or could use a different approach for confirmation
-            pass
-        
-        # Execute resize
-        return ResizeOperation.execute_resize(file_path, resize_param, output_path, parent_window)
     
-    @staticmethod
-    def build_resize_param(width, height):
-        """Build the ImageMagick resize parameter"""
-        if width is not None and height is not None:
-            return f"{width}x{height}"
-        elif width is not None:
-            return str(width)
-        elif height is not None:
-            return f"x{height}"
-        return ""
-    
-    @staticmethod
-    def prepare_output_directory(output_path):
-        """Create output directory if it doesn't exist"""
-        output_dir = os.path.dirname(output_path)
-        if output_dir and not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir, exist_ok=True)
-                return True
-            except OSError as e:
-                ResizeOperation.show_error(f'Cannot create directory: {e}')
-                return False
-        return True
+    def set_resizing(self, resizing):
+        """Disable Resize while a resize runs; Cancel stays enabled to stop it"""
+        self.resize_btn.set_sensitive(not resizing)
+        self.cancel_btn.set_sensitive(True)
+        
+def resize_folder(folder_path, recursive=False):
+    """Resize a folder in the running instance, or become the instance and do it here"""
+    from gi.repository import GLib
     
-    @staticmethod
-    def execute_resize(file_path, resize_param, output_path, parent_window):
-        """Execute the ImageMagick resize command and return success status"""
-        try:
-            ResizeOperation.show_notification('Resizing', 'Image resize in progress...')
-            
-            print(f"Resizing {file_path} to {resize_param}, saving to {output_path}")
-            
-            # Use subprocess to run ImageMagick convert command
-            result = subprocess.run(
-                ['convert', file_path, '-resize', resize_param, output_path],
-                capture_output=True, 
-                timeout=30, 
-                text=True
-            )
-            
-            if result.returncode == 0:
-                success_message = f'Resized successfully!\nSaved as: {os.path.basename(output_path)}'
-                print(success_message)
-                ResizeOperation.show_success(success_message)
-                return True
-            else:
-                error_message = f'Resize failed. Return code: {result.returncode}\nError: {result.stderr}'
-                print(error_message)
-                ResizeOperation.show_error(error_message)
-                return False
-                
-        except FileNotFoundError:
-            error_msg = 'ImageMagick not installed. Run: sudo dnf install ImageMagick'
-            print(error_msg)
-            ResizeOperation.show_error(error_msg)
-            return False
-        except subprocess.TimeoutExpired:
-            error_msg = 'Resize operation timed out'
-            print(error_msg)
-            ResizeOperation.show_error(error_msg)
-            return False
-        except Exception as e:
-            error_msg = f'Resize failed: {str(e)}'
-            print(error_msg)
-            ResizeOperation.show_error(error_msg)
-            return False
-    
-    @staticmethod
-    def show_notification(title, message):
-        """Show a desktop notification"""
-        try:
-            subprocess.run(['notify-send', title, message], capture_output=True, timeout=5)
-        except:
-            print(f"Notification: {title} - {message}")
-    
-    @staticmethod
-    def show_error(message):
-        """Show an error notification"""
-        try:
-            subprocess.run(['notify-send', 'Error', message], capture_output=True, timeout=5)
-        except:
-            print(f"Error: {message}")
-    
-    @staticmethod
-    def show_success(message):
-        """Show a success notification"""
-        try:
-            subprocess.run(['notify-send', 'Success', message], capture_output=True, timeout=5)
-        except:
-            print(f"Success: {message}")
-            
+    app = ResizerApplication()
+    app.register(None)
+    app.activate_action('resize-folder', GLib.Variant('(sb)', (folder_path, recursive)))
+    if app.get_is_remote():
+        # Make sure the request has left before this process exits
+        app.get_dbus_connection().flush_sync(None)
+        return 0
+    return app.run([sys.argv[0]])
+
 def main():
-    if len(sys.argv) != 2:
+    if len(sys.argv) < 2:
         return 1
     
-    file_path = sys.argv[1]
-    if not os.path.exists(file_path):
+    if SERVICE_FLAG in sys.argv[1:]:
+        # Started by D-Bus activation: stay resident until idle
+        return ResizerApplication().run(sys.argv)
+    
+    if FOLDER_FLAG in sys.argv[1:]:
+        index = sys.argv.index(FOLDER_FLAG)
+        folder_path = sys.argv[index + 1] if index + 1 < len(sys.argv) else None
+        if not folder_path or not os.path.isdir(folder_path):
+            return 1
+        return resize_folder(os.path.abspath(folder_path), RECURSIVE_FLAG in sys.argv)
+    
+    file_paths = [path for path in sys.argv[1:] if os.path.exists(path)]
+    if not file_paths:
         return 1
     
-    resizer = ImageResizer(file_path)
+    resizer = ImageResizer(file_paths)
     return resizer.run()
 
 if __name__ == '__main__':
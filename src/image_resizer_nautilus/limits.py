@@ -0,0 +1,164 @@
+"""Resource limits and cancellation for resize jobs
+
+Every job runs with memory, memory-map, disk, thread and time limits. The
+defaults are derived from the RAM available when the job starts and can be
+overridden from the environment:
+
+    IMAGE_RESIZER_LIMIT_MEMORY   pixel cache held in RAM, e.g. 2GiB
+    IMAGE_RESIZER_LIMIT_MAP      pixel cache in memory-mapped files
+    IMAGE_RESIZER_LIMIT_DISK     pixel cache spilled to disk
+    IMAGE_RESIZER_LIMIT_THREADS  threads per job
+    IMAGE_RESIZER_LIMIT_TIME     seconds before a job is stopped
+"""
+
+import os
+import re
+import threading
+
+ENV_PREFIX = 'IMAGE_RESIZER_LIMIT_'
+
+DEFAULT_TIME_LIMIT = 300
+DEFAULT_DISK_LIMIT = 4 * 1024 ** 3
+
+# RAM ImageMagick may use for the pixel cache of a streamed resize; the rest goes to disk
+STREAMING_MEMORY_LIMIT = 256 * 1024 ** 2
+
+# Bytes ImageMagick's Q16 pixel cache needs per RGBA pixel
+PIXEL_CACHE_BYTES = 8
+
+# Used when /proc/meminfo can't be read
+FALLBACK_AVAILABLE_MEMORY = 2 * 1024 ** 3
+
+SIZE_UNITS = {
+    '': 1, 'b': 1,
+    'k': 1024, 'kb': 1000, 'kib': 1024,
+    'm': 1024 ** 2, 'mb': 1000 ** 2, 'mib': 1024 ** 2,
+    'g': 1024 ** 3, 'gb': 1000 ** 3, 'gib': 1024 ** 3,
+    't': 1024 ** 4, 'tb': 1000 ** 4, 'tib': 1024 ** 4,
+}
+
+
+def parse_size(text):
+    """Parse a byte size such as 512MiB, 2G or 1048576"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*', text)
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise ValueError(f"Invalid size '{text}'")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def format_size(size):
+    """Format a byte count the way ImageMagick's -limit accepts it, rounded down to whole MiB"""
+    for unit in ('TiB', 'GiB'):
+        factor = SIZE_UNITS[unit.lower()]
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    if size >= SIZE_UNITS['mib']:
+        return f"{size // SIZE_UNITS['mib']}MiB"
+    return str(size)
+
+
+# Environment variable suffixes and how to parse them
+ENV_LIMITS = {
+    'memory': parse_size,
+    'map': parse_size,
+    'disk': parse_size,
+    'threads': int,
+    'time': int,
+}
+
+
+def available_memory():
+    """Bytes of RAM available for new work, from /proc/meminfo"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return FALLBACK_AVAILABLE_MEMORY
+
+
+class ResourceLimits:
+    """Per-job memory, map, disk, thread and time limits"""
+
+    def __init__(self, memory=None, mmap=None, disk=None, threads=None, time=None):
+        if memory is None:
+            # Leave half the available RAM for the rest of the desktop
+            memory = max(256 * 1024 ** 2, available_memory() // 2)
+        self.memory = memory
+        self.mmap = mmap if mmap is not None else memory * 2
+        self.disk = disk if disk is not None else DEFAULT_DISK_LIMIT
+        self.threads = threads if threads is not None else (os.cpu_count() or 1)
+        self.time = time if time is not None else DEFAULT_TIME_LIMIT
+
+    @classmethod
+    def from_environment(cls):
+        """Limits with any IMAGE_RESIZER_LIMIT_* overrides applied"""
+        values = {}
+        for name, parse in ENV_LIMITS.items():
+            text = os.environ.get(ENV_PREFIX + name.upper())
+            if not text:
+                continue
+            try:
+                values[name] = parse(text)
+            except ValueError:
+                print(f"Warning: ignoring invalid {ENV_PREFIX + name.upper()}={text}")
+        if 'map' in values:
+            values['mmap'] = values.pop('map')
+        return cls(**values)
+
+    def for_workers(self, workers):
+        """Split the limits between jobs that run at the same time"""
+        workers = max(1, workers)
+        overridden = {name for name in ('memory', 'map', 'threads')
+                      if os.environ.get(ENV_PREFIX + name.upper())}
+        return ResourceLimits(
+            memory=self.memory if 'memory' in overridden else max(64 * 1024 ** 2, self.memory // workers),
+            mmap=self.mmap if 'map' in overridden else max(128 * 1024 ** 2, self.mmap // workers),
+            disk=self.disk,
+            threads=self.threads if 'threads' in overridden else max(1, self.threads // workers),
+            time=self.time
+        )
+
+    def for_streaming(self, width, height):
+        """Limits that keep a huge image's pixel cache on disk instead of in RAM"""
+        return ResourceLimits(
+            memory=min(self.memory, STREAMING_MEMORY_LIMIT),
+            mmap=min(self.mmap, STREAMING_MEMORY_LIMIT * 2),
+            # The whole source has to fit in the disk cache
+            disk=max(self.disk, width * height * PIXEL_CACHE_BYTES * 2),
+            threads=self.threads,
+            time=self.time
+        )
+
+    def imagemagick_arguments(self):
+        """-limit options for convert"""
+        return [
+            '-limit', 'memory', format_size(self.memory),
+            '-limit', 'map', format_size(self.mmap),
+            '-limit', 'disk', format_size(self.disk),
+            '-limit', 'thread', str(self.threads),
+            '-limit', 'time', str(self.time),
+        ]
+
+    def describe(self):
+        return (f"memory {format_size(self.memory)}, map {format_size(self.mmap)}, "
+                f"disk {format_size(self.disk)}, {self.threads} threads, {self.time}s")
+
+
+class CancelToken:
+    """Lets the UI stop a running resize, killing any child process it started
+
+    ``event`` can be a multiprocessing Event so that pool workers in other
+    processes see the cancellation too.
+    """
+
+    def __init__(self, event=None):
+        self.event = event or threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def is_cancelled(self):
+        return self.event.is_set()
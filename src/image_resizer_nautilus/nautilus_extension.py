@@ -5,8 +5,17 @@ import subprocess
 
 # Import without version specification
 from gi.repository import GObject, Nautilus
+from gi.repository import Gio, GLib
 from gi.repository import Notify
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.svg')
+
+# Resident resizer service (see ResizerApplication in image_resizer.py)
+APPLICATION_ID = 'com.github.faghmie.ImageResizer'
+APPLICATION_PATH = '/com/github/faghmie/ImageResizer'
+# Generous enough for D-Bus activation to cold-start the service
+DBUS_TIMEOUT_MS = 25000
+
 class ImageContextMenuProvider(GObject.GObject, Nautilus.MenuProvider):
     
     def __init__(self):
@@ -15,36 +24,60 @@ class ImageContextMenuProvider(GObject.GObject, Nautilus.MenuProvider):
     
     def get_file_items(self, files):
         """Return menu items for file selection"""
-        if len(files) != 1:
+        images = [file_info for file_info in files if self._is_local_image(file_info)]
+        if not images:
             return []
-            
-        file_info = files[0]
         
+        # Create menu item
+        if len(images) == 1:
+            label = "Resize Image..."
+            tip = "Open resize options dialog"
+        else:
+            label = f"Resize {len(images)} Images..."
+            tip = "Resize all selected images with the same settings"
+        
+        item = Nautilus.MenuItem(
+            name="ImageResize",
+            label=label,
+            tip=tip
+        )
+        item.connect('activate', self._launch_resizer, images)
+        
+        return [item]
+    
+    def _is_local_image(self, file_info):
+        """Check that a selected file is a local image we can resize"""
         # Check if it's a local file
         if file_info.get_uri_scheme() != 'file':
-            return []
+            return False
             
         filename = file_info.get_name()
         if not filename:
-            return []
+            return False
             
         # Check if it's an image
-        image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.svg')
-        if not filename.lower().endswith(image_extensions):
+        return filename.lower().endswith(IMAGE_EXTENSIONS)
+    
+    def get_background_items(self, file):
+        """Return menu items for the background of a folder"""
+        if file.get_uri_scheme() != 'file':
             return []
         
-        # Create menu item
-        item = Nautilus.MenuItem(
-            name="ImageResize",
-            label="Resize Image...",
-            tip="Open resize options dialog"
+        folder_item = Nautilus.MenuItem(
+            name="ImageResizeFolder",
+            label="Resize Images in This Folder...",
+            tip="Resize every image in this folder with the same settings"
         )
-        item.connect('activate', self._launch_resizer, file_info)
+        folder_item.connect('activate', self._launch_folder_resizer, file, False)
         
-        return [item]
-    
-    def get_background_items(self, file):
-        return []
+        recursive_item = Nautilus.MenuItem(
+            name="ImageResizeFolderRecursive",
+            label="Resize Images in This Folder and Subfolders...",
+            tip="Resize every image in this folder and all its subfolders"
+        )
+        recursive_item.connect('activate', self._launch_folder_resizer, file, True)
+        
+        return [folder_item, recursive_item]
     
     def notify(self, message):
         notification = Notify.Notification.new(
@@ -54,23 +87,102 @@ class ImageContextMenuProvider(GObject.GObject, Nautilus.MenuProvider):
         )
         notification.show()
             
-    def _launch_resizer(self, menu, file_info):
-        """Launch the standalone resizer script"""
+    def _launch_resizer(self, menu, files):
+        """Hand the selected images to the resident resizer, starting it if needed"""
         try:
-            file_path = file_info.get_location().get_path()
+            file_paths = [file_info.get_location().get_path() for file_info in files]
+            file_paths = [path for path in file_paths if path and os.path.exists(path)]
             
+            if file_paths:
+                self._open_in_service(file_paths)
+        except Exception as e:
+            print(f"Error launching resizer: {e}")
+    
+    def _launch_folder_resizer(self, menu, folder, recursive):
+        """Hand a folder to the resizer, which scans it itself so Nautilus never waits on a big directory"""
+        try:
+            folder_path = folder.get_location().get_path()
+            if not folder_path or not os.path.isdir(folder_path):
+                return
             
-            if file_path and os.path.exists(file_path):
+            arguments = ['--folder', folder_path] + (['--recursive'] if recursive else [])
+            try:
+                bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+            except GLib.Error as e:
+                print(f"Session bus unavailable ({e.message}), starting resizer directly")
+                self._start_resizer_process(arguments)
+                return
+            
+            bus.call(
+                APPLICATION_ID,
+                APPLICATION_PATH,
+                'org.freedesktop.Application',
+                'ActivateAction',
+                GLib.Variant('(sava{sv})', (
+                    'resize-folder', [GLib.Variant('(sb)', (folder_path, recursive))], {}
+                )),
+                None,
+                Gio.DBusCallFlags.NONE,
+                DBUS_TIMEOUT_MS,
+                None,
+                self._on_service_open_finished,
+                arguments
+            )
+        except Exception as e:
+            print(f"Error launching resizer: {e}")
+    
+    def _open_in_service(self, file_paths):
+        """Ask the resizer service to open a window over D-Bus without blocking Nautilus"""
+        try:
+            bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        except GLib.Error as e:
+            print(f"Session bus unavailable ({e.message}), starting resizer directly")
+            self._start_resizer_process(file_paths)
+            return
+        
+        uris = [Gio.File.new_for_path(path).get_uri() for path in file_paths]
+        # D-Bus activation starts the service if it isn't running yet
+        bus.call(
+            APPLICATION_ID,
+            APPLICATION_PATH,
+            'org.freedesktop.Application',
+            'Open',
+            GLib.Variant('(asa{sv})', (uris, {})),
+            None,
+            Gio.DBusCallFlags.NONE,
+            DBUS_TIMEOUT_MS,
+            None,
+            self._on_service_open_finished,
+            file_paths
+        )
+    
+    def _on_service_open_finished(self, bus, result, arguments):
+        """Fall back to starting the resizer ourselves when the service can't be reached"""
+        try:
+            bus.call_finish(result)
+        except GLib.Error as e:
+            print(f"Resizer service not available ({e.message}), starting resizer directly")
+            self._start_resizer_process(arguments)
+    
+    def _start_resizer_process(self, arguments):
+        """Launch the resizer as a new process with the given file paths or options"""
+        try:
+            if arguments:
                 # Get the directory where this script is located
                 current_dir = os.path.dirname(os.path.realpath(__file__))
                 script_path = os.path.join(current_dir, 'image_resizer.py')
                 
-                # Alternative: if the script is in a known location
-                # script_path = os.path.expanduser('~/.local/share/nautilus-python/extensions/image-resizer.py')
-                
                 if os.path.exists(script_path):
-                    # Use the system Python to run the script
-                    subprocess.Popen(['python3', script_path, file_path])
+                    # Run as a module so the resizer can import the rest of the package
+                    env = dict(os.environ)
+                    package_parent = os.path.dirname(current_dir)
+                    env['PYTHONPATH'] = os.pathsep.join(
+                        filter(None, [package_parent, env.get('PYTHONPATH')])
+                    )
+                    subprocess.Popen(
+                        ['python3', '-m', 'image_resizer_nautilus.image_resizer'] + arguments,
+                        env=env
+                    )
                 else:
                     print(f"Resizer script not found at: {script_path}")
         except Exception as e:
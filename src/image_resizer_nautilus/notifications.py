@@ -0,0 +1,148 @@
+"""Desktop notifications sent in-process without blocking
+
+Inside the resizer application notifications go through Gio.Notification, so
+they belong to the app. GNOME Shell drops those from applications without a
+desktop file, so this is only done when the app's desktop file is installed.
+Anywhere else (pool workers, the batch command, an app without its desktop
+file) they are sent straight to the org.freedesktop.Notifications service, the interface
+libnotify and notify-send use, as an asynchronous D-Bus call that returns
+immediately. Without a session bus they are printed instead.
+
+Errors are rate-limited: within ERROR_INTERVAL of the last error shown,
+further errors are counted and folded into the next error notification.
+"""
+
+import threading
+import time
+
+APP_NAME = 'Image Resizer'
+
+NOTIFICATIONS_BUS_NAME = 'org.freedesktop.Notifications'
+NOTIFICATIONS_PATH = '/org/freedesktop/Notifications'
+
+# Seconds between error notifications
+ERROR_INTERVAL = 5.0
+
+ICONS = {
+    'info': 'image-x-generic',
+    'success': 'emblem-ok-symbolic',
+    'error': 'dialog-error',
+}
+
+# freedesktop urgency hint values
+URGENCY_NORMAL = 1
+URGENCY_CRITICAL = 2
+
+
+class Notifier:
+    """Sends notifications without spawning processes or waiting for the notification server"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bus = None
+        self.bus_failed = False
+        self.last_error_time = None
+        self.suppressed_errors = 0
+        # Application id -> whether its desktop file is installed
+        self.desktop_files = {}
+
+    def notify(self, title, message, kind='info'):
+        """Show a notification; kind is 'info', 'success' or 'error'"""
+        if kind == 'error':
+            with self.lock:
+                now = time.monotonic()
+                if self.last_error_time is not None and now - self.last_error_time < ERROR_INTERVAL:
+                    self.suppressed_errors += 1
+                    print(f"{title}: {message}")
+                    return
+                self.last_error_time = now
+                suppressed, self.suppressed_errors = self.suppressed_errors, 0
+            if suppressed:
+                message += f"\n({suppressed} more {'error' if suppressed == 1 else 'errors'} not shown)"
+
+        if self._send_with_application(title, message, kind):
+            return
+        if self._send_over_dbus(title, message, kind):
+            return
+        print(f"{title}: {message}")
+
+    def _send_with_application(self, title, message, kind):
+        """Use the running Gtk/Gio application, if this process has one"""
+        try:
+            from gi.repository import Gio, GLib
+        except ImportError:
+            return False
+
+        app = Gio.Application.get_default()
+        if app is None or not app.get_is_registered() or not self._has_desktop_file(app.get_application_id()):
+            return False
+
+        notification = Gio.Notification.new(title)
+        notification.set_body(message)
+        notification.set_icon(Gio.ThemedIcon.new(ICONS[kind]))
+        if kind == 'error':
+            notification.set_priority(Gio.NotificationPriority.HIGH)
+
+        # GApplication isn't thread-safe and resizes notify from worker threads
+        GLib.idle_add(self._deliver_with_application, app, kind, notification)
+        return True
+
+    def _has_desktop_file(self, app_id):
+        """True when app_id has an installed desktop file, which org.gtk.Notifications requires"""
+        from gi.repository import Gio
+
+        with self.lock:
+            if app_id not in self.desktop_files:
+                desktop_file = Gio.DesktopAppInfo.new(f'{app_id}.desktop') if app_id else None
+                self.desktop_files[app_id] = desktop_file is not None
+            return self.desktop_files[app_id]
+
+    @staticmethod
+    def _deliver_with_application(app, kind, notification):
+        # Progress and success share an id, so "Resized" replaces "Resizing"; errors stay visible
+        app.send_notification('image-resizer-error' if kind == 'error' else 'image-resizer-status', notification)
+        return False
+
+    def _session_bus(self):
+        with self.lock:
+            if self.bus is None and not self.bus_failed:
+                try:
+                    from gi.repository import Gio, GLib
+                except ImportError:
+                    self.bus_failed = True
+                    return None
+                try:
+                    self.bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+                except GLib.Error:
+                    self.bus_failed = True
+            return self.bus
+
+    def _send_over_dbus(self, title, message, kind):
+        """Call org.freedesktop.Notifications.Notify asynchronously, without waiting for the reply"""
+        bus = self._session_bus()
+        if bus is None:
+            return False
+
+        from gi.repository import Gio, GLib
+
+        urgency = URGENCY_CRITICAL if kind == 'error' else URGENCY_NORMAL
+        parameters = GLib.Variant('(susssasa{sv}i)', (
+            APP_NAME, 0, ICONS[kind], title, message, [],
+            {'urgency': GLib.Variant('y', urgency)}, -1
+        ))
+        bus.call(NOTIFICATIONS_BUS_NAME, NOTIFICATIONS_PATH, NOTIFICATIONS_BUS_NAME, 'Notify',
+                 parameters, None, Gio.DBusCallFlags.NONE, -1, None, None, None)
+        return True
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """The process-wide Notifier"""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = Notifier()
+        return _notifier
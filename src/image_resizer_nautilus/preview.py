@@ -0,0 +1,128 @@
+"""Live resize preview
+
+The source is decoded once, at no more than screen resolution, and kept in
+memory. Every change to the size settings then only rescales that small
+raster, on a background thread, so the dialog stays responsive even for very
+large sources. Requests that arrive while a render is running replace each
+other; only the newest one is rendered and stale results are dropped.
+"""
+
+import threading
+
+from .backends import JPEG_EXTENSIONS, compute_target_size, needs_streaming
+
+# Decode size used when the screen size is unknown
+DEFAULT_PREVIEW_SIZE = 1920
+
+
+def load_preview_source(file_path, max_width, max_height):
+    """Decode file_path scaled to fit max_width x max_height, or None if it can't be read
+
+    The pixbuf JPEG loader asks libjpeg for a DCT-scaled decode, so large photos
+    are never decoded at full size.
+    """
+    import gi
+    gi.require_version('GdkPixbuf', '2.0')
+    from gi.repository import GdkPixbuf, GLib
+
+    try:
+        width, height = GdkPixbuf.Pixbuf.get_file_info(file_path)[1:]
+        # Only JPEGs can be decoded straight to a small size; other huge sources need the full raster
+        huge = width and height and needs_streaming(width, height)
+        if huge and not file_path.lower().endswith(JPEG_EXTENSIONS):
+            return None
+        if width > max_width or height > max_height:
+            return GdkPixbuf.Pixbuf.new_from_file_at_scale(file_path, max_width, max_height, True)
+        return GdkPixbuf.Pixbuf.new_from_file(file_path)
+    except (GLib.Error, TypeError):
+        return None
+
+
+def render_preview(source, original_width, original_height, resize_param):
+    """Scale the cached source to what a resize with resize_param would produce
+
+    Returns the pixbuf to show and the full-size target dimensions. Targets
+    larger than the cached raster show the raster itself, since the preview
+    can't show more detail than the screen anyway.
+    """
+    from gi.repository import GdkPixbuf
+
+    target_width, target_height = compute_target_size(original_width, original_height, resize_param)
+    if target_width >= source.get_width() and target_height >= source.get_height():
+        return source, (target_width, target_height)
+
+    scaled = source.scale_simple(target_width, target_height, GdkPixbuf.InterpType.BILINEAR)
+    return scaled or source, (target_width, target_height)
+
+
+class PreviewRenderer:
+    """Renders previews on one background thread, always the most recent request
+
+    ``load()`` runs once on the thread and returns the cached source (or None).
+    ``render(source, request)`` produces a result for a request and
+    ``deliver(result)`` receives it; results for requests that have been
+    superseded meanwhile are discarded. Pass ``GLib.idle_add`` as ``schedule``
+    to deliver on the GTK main loop.
+    """
+
+    def __init__(self, load, render, deliver, schedule=None):
+        self.load = load
+        self.render = render
+        self.deliver = deliver
+        self.schedule = schedule
+        self.condition = threading.Condition()
+        self.request = None
+        self.generation = 0
+        self.stopped = False
+        self.thread = None
+
+    def submit(self, request):
+        """Ask for a render; replaces any request that hasn't started yet"""
+        with self.condition:
+            self.generation += 1
+            self.request = request
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def stop(self):
+        """Drop pending work and let the thread exit"""
+        with self.condition:
+            self.stopped = True
+            self.generation += 1
+            self.request = None
+            self.condition.notify()
+
+    def is_current(self, generation):
+        with self.condition:
+            return generation == self.generation and not self.stopped
+
+    def _run(self):
+        source = self.load()
+        while True:
+            with self.condition:
+                while self.request is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                request, generation = self.request, self.generation
+                self.request = None
+
+            if source is None:
+                continue
+            result = self.render(source, request)
+            if self.is_current(generation):
+                self._dispatch(result, generation)
+
+    def _dispatch(self, result, generation):
+        def deliver():
+            # A newer request may have arrived while this one was queued
+            if self.is_current(generation):
+                self.deliver(result)
+            return False
+
+        if self.schedule:
+            self.schedule(deliver)
+        else:
+            deliver()
@@ -0,0 +1,313 @@
+"""Read image dimensions from file headers without decoding pixels
+
+Only the first few KB of a file are read for PNG, JPEG, GIF, BMP, WebP,
+TIFF and SVG. ImageMagick's ``identify`` is used for anything else, so
+probing thousands of files for a batch costs a handful of small reads each.
+
+The size of an SVG is its intrinsic size in CSS pixels, from the width and
+height of the root element or its viewBox.
+
+Animated GIF and WebP frames are counted by walking the block and chunk
+structure, seeking past the compressed pixel data.
+"""
+
+import re
+import struct
+import subprocess
+
+# Enough for every fixed-position header; JPEG and TIFF seek past it when needed
+HEADER_SIZE = 4096
+
+# Bit of the VP8X flags byte set for animated WebP
+WEBP_ANIMATION_FLAG = 0x02
+
+# CSS pixels per unit of SVG width and height
+SVG_UNITS = {'': 1.0, 'px': 1.0, 'pt': 96 / 72, 'pc': 16.0, 'in': 96.0, 'cm': 96 / 2.54, 'mm': 96 / 25.4}
+
+SVG_ROOT = re.compile(rb'<svg\b([^>]*)>')
+SVG_ATTRIBUTE = re.compile(rb'([\w:.-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+SVG_LENGTH = re.compile(r'\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([a-z]*)\s*')
+
+# JPEG start-of-frame markers (C4, C8 and CC are DHT, JPG and DAC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _png_size(header, f):
+    if header[12:16] == b'IHDR':
+        return struct.unpack('>II', header[16:24])
+    return None
+
+
+def _gif_size(header, f):
+    return struct.unpack('<HH', header[6:10])
+
+
+def _bmp_size(header, f):
+    dib_size = struct.unpack('<I', header[14:18])[0]
+    if dib_size == 12:
+        # OS/2 BITMAPCOREHEADER
+        return struct.unpack('<HH', header[18:22])
+    width, height = struct.unpack('<ii', header[18:26])
+    # Negative height means a top-down bitmap
+    return width, abs(height)
+
+
+def _webp_size(header, f):
+    chunk = header[12:16]
+    if chunk == b'VP8 ':
+        # Lossy: key frame start code followed by 14-bit dimensions
+        if header[23:26] != b'\x9d\x01\x2a':
+            return None
+        width, height = struct.unpack('<HH', header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        # Lossless: signature byte then packed 14-bit (size - 1) values
+        if header[20] != 0x2F:
+            return None
+        bits = struct.unpack('<I', header[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        # Extended: 24-bit canvas (size - 1) values
+        width = int.from_bytes(header[24:27], 'little') + 1
+        height = int.from_bytes(header[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def _jpeg_size(header, f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        # Skip fill bytes up to the next marker
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker in JPEG_SOF_MARKERS:
+            segment = f.read(7)
+            if len(segment) < 7:
+                return None
+            height, width = struct.unpack('>HH', segment[3:7])
+            return width, height
+        if marker == 0xD9 or marker == 0xDA:
+            # End of image or start of scan before any frame header
+            return None
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # Standalone markers have no length field
+            continue
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        f.seek(struct.unpack('>H', length_bytes)[0] - 2, 1)
+
+
+def _tiff_size(header, f):
+    endian = '<' if header[:2] == b'II' else '>'
+    if struct.unpack(endian + 'H', header[2:4])[0] != 42:
+        # BigTIFF and other variants are left to identify
+        return None
+
+    ifd_offset = struct.unpack(endian + 'I', header[4:8])[0]
+    f.seek(ifd_offset)
+    count_bytes = f.read(2)
+    if len(count_bytes) < 2:
+        return None
+    entry_count = struct.unpack(endian + 'H', count_bytes)[0]
+    entries = f.read(entry_count * 12)
+
+    width = height = None
+    for offset in range(0, len(entries) - 11, 12):
+        tag, field_type = struct.unpack(endian + 'HH', entries[offset:offset + 4])
+        if tag not in (256, 257):
+            continue
+        if field_type == 3:
+            value = struct.unpack(endian + 'H', entries[offset + 8:offset + 10])[0]
+        elif field_type == 4:
+            value = struct.unpack(endian + 'I', entries[offset + 8:offset + 12])[0]
+        else:
+            continue
+        if tag == 256:
+            width = value
+        else:
+            height = value
+
+    if width and height:
+        return width, height
+    return None
+
+
+def _svg_length(text):
+    """A width or height in CSS pixels, or None for percentages and font-relative units"""
+    match = SVG_LENGTH.fullmatch(text or '')
+    if not match or match.group(2) not in SVG_UNITS:
+        return None
+    return float(match.group(1)) * SVG_UNITS[match.group(2)]
+
+
+def _svg_size(header, f):
+    root = SVG_ROOT.search(header)
+    if not root:
+        return None
+    attributes = {name.decode('ascii', 'replace'): value.decode('utf-8', 'replace')
+                  for name, _, value in SVG_ATTRIBUTE.findall(root.group(1))}
+    width = _svg_length(attributes.get('width'))
+    height = _svg_length(attributes.get('height'))
+
+    view_box = attributes.get('viewBox', '').replace(',', ' ').split()
+    if len(view_box) == 4:
+        try:
+            box_width, box_height = float(view_box[2]), float(view_box[3])
+        except ValueError:
+            box_width = box_height = 0
+        if box_width > 0 and box_height > 0:
+            # A missing dimension follows the viewBox aspect ratio
+            if width is None and height is None:
+                width, height = box_width, box_height
+            elif width is None:
+                width = height * box_width / box_height
+            elif height is None:
+                height = width * box_height / box_width
+
+    if width is None or height is None:
+        return None
+    return max(1, round(width)), max(1, round(height))
+
+
+def _parser_for(header):
+    """Pick a header parser from the file signature"""
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _png_size
+    if header.startswith(b'\xff\xd8'):
+        return _jpeg_size
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return _gif_size
+    if header.startswith(b'BM'):
+        return _bmp_size
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return _webp_size
+    if header[:4] in (b'II*\x00', b'MM\x00*'):
+        return _tiff_size
+    if header.lstrip().startswith(b'<') and b'<svg' in header:
+        return _svg_size
+    return None
+
+
+def read_header_dimensions(file_path):
+    """Return (width, height) parsed from the file header, or None if the format isn't supported"""
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            parser = _parser_for(header)
+            if parser is None:
+                return None
+            size = parser(header, f)
+    except (OSError, struct.error, IndexError):
+        return None
+
+    if size and size[0] > 0 and size[1] > 0:
+        return int(size[0]), int(size[1])
+    return None
+
+
+def _skip_gif_sub_blocks(f):
+    """Seek past a chain of GIF data sub-blocks, ending after the empty terminator"""
+    while True:
+        size = f.read(1)
+        if not size or size[0] == 0:
+            return
+        f.seek(size[0], 1)
+
+
+def _gif_frame_count(f):
+    header = f.read(13)
+    if len(header) < 13:
+        return None
+    if header[10] & 0x80:
+        # Global color table
+        f.seek(3 << ((header[10] & 0x07) + 1), 1)
+
+    frames = 0
+    while True:
+        block = f.read(1)
+        if not block or block == b'\x3b':
+            # A truncated file still shows the frames before the cut
+            return frames
+        if block == b'\x2c':
+            descriptor = f.read(9)
+            if len(descriptor) < 9:
+                return frames
+            if descriptor[8] & 0x80:
+                # Local color table
+                f.seek(3 << ((descriptor[8] & 0x07) + 1), 1)
+            # LZW minimum code size, then the image data
+            f.seek(1, 1)
+            _skip_gif_sub_blocks(f)
+            frames += 1
+        elif block == b'\x21':
+            # Extension label, then its data
+            f.seek(1, 1)
+            _skip_gif_sub_blocks(f)
+        else:
+            return frames
+
+
+def _webp_frame_count(f):
+    header = f.read(30)
+    if header[12:16] != b'VP8X' or not header[20] & WEBP_ANIMATION_FLAG:
+        return 1
+
+    frames = 0
+    offset = 12
+    while True:
+        f.seek(offset)
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return frames
+        fourcc, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+        if fourcc == b'ANMF':
+            frames += 1
+        # Chunks are padded to an even size
+        offset += 8 + size + (size & 1)
+
+
+def read_frame_count(file_path):
+    """Return the number of frames of an animated GIF or WebP, 1 for anything else"""
+    try:
+        with open(file_path, 'rb') as f:
+            signature = f.read(12)
+            f.seek(0)
+            if signature[:6] in (b'GIF87a', b'GIF89a'):
+                frames = _gif_frame_count(f)
+            elif signature[:4] == b'RIFF' and signature[8:12] == b'WEBP':
+                frames = _webp_frame_count(f)
+            else:
+                return 1
+    except (OSError, struct.error, IndexError):
+        return 1
+    return max(1, frames or 1)
+
+
+def identify_dimensions(file_path):
+    """Return (width, height) reported by ImageMagick's identify, or None"""
+    try:
+        # [0] limits identify to the first frame of multi-frame files
+        result = subprocess.run([
+            'identify', '-format', '%wx%h', f'{file_path}[0]'
+        ], capture_output=True, text=True, timeout=10)
+
+        if result.returncode == 0:
+            width, height = result.stdout.strip().split('x')
+            return int(width), int(height)
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        pass
+    return None
+
+
+def probe_dimensions(file_path):
+    """Return (width, height) of an image, or None when it can't be determined"""
+    return read_header_dimensions(file_path) or identify_dimensions(file_path)
@@ -0,0 +1,140 @@
+"""Progress reporting for resize jobs
+
+Backends report progress as ``progress(fraction, stage)`` calls. ImageMagick's
+``-monitor`` output is parsed by MonitorParser; ProgressTracker adds elapsed
+time and an ETA and rate-limits updates before they reach the UI thread.
+"""
+
+import re
+import threading
+import time
+
+# Overall progress is split evenly between the stages of a resize
+STAGES = ('load', 'resize', 'save')
+
+MONITOR_LINE = re.compile(r'^(?P<tag>[A-Za-z/ ]+?)\[.*\]: (?P<done>\d+) of (?P<total>\d+), \d+% complete$')
+
+# ImageMagick monitor tags and the stage they belong to
+STAGE_KEYWORDS = (
+    ('load', ('load', 'read', 'decode')),
+    ('resize', ('resize', 'sample', 'scale', 'filter')),
+    ('save', ('save', 'write', 'encode')),
+)
+
+
+def format_duration(seconds):
+    """Format seconds as m:ss for progress displays"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def stage_fraction(stage, fraction):
+    """Map progress within one stage onto the whole job"""
+    index = STAGES.index(stage)
+    return (index + max(0.0, min(fraction, 1.0))) / len(STAGES)
+
+
+class MonitorParser:
+    """Incrementally parse ``convert -monitor`` output read from stderr"""
+
+    def __init__(self, progress):
+        self.progress = progress
+        self.buffer = ''
+        self.other_lines = []
+        self.last_fraction = 0.0
+
+    def feed(self, text):
+        """Consume a chunk of stderr; complete lines are parsed, the rest buffered"""
+        self.buffer += text
+        # Monitor updates end with a carriage return, errors with a newline
+        *lines, self.buffer = re.split(r'[\r\n]', self.buffer)
+        for line in lines:
+            self._parse_line(line.strip())
+
+    def close(self):
+        """Parse whatever is left in the buffer"""
+        self._parse_line(self.buffer.strip())
+        self.buffer = ''
+
+    @property
+    def error_output(self):
+        """Non-progress stderr lines, for error messages"""
+        return '\n'.join(self.other_lines)
+
+    def _parse_line(self, line):
+        if not line:
+            return
+        match = MONITOR_LINE.match(line)
+        if not match:
+            self.other_lines.append(line)
+            return
+
+        stage = self._stage_for(match.group('tag').lower())
+        if stage is None:
+            return
+        total = int(match.group('total'))
+        done = int(match.group('done')) + 1
+        fraction = stage_fraction(stage, done / total if total else 1.0)
+
+        # Some coders report several passes; never let the bar move backwards
+        if fraction > self.last_fraction:
+            self.last_fraction = fraction
+            self.progress(fraction, stage)
+
+    @staticmethod
+    def _stage_for(tag):
+        for stage, keywords in STAGE_KEYWORDS:
+            if any(keyword in tag for keyword in keywords):
+                return stage
+        return None
+
+
+class ProgressTracker:
+    """Adds elapsed time and an ETA to progress updates and rate-limits them
+
+    ``dispatch(fraction, stage, elapsed, eta)`` receives at most one update per
+    ``min_interval`` seconds plus the final one. Pass ``GLib.idle_add`` as
+    ``schedule`` to deliver on the GTK main loop; while a delivery is still
+    queued, newer values replace it rather than queueing more callbacks.
+    """
+
+    def __init__(self, dispatch, schedule=None, min_interval=0.1):
+        self.dispatch = dispatch
+        self.schedule = schedule
+        self.min_interval = min_interval
+        self.start_time = time.monotonic()
+        self.last_sent = 0.0
+        self.pending = None
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def update(self, fraction, stage=None):
+        """Record progress; safe to call from any thread as often as needed"""
+        now = time.monotonic()
+        elapsed = now - self.start_time
+        eta = elapsed * (1.0 - fraction) / fraction if fraction > 0 else None
+
+        with self.lock:
+            if fraction < 1.0 and now - self.last_sent < self.min_interval:
+                return
+            self.last_sent = now
+            already_queued = self.pending is not None
+            self.pending = (fraction, stage, elapsed, eta)
+
+        if already_queued:
+            return
+        if self.schedule:
+            self.schedule(self._deliver)
+        else:
+            self._deliver()
+
+    def _deliver(self):
+        with self.lock:
+            values = self.pending
+            self.pending = None
+        if values is not None:
+            self.dispatch(*values)
+        # Run once when scheduled with GLib.idle_add
+        return False
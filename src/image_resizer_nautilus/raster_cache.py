@@ -0,0 +1,315 @@
+"""Cache of decoded source rasters for repeated resizes of the same image
+
+Resizing one large master to several sizes, one run after another, used to
+decode it from scratch every time. After a decode the raw pixels are written
+here as an uncompressed, page-aligned raster, and later resizes of the
+unchanged source memory-map that file instead of decoding again. Entries are
+keyed on the source path and decoded size and record the source's file size
+and modification time, so an edited or replaced source is never served
+stale.
+
+Only rasters of at least RASTER_CACHE_MIN_PIXELS are cached; smaller images
+decode about as fast as their raster can be read back. A raster is only
+written once its source is decoded a second time by the same process, as when
+the resident application resizes one master again. One-shot runs that decode
+each image once never pay for writing an entry they won't read. Configuration
+comes from the environment:
+
+    IMAGE_RESIZER_RASTER_CACHE          off to disable (default on)
+    IMAGE_RESIZER_RASTER_CACHE_SIZE_MB  on-disk size limit, least recently used entries are evicted (default 2048)
+    IMAGE_RESIZER_RASTER_CACHE_DIR      cache location (default ~/.cache/image-resizer-nautilus/rasters)
+"""
+
+import base64
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .fileutil import temp_path
+
+RASTER_CACHE_ENV_VAR = 'IMAGE_RESIZER_RASTER_CACHE'
+RASTER_CACHE_SIZE_ENV_VAR = 'IMAGE_RESIZER_RASTER_CACHE_SIZE_MB'
+RASTER_CACHE_DIR_ENV_VAR = 'IMAGE_RESIZER_RASTER_CACHE_DIR'
+
+DEFAULT_SIZE_LIMIT_MB = 2048
+RASTER_CACHE_MIN_PIXELS = 16_000_000
+
+# Bump when the file layout changes so old entries are never read
+KEY_VERSION = 1
+MAGIC = b'IRRASTER'
+# Magic, then the header length and the offset of the pixels
+PREFIX = struct.Struct('<8sII')
+ENTRY_EXTENSION = '.raster'
+
+# Pillow modes stored as they are; others are decoded every time
+CACHED_MODES = ('L', 'RGB', 'RGBA')
+BYTES_PER_PIXEL = {'L': 1, 'RGB': 3, 'RGBA': 4}
+
+# Image.info entries that affect how outputs are saved
+KEPT_INFO = ('icc_profile', 'exif', 'dpi', 'transparency')
+
+# Rows written per strip, so storing doesn't need a second copy of the raster
+WRITE_STRIP_ROWS = 256
+
+# Decodes remembered to tell a repeated source from a one-off
+DECODE_HISTORY_SIZE = 256
+
+_state_lock = threading.Lock()
+# Entry path -> (source size, source mtime) of large decodes this process has seen
+_decoded = OrderedDict()
+# Cache directory -> running size of its entries, so trim only runs over the limit
+_totals = {}
+
+
+def default_cache_dir():
+    """Cache location following the XDG base directory spec"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'image-resizer-nautilus', 'rasters')
+
+
+def _encode_info(info):
+    encoded = {}
+    for name in KEPT_INFO:
+        value = info.get(name)
+        if isinstance(value, bytes):
+            encoded[name] = {'bytes': base64.b64encode(value).decode('ascii')}
+        elif isinstance(value, (int, float, str)):
+            encoded[name] = value
+        elif isinstance(value, tuple) and all(isinstance(item, (int, float)) for item in value):
+            encoded[name] = {'tuple': list(value)}
+    return encoded
+
+
+def _decode_info(encoded):
+    info = {}
+    for name, value in encoded.items():
+        if isinstance(value, dict) and 'bytes' in value:
+            info[name] = base64.b64decode(value['bytes'])
+        elif isinstance(value, dict) and 'tuple' in value:
+            info[name] = tuple(value['tuple'])
+        else:
+            info[name] = value
+    return info
+
+
+class RasterCache:
+    """On-disk LRU cache of decoded rasters, read back through mmap"""
+
+    def __init__(self, cache_dir=None, size_limit_mb=DEFAULT_SIZE_LIMIT_MB):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.size_limit = int(size_limit_mb * 1024 * 1024)
+        self.entries_dir = os.path.join(self.cache_dir, 'entries')
+        self.lock_path = os.path.join(self.cache_dir, 'lock')
+
+    @classmethod
+    def from_environment(cls):
+        """Build the cache configured by the environment, or None when it is off"""
+        if os.environ.get(RASTER_CACHE_ENV_VAR, 'on').lower() in ('off', '0', 'no', 'false'):
+            return None
+        try:
+            size_limit_mb = float(os.environ.get(RASTER_CACHE_SIZE_ENV_VAR, DEFAULT_SIZE_LIMIT_MB))
+        except ValueError:
+            size_limit_mb = DEFAULT_SIZE_LIMIT_MB
+        return cls(os.environ.get(RASTER_CACHE_DIR_ENV_VAR), size_limit_mb)
+
+    def entry_path(self, file_path, size):
+        """Where the raster of file_path decoded at size is kept"""
+        key = '\0'.join([str(KEY_VERSION), os.path.abspath(file_path), '{}x{}'.format(*size)])
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.entries_dir, digest[:2], digest + ENTRY_EXTENSION)
+
+    def should_store(self, image):
+        """True for rasters worth caching: large, in a stored mode and well within the size limit"""
+        if image.mode not in CACHED_MODES or image.width * image.height < RASTER_CACHE_MIN_PIXELS:
+            return False
+        # A single entry mustn't push everything else out
+        return image.width * image.height * BYTES_PER_PIXEL[image.mode] <= self.size_limit // 2
+
+    def load(self, file_path, size):
+        """The cached raster of file_path decoded at size as a Pillow image, or None"""
+        from PIL import Image
+
+        entry = self.entry_path(file_path, size)
+        try:
+            with open(entry, 'rb') as f:
+                header, data_offset = self._read_header(f)
+                if header is None:
+                    return None
+                if not self._is_current(header, file_path):
+                    # The source changed since it was cached
+                    self._remove(entry)
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Marks the entry as recently used for LRU eviction
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+
+        mode, width, height = header['mode'], header['width'], header['height']
+        if len(mapped) < data_offset + width * height * BYTES_PER_PIXEL[mode]:
+            mapped.close()
+            self._remove(entry)
+            return None
+        # L and RGBA are used straight from the mapping; RGB is copied out of the page cache
+        image = Image.frombuffer(mode, (width, height), memoryview(mapped)[data_offset:], 'raw', mode, 0, 1)
+        image.info.update(_decode_info(header.get('info', {})))
+        return image
+
+    def store(self, file_path, image):
+        """Add the decoded raster of file_path if it is worth caching and was decoded before"""
+        if not self.should_store(image):
+            return
+        entry = self.entry_path(file_path, image.size)
+        tmp_path = temp_path(entry)
+        try:
+            st = os.stat(file_path)
+            if not self._decoded_before(entry, st):
+                return
+            header = json.dumps({
+                'version': KEY_VERSION,
+                'source': os.path.abspath(file_path),
+                'source_size': st.st_size,
+                'source_mtime_ns': st.st_mtime_ns,
+                'mode': image.mode,
+                'width': image.width,
+                'height': image.height,
+                'info': _encode_info(image.info),
+            }).encode()
+            prefix_size = PREFIX.size + len(header)
+            # Pixels start on a page boundary so the mapping lines up with the page cache
+            data_offset = -(-prefix_size // mmap.PAGESIZE) * mmap.PAGESIZE
+
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(PREFIX.pack(MAGIC, len(header), data_offset) + header)
+                f.write(b'\0' * (data_offset - prefix_size))
+                for top in range(0, image.height, WRITE_STRIP_ROWS):
+                    bottom = min(image.height, top + WRITE_STRIP_ROWS)
+                    f.write(image.crop((0, top, image.width, bottom)).tobytes())
+            os.replace(tmp_path, entry)
+            total = self._add_to_total(entry)
+        except OSError as e:
+            self._remove(tmp_path)
+            print(f"Warning: could not cache the decoded raster of {file_path}: {e}")
+            return
+        if total > self.size_limit:
+            self.trim()
+
+    def trim(self):
+        """Remove entries of changed or deleted sources, then the least recently used beyond the size limit"""
+        with self._locked():
+            entries = []
+            for root, _, files in os.walk(self.entries_dir):
+                for name in files:
+                    if not name.endswith(ENTRY_EXTENSION):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        with open(path, 'rb') as f:
+                            header, _ = self._read_header(f)
+                        st = os.stat(path)
+                    except (OSError, ValueError):
+                        continue
+                    if header is None or not self._is_current(header, header.get('source', '')):
+                        self._remove(path)
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.size_limit:
+                    break
+                if self._remove(path):
+                    total -= size
+            with _state_lock:
+                _totals[self.cache_dir] = total
+
+    def clear(self):
+        """Delete every cached raster"""
+        with self._locked():
+            shutil.rmtree(self.entries_dir, ignore_errors=True)
+            with _state_lock:
+                _totals[self.cache_dir] = 0
+
+    @staticmethod
+    def _decoded_before(entry, st):
+        """Note a decode of the source behind entry; True if the same source was decoded before"""
+        stamp = (st.st_size, st.st_mtime_ns)
+        with _state_lock:
+            seen = _decoded.pop(entry, None) == stamp
+            _decoded[entry] = stamp
+            while len(_decoded) > DECODE_HISTORY_SIZE:
+                _decoded.popitem(last=False)
+        return seen
+
+    def _add_to_total(self, entry):
+        """Count a newly written entry and return the running size of the cache
+
+        The first store of a process measures the cache on disk, which already
+        includes the new entry. Entries other processes add are only picked up
+        by the next trim.
+        """
+        with _state_lock:
+            if self.cache_dir in _totals:
+                _totals[self.cache_dir] += os.path.getsize(entry)
+            else:
+                _totals[self.cache_dir] = self._disk_usage()
+            return _totals[self.cache_dir]
+
+    def _disk_usage(self):
+        total = 0
+        for root, _, files in os.walk(self.entries_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    @staticmethod
+    def _read_header(f):
+        """(header, data offset) of an entry, or (None, 0) when it isn't one of ours"""
+        prefix = f.read(PREFIX.size)
+        if len(prefix) < PREFIX.size:
+            return None, 0
+        magic, length, data_offset = PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            return None, 0
+        header = json.loads(f.read(length))
+        if header.get('version') != KEY_VERSION or header.get('mode') not in CACHED_MODES:
+            return None, 0
+        return header, data_offset
+
+    @staticmethod
+    def _is_current(header, file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return False
+        return header.get('source_size') == st.st_size and header.get('source_mtime_ns') == st.st_mtime_ns
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    @contextmanager
+    def _locked(self):
+        # Batch workers in other processes share the cache
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
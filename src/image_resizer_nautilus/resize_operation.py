@@ -0,0 +1,362 @@
+"""Image resize operation with pluggable resize backends"""
+
+import os
+import subprocess
+import time
+
+from .backends import (BackendError, ImageMagickBackend, ResizeCancelled, ResourceLimitExceeded,
+                       UnsupportedImage, get_backend, is_svg, streaming_backend, svg_backend,
+                       thumbnail_enabled)
+from .cache import OutputCache
+from .encoding import get_profile
+from .identity import write_unchanged
+from .limits import ResourceLimits
+from .notifications import get_notifier
+from .probe import read_frame_count, read_header_dimensions
+from .trace import start_trace
+
+
+# Output file extensions indexed by the output format dropdown (0 keeps the original format)
+FORMAT_EXTENSIONS = [None, '.png', '.jpg', '.webp']
+
+
+class ResizeOperation:
+    """Handles the actual image resize operation"""
+    
+    @staticmethod
+    def perform_resize(file_path, width, height, format_index, output_path, parent_window,
+                       percentage=None, notify=True, backend=None, progress=None, limits=None, cancel=None,
+                       trace=None, profile=None, thumbnail=None, raise_errors=False):
+        """Perform the actual image resize operation and return success status"""
+        trace = trace or start_trace('resize', source=file_path)
+        
+        # Validation
+        if width is None and height is None and percentage is None:
+            ResizeOperation.show_error('Please enter valid width and/or height values')
+            trace.finish('failed')
+            return False
+        
+        if not output_path:
+            ResizeOperation.show_error('No output file selected')
+            trace.finish('failed')
+            return False
+        
+        # Build resize parameter
+        resize_param = ResizeOperation.build_resize_param(width, height, percentage)
+        
+        # Prepare output
+        with trace.stage('prepare_output'):
+            prepared = ResizeOperation.prepare_output_directory(output_path)
+        if not prepared:
+            trace.finish('failed')
+            return False
+        
+        # Check for existing file
+        if os.path.exists(output_path):
+            # We can't show dialog from thread, so we'll overwrite by default
+            # or could use a different approach for confirmation
+            pass
+        
+        # Execute resize
+        return ResizeOperation.execute_resize(file_path, resize_param, output_path, parent_window,
+                                              notify=notify, backend=backend, progress=progress,
+                                              limits=limits, cancel=cancel, trace=trace, profile=profile,
+                                              thumbnail=thumbnail, raise_errors=raise_errors)
+    
+    @staticmethod
+    def build_resize_param(width, height, percentage=None):
+        """Build the ImageMagick resize parameter"""
+        if percentage is not None:
+            return f"{percentage}%"
+        if width is not None and height is not None:
+            return f"{width}x{height}"
+        elif width is not None:
+            return str(width)
+        elif height is not None:
+            return f"x{height}"
+        return ""
+    
+    @staticmethod
+    def build_output_path(file_path, format_index=0, output_dir=None, suffix='_resized'):
+        """Build the output path for a resized copy of file_path"""
+        base_name, ext = os.path.splitext(os.path.basename(file_path))
+        format_ext = FORMAT_EXTENSIONS[format_index] or ext
+        
+        if output_dir is None:
+            output_dir = os.path.dirname(file_path)
+        return os.path.join(output_dir, f"{base_name}{suffix}{format_ext}")
+    
+    @staticmethod
+    def size_suffix(width=None, height=None, percentage=None):
+        """Predictable file name suffix for one size of a set, e.g. _640w, _x480, _640x480 or _50pct"""
+        if percentage is not None:
+            return f"_{percentage:g}pct"
+        if width is not None and height is not None:
+            return f"_{width}x{height}"
+        if width is not None:
+            return f"_{width}w"
+        return f"_x{height}"
+    
+    @staticmethod
+    def build_variants(file_path, sizes, format_indices=(0,), output_dir=None):
+        """(resize_param, output_path) pairs for every (width, height, percentage) size in every format"""
+        variants = []
+        seen = set()
+        for width, height, percentage in sizes:
+            resize_param = ResizeOperation.build_resize_param(width, height, percentage)
+            suffix = ResizeOperation.size_suffix(width, height, percentage)
+            for format_index in format_indices:
+                output_path = ResizeOperation.build_output_path(file_path, format_index, output_dir, suffix)
+                # "Same as original" and an explicit format can name the same file
+                if output_path not in seen:
+                    seen.add(output_path)
+                    variants.append((resize_param, output_path))
+        return variants
+    
+    @staticmethod
+    def prepare_output_directory(output_path):
+        """Create output directory if it doesn't exist"""
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            try:
+                os.makedirs(output_dir, exist_ok=True)
+                return True
+            except OSError as e:
+                ResizeOperation.show_error(f'Cannot create directory: {e}')
+                return False
+        return True
+    
+    @staticmethod
+    def execute_resize(file_path, resize_param, output_path, parent_window, notify=True, backend=None,
+                       progress=None, limits=None, cancel=None, trace=None, profile=None, thumbnail=None,
+                       raise_errors=False):
+        """Execute the resize with the selected backend and return success status"""
+        return ResizeOperation.execute_resize_set(file_path, [(resize_param, output_path)], parent_window,
+                                                  notify, backend, progress, limits, cancel, trace, profile,
+                                                  thumbnail, raise_errors)
+    
+    @staticmethod
+    def perform_resize_set(file_path, variants, parent_window, notify=True, backend=None, progress=None,
+                           limits=None, cancel=None, trace=None, profile=None, thumbnail=None,
+                           raise_errors=False):
+        """Write several sizes and formats of one image from a single decode and return success status
+        
+        variants is a list of (resize_param, output_path) pairs, see build_variants.
+        """
+        trace = trace or start_trace('resize_set', source=file_path)
+        if not variants:
+            ResizeOperation.show_error('No output sizes selected')
+            trace.finish('failed')
+            return False
+        
+        for _, output_path in variants:
+            with trace.stage('prepare_output'):
+                prepared = ResizeOperation.prepare_output_directory(output_path)
+            if not prepared:
+                trace.finish('failed')
+                return False
+        
+        return ResizeOperation.execute_resize_set(file_path, variants, parent_window, notify, backend,
+                                                  progress, limits, cancel, trace, profile, thumbnail,
+                                                  raise_errors)
+    
+    @staticmethod
+    def execute_resize_set(file_path, variants, parent_window, notify=True, backend=None, progress=None,
+                           limits=None, cancel=None, trace=None, profile=None, thumbnail=None,
+                           raise_errors=False):
+        """Resize file_path into every (resize_param, output_path) variant and return success status
+        
+        profile is an encoder profile or its name, see encoding.py; by default IMAGE_RESIZER_PROFILE or
+        balanced. A profile from with_max_bytes keeps JPEG and WebP output within a file size.
+        thumbnail=False turns off the thumbnail path for large reductions, which by default follows
+        IMAGE_RESIZER_THUMBNAIL. With raise_errors, failures are raised to the caller instead of being
+        shown, so a scheduler can decide whether to retry.
+        """
+        trace = trace or start_trace('resize', source=file_path)
+        outcome = 'failed'
+        output_paths = [output_path for _, output_path in variants]
+        # Only clean up after ourselves, never delete a file the user already had
+        existing_outputs = {path for path in output_paths if os.path.exists(path)}
+        try:
+            if notify:
+                with trace.stage('notify'):
+                    ResizeOperation.show_notification('Resizing', 'Image resize in progress...')
+            
+            with trace.stage('select_backend'):
+                resize_backend = get_backend(backend)
+                profile = get_profile(profile)
+                thumbnail = thumbnail_enabled(thumbnail)
+                if limits is None:
+                    limits = ResourceLimits.from_environment()
+                if is_svg(file_path):
+                    # Vector sources are rendered at each target size instead of resampled
+                    if not resize_backend.renders_svg:
+                        resize_backend = svg_backend()
+                else:
+                    # Sources too large for memory are streamed, whichever backend was asked for
+                    streaming = streaming_backend(file_path, limits)
+                    if streaming:
+                        resize_backend, limits = streaming
+                        print(f"{file_path} is too large to resize in memory, "
+                              f"streaming with {resize_backend.name}")
+            trace.set(backend=resize_backend.name, profile=profile.name, max_bytes=profile.max_bytes,
+                      thumbnail=thumbnail, variants=len(variants))
+            
+            # Outputs at the source's own size and format are copied rather than re-encoded
+            remaining = []
+            with trace.stage('unchanged'):
+                source_size = read_header_dimensions(file_path)
+                for resize_param, output_path in variants:
+                    written = write_unchanged(file_path, resize_param, output_path, profile, source_size)
+                    if written == 'copy':
+                        print(f"{output_path} has the size and format of {file_path}, copied without resizing")
+                    elif written == 'lossless':
+                        print(f"Rewrote {file_path} losslessly with jpegtran to fit the size limit, "
+                              f"saving to {output_path}")
+                    else:
+                        remaining.append((resize_param, output_path))
+            trace.set(unchanged=len(variants) - len(remaining))
+            
+            cache = OutputCache.from_environment()
+            
+            def cache_variant(backend_name):
+                return f"{backend_name}:{profile.key}:{'thumbnail' if thumbnail else 'full'}"
+            
+            pending = []
+            for resize_param, output_path in remaining:
+                cache_key = None
+                with trace.stage('cache_lookup'):
+                    if cache:
+                        cache_key = cache.make_key(file_path, resize_param, output_path,
+                                                   cache_variant(resize_backend.name))
+                    hit = cache_key and cache.lookup(cache_key, output_path)
+                if hit:
+                    print(f"Using cached resize of {file_path} to {resize_param} for {output_path}")
+                else:
+                    pending.append((resize_param, output_path, cache_key))
+            trace.set(cache_hits=len(remaining) - len(pending))
+            
+            frames = 1
+            if pending:
+                frames = read_frame_count(file_path)
+                for resize_param, output_path, _ in pending:
+                    print(f"Resizing {file_path} to {resize_param} with {resize_backend.name} "
+                          f"({profile.describe()}), saving to {output_path}")
+                if frames > 1:
+                    print(f"Animated image: {frames} frames")
+                # Every variant that missed the cache comes from one decode of the source
+                backend_start = time.perf_counter()
+                try:
+                    used_backend = ResizeOperation.run_backend(resize_backend, file_path,
+                                                [(resize_param, output_path)
+                                                 for resize_param, output_path, _ in pending],
+                                                trace.backend_progress(progress), limits, cancel, profile,
+                                                thumbnail)
+                finally:
+                    trace.record_backend()
+                if frames > 1:
+                    frame_ms = (time.perf_counter() - backend_start) * 1000 / (frames * len(pending))
+                    trace.set(frames=frames, ms_per_frame=round(frame_ms, 2))
+                if used_backend is not resize_backend:
+                    trace.set(backend=used_backend.name)
+                with trace.stage('cache_store'):
+                    for resize_param, output_path, cache_key in pending:
+                        if cache_key and used_backend is not resize_backend:
+                            # Stored under the backend that actually wrote the output
+                            cache_key = cache.make_key(file_path, resize_param, output_path,
+                                                       cache_variant(used_backend.name))
+                        if cache_key:
+                            cache.store(cache_key, output_path)
+            elif progress:
+                progress(1.0, 'save')
+            
+            output_bytes = sum(os.path.getsize(path) for path in output_paths if os.path.exists(path))
+            trace.set(output_bytes=output_bytes)
+            if len(output_paths) == 1:
+                success_message = f'Resized successfully!\nSaved as: {os.path.basename(output_paths[0])}'
+            else:
+                success_message = f'Resized successfully!\nSaved {len(output_paths)} sizes'
+            if frames > 1:
+                success_message += f'\n{frames} frames, {frame_ms:.1f} ms per frame'
+            print(success_message)
+            print(f"Output size: {output_bytes / 1024:.1f} KiB")
+            if notify:
+                with trace.stage('notify'):
+                    ResizeOperation.show_success(success_message)
+            outcome = 'success'
+            return True
+        
+        except ResizeCancelled:
+            ResizeOperation.remove_partial_outputs(output_paths, existing_outputs)
+            print('Resize cancelled')
+            outcome = 'cancelled'
+            return False
+        except Exception as e:
+            ResizeOperation.remove_partial_outputs(output_paths, existing_outputs)
+            error_message = ResizeOperation.describe_error(e)
+            print(error_message)
+            if raise_errors:
+                raise
+            if notify:
+                ResizeOperation.show_error(error_message)
+            return False
+        finally:
+            trace.finish(outcome)
+    
+    @staticmethod
+    def describe_error(error):
+        """The message shown to the user for an exception raised by a resize"""
+        if isinstance(error, ResourceLimitExceeded):
+            return f'{error}\nRaise the IMAGE_RESIZER_LIMIT_* settings to resize this image.'
+        if isinstance(error, BackendError):
+            return str(error)
+        if isinstance(error, FileNotFoundError):
+            return f'File not found: {error.filename or error}'
+        if isinstance(error, subprocess.TimeoutExpired):
+            return f'Resize stopped after exceeding the {int(error.timeout)}s time limit'
+        return f'Resize failed: {str(error)}'
+    
+    @staticmethod
+    def run_backend(resize_backend, file_path, variants, progress=None, limits=None, cancel=None, profile=None,
+                    thumbnail=None):
+        """Resize with the given backend, falling back to ImageMagick for unsupported images
+        
+        Returns the backend that wrote the outputs.
+        """
+        try:
+            resize_backend.resize_set(file_path, variants, progress, limits, cancel, profile, thumbnail)
+            return resize_backend
+        except UnsupportedImage as e:
+            if isinstance(resize_backend, ImageMagickBackend):
+                raise
+            # Fall back to ImageMagick for formats the in-process backend can't handle
+            print(f"{resize_backend.name} backend cannot handle this image ({e}), using ImageMagick")
+            fallback = ImageMagickBackend()
+            fallback.resize_set(file_path, variants, progress, limits, cancel, profile, thumbnail)
+            return fallback
+    
+    @staticmethod
+    def remove_partial_outputs(output_paths, existing_outputs):
+        """Delete half-written outputs left behind by a failed or cancelled resize"""
+        for output_path in output_paths:
+            if output_path in existing_outputs:
+                continue
+            try:
+                os.remove(output_path)
+            except OSError:
+                pass
+    
+    @staticmethod
+    def show_notification(title, message):
+        """Show a desktop notification"""
+        get_notifier().notify(title, message)
+    
+    @staticmethod
+    def show_error(message):
+        """Show an error notification, rate-limited when errors come in quick succession"""
+        get_notifier().notify('Error', message, 'error')
+    
+    @staticmethod
+    def show_success(message):
+        """Show a success notification"""
+        get_notifier().notify('Success', message, 'success')
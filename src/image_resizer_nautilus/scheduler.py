@@ -0,0 +1,272 @@
+"""One scheduler for every resize the application runs
+
+All windows of the resident application submit their work here instead of
+starting threads of their own, so five open dialogs still run at most
+max_concurrent resizes at a time and share one memory budget. Tasks are
+dispatched by priority (single images the user is waiting for before batch
+files) and round-robin between groups of the same priority, so a large batch
+doesn't hold up a smaller one submitted after it. Tasks that fail for a
+transient reason, such as the system running out of memory or processes,
+are retried with a growing delay.
+
+The number of resizes that run at once defaults to the CPU count and can be
+set with IMAGE_RESIZER_JOBS.
+"""
+
+import errno
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .limits import CancelToken, ResourceLimits
+from .resize_operation import ResizeOperation
+
+SCHEDULER_ENV_VAR = 'IMAGE_RESIZER_JOBS'
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+MAX_RETRIES = 2
+# Seconds before the first retry, doubled for each further one
+RETRY_DELAY = 2.0
+
+# Finished tasks kept for the queue view
+HISTORY_SIZE = 200
+
+# OS errors that may go away once other jobs have finished
+TRANSIENT_ERRNOS = frozenset((errno.EAGAIN, errno.ENOMEM, errno.EMFILE, errno.ENFILE, errno.EBUSY))
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def is_transient(error):
+    """True for failures worth retrying once the system is less busy"""
+    if isinstance(error, MemoryError):
+        return True
+    return isinstance(error, OSError) and error.errno in TRANSIENT_ERRNOS
+
+
+def default_concurrency():
+    """Resizes that run at once: IMAGE_RESIZER_JOBS or one per CPU"""
+    try:
+        return max(1, int(os.environ[SCHEDULER_ENV_VAR]))
+    except (KeyError, ValueError):
+        return os.cpu_count() or 1
+
+
+_task_ids = itertools.count(1)
+
+
+class ResizeTask:
+    """A unit of work: ``function(cancel)`` returns True on success or raises
+
+    on_done(task) is called from a worker thread once the task has finished
+    for good, with state DONE, FAILED or CANCELLED.
+    """
+
+    def __init__(self, function, title, priority=PRIORITY_NORMAL, group=None, on_done=None):
+        self.id = next(_task_ids)
+        self.function = function
+        self.title = title
+        self.priority = priority
+        self.group = group if group is not None else self.id
+        self.on_done = on_done
+        self.cancel = CancelToken()
+        self.state = PENDING
+        self.attempts = 0
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+
+class ResizeScheduler:
+    """Priority queue of resize tasks run by a bounded set of worker threads"""
+
+    def __init__(self, max_concurrent=None, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
+        self.max_concurrent = max_concurrent or default_concurrency()
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # Tasks running at the same time share the memory and thread budget
+        self.limits = ResourceLimits.from_environment().for_workers(self.max_concurrent)
+        self.condition = threading.Condition()
+        # priority -> OrderedDict of group -> deque of pending tasks
+        self.queues = {}
+        # (due time, id, task) of tasks waiting to be retried
+        self.delayed = []
+        self.running = []
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.workers = 0
+        self.idle_workers = 0
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Call callback() from any thread whenever a task changes state"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def submit(self, function, title, priority=PRIORITY_NORMAL, group=None, on_done=None):
+        """Queue function(cancel) and return its ResizeTask"""
+        task = ResizeTask(function, title, priority, group, on_done)
+        with self.condition:
+            self._enqueue(task)
+            if self.idle_workers == 0 and self.workers < self.max_concurrent:
+                self.workers += 1
+                threading.Thread(target=self._work, name=f'resize-worker-{self.workers}', daemon=True).start()
+            self.condition.notify()
+        self._changed()
+        return task
+
+    def cancel(self, task):
+        """Drop a pending task, or stop a running one and kill its child process"""
+        with self.condition:
+            if task.state == PENDING:
+                self._finish(task, CANCELLED)
+            elif task.state == RUNNING:
+                task.cancel.cancel()
+                return
+            else:
+                return
+        self._changed()
+        if task.on_done:
+            task.on_done(task)
+
+    def cancel_group(self, group):
+        """Cancel every unfinished task of a group"""
+        for task in self.tasks(group):
+            if not task.finished:
+                self.cancel(task)
+
+    def tasks(self, group=None):
+        """Running, pending and recently finished tasks, optionally only those of one group"""
+        running, pending, finished = self.snapshot()
+        tasks = running + pending + finished
+        return [task for task in tasks if group is None or task.group == group]
+
+    def snapshot(self):
+        """(running, pending, finished) task lists for the queue view; pending in dispatch order"""
+        with self.condition:
+            pending = []
+            for priority in sorted(self.queues):
+                queues = [list(tasks) for tasks in self.queues[priority].values()]
+                # Interleave the groups the way they will be dispatched
+                for round_tasks in itertools.zip_longest(*queues):
+                    pending += [task for task in round_tasks if task is not None and task.state == PENDING]
+            pending += [task for _, _, task in sorted(self.delayed) if task.state == PENDING]
+            return list(self.running), pending, list(reversed(self.history))
+
+    def is_busy(self):
+        """True while any task is pending or running"""
+        running, pending, _ = self.snapshot()
+        return bool(running or pending)
+
+    def _changed(self):
+        for callback in list(self.listeners):
+            callback()
+
+    def _enqueue(self, task, front=False):
+        groups = self.queues.setdefault(task.priority, OrderedDict())
+        tasks = groups.setdefault(task.group, deque())
+        if front:
+            tasks.appendleft(task)
+        else:
+            tasks.append(task)
+
+    def _next_task(self):
+        """Pop the next pending task, or None; called with the lock held"""
+        now = time.monotonic()
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, task = heapq.heappop(self.delayed)
+            if task.state == PENDING:
+                self._enqueue(task, front=True)
+
+        for priority in sorted(self.queues):
+            groups = self.queues[priority]
+            while groups:
+                group, tasks = next(iter(groups.items()))
+                task = tasks.popleft()
+                if tasks:
+                    # Round-robin: the group goes to the back of the line
+                    groups.move_to_end(group)
+                else:
+                    del groups[group]
+                # Cancelled tasks are dropped here rather than searched for on cancel
+                if task.state == PENDING:
+                    return task
+        return None
+
+    def _finish(self, task, state, error=None):
+        task.state = state
+        task.error = error
+        task.finished_at = time.time()
+        self.history.append(task)
+
+    def _work(self):
+        while True:
+            with self.condition:
+                task = self._next_task()
+                while task is None:
+                    timeout = max(0.0, self.delayed[0][0] - time.monotonic()) if self.delayed else None
+                    self.idle_workers += 1
+                    self.condition.wait(timeout)
+                    self.idle_workers -= 1
+                    task = self._next_task()
+                task.state = RUNNING
+                task.attempts += 1
+                task.started_at = time.time()
+                self.running.append(task)
+            self._changed()
+
+            error = None
+            try:
+                success = task.function(task.cancel)
+            except Exception as e:
+                success = False
+                error = e
+
+            with self.condition:
+                self.running.remove(task)
+                if task.cancel.is_cancelled():
+                    self._finish(task, CANCELLED)
+                elif success:
+                    self._finish(task, DONE)
+                elif error is not None and is_transient(error) and task.attempts <= self.max_retries:
+                    task.state = PENDING
+                    task.error = ResizeOperation.describe_error(error)
+                    delay = self.retry_delay * 2 ** (task.attempts - 1)
+                    print(f"{task.title}: {task.error}, retrying in {delay:g}s")
+                    heapq.heappush(self.delayed, (time.monotonic() + delay, task.id, task))
+                    self.condition.notify()
+                else:
+                    self._finish(task, FAILED,
+                                 ResizeOperation.describe_error(error) if error is not None else 'Resize failed')
+            self._changed()
+            if task.finished and task.on_done:
+                task.on_done(task)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide ResizeScheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ResizeScheduler()
+        return _scheduler
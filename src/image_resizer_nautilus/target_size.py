@@ -0,0 +1,59 @@
+"""Encoder quality search for a maximum output file size
+
+The image is resized once; only the encode is repeated. The first trial uses
+the profile's own quality, and when that is too large each round encodes
+several qualities at once on a thread pool, spread evenly over the range
+still in question. With n workers every round narrows the range n + 1 times
+instead of halving it, and since the encoders release the GIL the trials
+really run in parallel.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Lowest quality tried before settling for an output over the limit
+MIN_QUALITY = 10
+
+
+class SearchResult:
+    """Outcome of search_quality"""
+
+    def __init__(self, data, quality, trials, fits):
+        self.data = data
+        self.quality = quality
+        self.trials = trials
+        # False when even MIN_QUALITY came out over the limit
+        self.fits = fits
+
+
+def search_quality(encode, max_bytes, quality, workers=1, min_quality=MIN_QUALITY):
+    """Find the highest quality from min_quality up to quality whose encoding fits max_bytes
+
+    encode(quality) returns the encoded bytes and is called from worker
+    threads. When no quality fits, the smallest encoding is returned.
+    """
+    results = {quality: encode(quality)}
+    low, high = min_quality, quality - 1
+    if len(results[quality]) > max_bytes and low <= high:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while low <= high:
+                count = min(max(1, workers), high - low + 1)
+                span = high - low + 2
+                candidates = [low - 1 + span * (index + 1) // (count + 1) for index in range(count)]
+                for candidate, data in zip(candidates, pool.map(encode, candidates)):
+                    results[candidate] = data
+
+                fitting = [candidate for candidate in candidates if len(results[candidate]) <= max_bytes]
+                if fitting:
+                    low = max(fitting) + 1
+                # Size isn't strictly monotonic in quality; only larger qualities can shrink the range
+                too_large = [candidate for candidate in candidates
+                             if candidate >= low and len(results[candidate]) > max_bytes]
+                if too_large:
+                    high = min(too_large) - 1
+
+    fitting = [candidate for candidate, data in results.items() if len(data) <= max_bytes]
+    if fitting:
+        best = max(fitting)
+    else:
+        best = min(results, key=lambda candidate: len(results[candidate]))
+    return SearchResult(results[best], best, len(results), bool(fitting))
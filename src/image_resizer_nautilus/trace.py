@@ -0,0 +1,214 @@
+"""Per-stage timing of resize jobs
+
+Tracing is off unless IMAGE_RESIZER_TRACE names an output file:
+
+    IMAGE_RESIZER_TRACE=~/resize-trace.jsonl   one JSON object per job
+    IMAGE_RESIZER_TRACE=/var/lib/node_exporter/textfile/image_resizer.prom
+                                               Prometheus textfile with per-stage totals
+
+When it is off, start_trace returns a shared no-op trace, so instrumented code
+pays for one environment lookup per job and nothing per stage.
+"""
+
+import fcntl
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from .fileutil import temp_path
+
+TRACE_ENV_VAR = 'IMAGE_RESIZER_TRACE'
+
+PROMETHEUS_EXTENSION = '.prom'
+METRIC_PREFIX = 'image_resizer'
+
+# Backend progress stages and the trace stage each one ends
+BACKEND_STAGES = {'load': 'decode', 'resize': 'resample', 'save': 'encode'}
+
+PROMETHEUS_LINE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+
+class NullTrace:
+    """Stands in for a Trace when tracing is off"""
+
+    enabled = False
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def add(self, name, seconds):
+        pass
+
+    def backend_progress(self, progress):
+        return progress
+
+    def record_backend(self):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def finish(self, result):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class Trace:
+    """Collects stage durations for one job and writes them when it finishes"""
+
+    enabled = True
+
+    def __init__(self, job, output_path, **fields):
+        self.job = job
+        self.output_path = output_path
+        self.fields = fields
+        self.stages = {}
+        self.start_time = time.perf_counter()
+        self.finished = False
+        self.backend_start = None
+        self.backend_marks = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as stage name; repeated stages add up"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, **fields):
+        """Attach extra fields, such as the backend used, to the record"""
+        self.fields.update(fields)
+
+    def backend_progress(self, progress):
+        """Wrap a backend progress callback to split its run into decode, resample and encode
+
+        Each backend stage is timed from the end of the previous one to its last
+        progress report; call record_backend once the backend returns.
+        """
+        self.backend_start = time.perf_counter()
+        self.backend_marks = {}
+
+        def report(fraction, stage):
+            if stage in BACKEND_STAGES:
+                self.backend_marks[stage] = time.perf_counter()
+            if progress:
+                progress(fraction, stage)
+
+        return report
+
+    def record_backend(self):
+        """Add the backend stages timed through backend_progress"""
+        if self.backend_start is None:
+            return
+        previous = self.backend_start
+        for stage, name in BACKEND_STAGES.items():
+            if stage in self.backend_marks:
+                self.add(name, self.backend_marks[stage] - previous)
+                previous = self.backend_marks[stage]
+        # Process exit, and anything the backend didn't report progress for
+        self.add('backend_other', time.perf_counter() - previous)
+        self.backend_start = None
+
+    def finish(self, result):
+        """Write the record once, with result 'success', 'failed' or 'cancelled'"""
+        if self.finished:
+            return
+        self.finished = True
+        record = {
+            'time': time.time(),
+            'job': self.job,
+            'pid': os.getpid(),
+            'result': result,
+            'total_seconds': time.perf_counter() - self.start_time,
+            'stages': self.stages,
+        }
+        record.update(self.fields)
+        try:
+            if self.output_path.endswith(PROMETHEUS_EXTENSION):
+                write_prometheus(self.output_path, record)
+            else:
+                write_jsonl(self.output_path, record)
+        except OSError as e:
+            print(f"Warning: could not write trace to {self.output_path}: {e}")
+
+
+def start_trace(job, **fields):
+    """A Trace for job when tracing is on, otherwise the shared NULL_TRACE"""
+    output_path = os.environ.get(TRACE_ENV_VAR)
+    if not output_path:
+        return NULL_TRACE
+    return Trace(job, os.path.expanduser(output_path), **fields)
+
+
+def write_jsonl(path, record):
+    """Append one line; a single O_APPEND write keeps lines from batch workers whole"""
+    line = json.dumps(record, default=str) + '\n'
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, line.encode())
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _locked(path):
+    with open(path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_prometheus(path):
+    """Samples of a textfile written by write_prometheus, as {(name, labels): value}"""
+    samples = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                match = PROMETHEUS_LINE.match(line.strip())
+                if match:
+                    samples[(match.group('name'), match.group('labels') or '')] = float(match.group('value'))
+    except OSError:
+        pass
+    return samples
+
+
+def write_prometheus(path, record):
+    """Add a job to the running totals in a Prometheus textfile, rewritten atomically"""
+    job = record['job']
+    updates = {
+        (f'{METRIC_PREFIX}_jobs_total', f'job="{job}",result="{record["result"]}"'): 1,
+        (f'{METRIC_PREFIX}_job_seconds_total', f'job="{job}"'): record['total_seconds'],
+    }
+    for stage, seconds in record['stages'].items():
+        updates[(f'{METRIC_PREFIX}_stage_seconds_total', f'job="{job}",stage="{stage}"')] = seconds
+        updates[(f'{METRIC_PREFIX}_stage_runs_total', f'job="{job}",stage="{stage}"')] = 1
+
+    with _locked(path):
+        samples = read_prometheus(path)
+        for key, value in updates.items():
+            samples[key] = samples.get(key, 0) + value
+
+        lines = []
+        for name in sorted({name for name, _ in samples}):
+            lines.append(f'# TYPE {name} counter')
+            for (sample_name, labels), value in sorted(samples.items()):
+                if sample_name == name:
+                    lines.append(f'{name}{{{labels}}} {value!r}' if labels else f'{name} {value!r}')
+
+        # Write next to the target so the collector never reads a partial file
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
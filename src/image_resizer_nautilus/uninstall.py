@@ -20,6 +20,22 @@ def main():
     
     removed = False
     
+    # D-Bus activation file for the resident resizer service
+    dbus_service_path = os.path.expanduser(
+        "~/.local/share/dbus-1/services/com.github.faghmie.ImageResizer.service"
+    )
+    # Desktop file that lets GNOME Shell show the resident service's notifications
+    desktop_file_path = os.path.expanduser(
+        "~/.local/share/applications/com.github.faghmie.ImageResizer.desktop"
+    )
+    for path in (dbus_service_path, desktop_file_path):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+                print(f"✅ Removed: {path}")
+            except Exception as e:
+                print(f"❌ Error removing {path}: {e}")
+    
     for path in extension_paths:
         if os.path.exists(path):
             try: